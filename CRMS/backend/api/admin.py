@@ -0,0 +1,134 @@
+# backend/api/admin.py
+import re
+import threading
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify, current_app
+from .auth import require_auth, require_role
+from .helpers import current_user
+from .roles import ADMIN
+from services import retention_service, sequence_allocator, backup_service
+from utils.firebase import get_db
+from utils.tenant_limits import rate_cost
+
+admin_bp = Blueprint("admin", __name__)
+
+def _tenant_of_request():
+    u = current_user()
+    return (u.get("tenant_id") or (u.get("claims") or {}).get("tenant_id") or "default")
+
+# -----------------------------------------------------------------------------
+# Retention policy  GET/PUT /api/admin/retention
+# Body: { enabled, logs_months, archived_customers_months, mode: collection|ndjson }
+# -----------------------------------------------------------------------------
+@admin_bp.route("/retention", methods=["GET"])
+@require_auth
+@require_role(ADMIN)
+def get_retention():
+    return jsonify({"policy": retention_service.get_policy(get_db(), _tenant_of_request())}), 200
+
+@admin_bp.route("/retention", methods=["PUT"])
+@require_auth
+@require_role(ADMIN)
+def put_retention():
+    try:
+        body = request.get_json(force=True) or {}
+        policy = retention_service.set_policy(get_db(), _tenant_of_request(), body)
+        return jsonify({"message": "Retention policy updated", "policy": policy}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception("admin.put_retention failed")
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/retention/preview", methods=["POST"])
+@require_auth
+@require_role(ADMIN)
+def preview_retention():
+    """Dry run: how many documents the current policy would move (count aggregations only)."""
+    try:
+        db = get_db()
+        tenant_id = _tenant_of_request()
+        policy = {**retention_service.get_policy(db, tenant_id), "enabled": True}
+        return jsonify({"eligible": retention_service.run(db, tenant_id, policy, dry_run=True)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------------------------------------------------------------
+# Ticket numbers  GET/PUT /api/admin/ticket-prefix   Body: { prefix: "ACME" | null }
+# -----------------------------------------------------------------------------
+_PREFIX_RE = re.compile(r"^[A-Z0-9]{1,10}$")
+
+@admin_bp.route("/ticket-prefix", methods=["GET"])
+@require_auth
+@require_role(ADMIN)
+def get_ticket_prefix():
+    snap = sequence_allocator.sequence_ref(get_db(), _tenant_of_request(), "complaints").get()
+    data = (snap.to_dict() or {}) if snap.exists else {}
+    return jsonify({"prefix": data.get("prefix") or sequence_allocator.DEFAULT_PREFIX,
+                    "next": data.get("next") or 1}), 200
+
+@admin_bp.route("/ticket-prefix", methods=["PUT"])
+@require_auth
+@require_role(ADMIN)
+def put_ticket_prefix():
+    try:
+        prefix = ((request.get_json(force=True) or {}).get("prefix") or "").strip().upper() or None
+        if prefix and not _PREFIX_RE.match(prefix):
+            return jsonify({"error": "prefix must be 1-10 letters/digits"}), 400
+        sequence_allocator.set_ticket_prefix(get_db(), _tenant_of_request(), prefix)
+        return jsonify({"message": "Ticket prefix updated",
+                        "prefix": prefix or sequence_allocator.DEFAULT_PREFIX}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------------------------------------------------------------
+# Backups  POST /api/admin/backups        start a point-in-time export (async)
+#          GET  /api/admin/backups        list this tenant's backups
+#          GET  /api/admin/backups/<id>   status + per-collection counts
+# Restores are CLI-only (scripts/backup_tenant.py restore).
+# -----------------------------------------------------------------------------
+@admin_bp.route("/backups", methods=["POST"])
+@require_auth
+@require_role(ADMIN)
+@rate_cost(20)
+def start_backup():
+    try:
+        db = get_db()
+        tenant_id = _tenant_of_request()
+        read_time = datetime.now(timezone.utc)
+        backup_id = backup_service.backup_id_for(read_time)
+        logger = current_app.logger
+
+        def _run():
+            try:
+                backup_service.export_tenant(db, tenant_id, read_time=read_time)
+            except Exception:
+                logger.exception("backup %s for tenant %s failed", backup_id, tenant_id)
+
+        threading.Thread(target=_run, name=f"backup-{tenant_id}", daemon=True).start()
+        return jsonify({"message": "Backup started", "backupId": backup_id,
+                        "readTime": read_time.isoformat()}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/backups", methods=["GET"])
+@require_auth
+@require_role(ADMIN)
+def list_backups():
+    try:
+        return jsonify({"backups": backup_service.list_backups(get_db(), _tenant_of_request())}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/backups/<backup_id>", methods=["GET"])
+@require_auth
+@require_role(ADMIN)
+def get_backup(backup_id):
+    try:
+        snap = backup_service.record_ref(get_db(), _tenant_of_request(), backup_id).get()
+        if not snap.exists:
+            return jsonify({"error": "Backup not found"}), 404
+        data = snap.to_dict() or {}
+        return jsonify({k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in data.items()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,283 @@
+# backend/api/attachments.py
+"""
+Attachment uploads/downloads (content-addressed, resumable).
+
+Flow:
+  1. POST /api/attachments/uploads           {filename, contentType, size, sha256?}
+       -> 201 {uploadId, offset: 0}  or  200 {attachment, deduplicated: true}
+          (when the client-supplied sha256 is already stored for the tenant)
+  2. PUT  /api/attachments/uploads/<id>      raw bytes, header Upload-Offset: <n>
+       -> 200 {offset} while incomplete, 201 {attachment} once size is reached
+     GET  /api/attachments/uploads/<id>      -> {offset} to resume after a failure
+  3. GET  /api/attachments/<id>/content      supports Range requests (206)
+
+Log/complaint `attachments` lists reference the returned attachment ids.
+Upload sessions expire after ATTACHMENT_UPLOAD_TTL_HOURS; unreferenced bytes
+are removed by scripts/sweep_attachments.py (see services/attachment_service.py).
+"""
+import os
+import re
+from flask import Blueprint, request, jsonify, Response, current_app
+from google.cloud import firestore
+from .auth import require_auth, require_permission
+from .helpers import current_user
+from services import attachment_service
+from utils.firebase import get_db
+from utils.storage import get_storage, content_key, StorageError, OffsetMismatch
+
+attachments_bp = Blueprint("attachments", __name__)
+
+MAX_ATTACHMENT_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(50 * 1024 * 1024)))
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def _bad(s):
+    return not s or not str(s).strip() or str(s).strip().lower() in {"undefined", "null", "none"}
+
+def _tenant():
+    u = current_user()
+    return u.get("uid"), u.get("tenant_id")
+
+def _public(att_id, data):
+    return {
+        "id": att_id,
+        "filename": data.get("filename"),
+        "content_type": data.get("content_type"),
+        "size": data.get("size"),
+        "sha256": data.get("sha256"),
+        "url": f"/api/attachments/{att_id}/content",
+    }
+
+def _load_owned(db, collection, doc_id, tenant_id):
+    snap = db.collection(collection).document(doc_id).get()
+    if not snap.exists:
+        return None, ("Not found", 404)
+    data = snap.to_dict() or {}
+    if data.get("tenant_id") != tenant_id:
+        return None, ("Forbidden: cross-tenant access", 403)
+    return data, None
+
+# -----------------------------------------------------------------------------
+# Upload sessions
+# -----------------------------------------------------------------------------
+@attachments_bp.route("/uploads", methods=["POST"])
+@require_auth
+@require_permission("attachments", "create")
+def create_upload():
+    try:
+        uid, tenant_id = _tenant()
+        if _bad(tenant_id):
+            return jsonify({"error": "Missing tenant_id on user"}), 401
+
+        body = request.get_json(force=True) or {}
+        filename = (body.get("filename") or "").strip() or "file"
+        content_type = body.get("contentType") or body.get("content_type") or "application/octet-stream"
+        sha256 = (body.get("sha256") or "").strip().lower() or None
+        if sha256 and not SHA256_RE.match(sha256):
+            return jsonify({"error": "sha256 must be 64 hex characters"}), 400
+        try:
+            size = int(body.get("size"))
+        except (TypeError, ValueError):
+            return jsonify({"error": "size is required"}), 400
+        if size <= 0 or size > MAX_ATTACHMENT_BYTES:
+            return jsonify({"error": f"size must be between 1 and {MAX_ATTACHMENT_BYTES} bytes"}), 400
+
+        db = get_db()
+        storage = get_storage()
+
+        # Client already knows the hash and we hold those bytes: no upload needed.
+        # The reference is taken in a transaction on the blob doc, so a blob being
+        # swept is never revived; the upload then goes the normal way.
+        if sha256 and storage.exists(content_key(tenant_id, sha256)):
+            created = attachment_service.add_reference(db, tenant_id, uid, sha256, size, filename,
+                                                       content_type, existing_only=True)
+            if created:
+                att_id, data = created
+                return jsonify({"attachment": _public(att_id, data), "deduplicated": True}), 200
+
+        ref = db.collection("uploads").document()
+        ref.set({
+            "tenant_id": tenant_id,
+            "created_by": uid,
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "sha256": sha256,
+            "status": attachment_service.UPLOAD_PENDING,
+            "created_at": firestore.SERVER_TIMESTAMP,
+            "expires_at": attachment_service.upload_expiry(),
+        })
+        return jsonify({"uploadId": ref.id, "offset": 0, "size": size}), 201
+    except Exception as e:
+        current_app.logger.exception("attachments.create_upload failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@attachments_bp.route("/uploads/<upload_id>", methods=["GET"])
+@require_auth
+@require_permission("attachments", "create")
+def upload_status(upload_id):
+    try:
+        _, tenant_id = _tenant()
+        upload, err = _load_owned(get_db(), "uploads", upload_id, tenant_id)
+        if err:
+            return jsonify({"error": err[0]}), err[1]
+        done = upload.get("status") in (attachment_service.UPLOAD_COMPLETE, attachment_service.UPLOAD_COMMITTING)
+        offset = upload.get("size") if done else get_storage().staging_size(upload_id)
+        return jsonify({
+            "uploadId": upload_id,
+            "offset": offset,
+            "size": upload.get("size"),
+            "status": upload.get("status"),
+            "attachmentId": upload.get("attachment_id"),
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@attachments_bp.route("/uploads/<upload_id>", methods=["PUT", "PATCH"])
+@require_auth
+@require_permission("attachments", "create")
+def upload_chunk(upload_id):
+    """Append the raw request body at Upload-Offset, streaming it in fixed-size chunks."""
+    try:
+        uid, tenant_id = _tenant()
+        db = get_db()
+        upload, err = _load_owned(db, "uploads", upload_id, tenant_id)
+        if err:
+            return jsonify({"error": err[0]}), err[1]
+        if upload.get("status") == attachment_service.UPLOAD_COMMITTING:
+            # attachment already written by an interrupted request: just move the bytes in
+            created = attachment_service.finish_upload(db, upload_id, tenant_id, upload["sha256"])
+            att = db.collection("attachments").document(upload["attachment_id"]).get()
+            return jsonify({"attachment": _public(att.id, att.to_dict() or {}), "deduplicated": not created}), 201
+        if upload.get("status") != attachment_service.UPLOAD_PENDING:
+            return jsonify({"error": "upload already completed", "attachmentId": upload.get("attachment_id")}), 409
+
+        try:
+            offset = int(request.headers.get("Upload-Offset", request.args.get("offset", 0)))
+        except ValueError:
+            return jsonify({"error": "Upload-Offset must be an integer"}), 400
+
+        storage = get_storage()
+        size = int(upload["size"])
+        try:
+            new_offset = storage.append_staging(upload_id, offset, request.stream, max_bytes=size)
+        except OffsetMismatch as e:
+            return jsonify({"error": str(e), "offset": e.expected}), 409
+        except StorageError as e:
+            return jsonify({"error": str(e), "offset": storage.staging_size(upload_id)}), 400
+
+        if new_offset < size:
+            resp = jsonify({"uploadId": upload_id, "offset": new_offset, "size": size})
+            resp.headers["Upload-Offset"] = str(new_offset)
+            return resp, 200
+
+        # Complete: hash by streaming the staged bytes, then content-address them.
+        try:
+            sha256, _ = storage.hash_staging(upload_id)
+        except FileNotFoundError:
+            # a concurrent final chunk already moved the staged bytes into place
+            return jsonify({"error": "upload already completed"}), 409
+        claimed = upload.get("sha256")
+        if claimed and claimed != sha256:
+            storage.discard_staging(upload_id)
+            db.collection("uploads").document(upload_id).update({
+                "status": attachment_service.UPLOAD_FAILED, "error": "sha256 mismatch",
+            })
+            return jsonify({"error": "sha256 mismatch", "sha256": sha256}), 422
+
+        # Reference first, bytes second: once the blob counts this reference the
+        # sweeper can no longer claim it, so the bytes committed below stay. A
+        # concurrent final chunk of the same upload gets the same attachment back.
+        try:
+            att_id, data = attachment_service.add_reference(
+                db, tenant_id, uid, sha256, size, upload.get("filename"), upload.get("content_type"),
+                upload_id=upload_id)
+        except attachment_service.UploadClosed as e:
+            return jsonify({"error": str(e)}), 409
+        except attachment_service.BlobBusy:
+            # staged bytes are kept; re-sending the last chunk (or an empty PUT at `size`) completes it
+            resp = jsonify({"error": "identical content is being deleted, retry shortly", "offset": size})
+            resp.headers["Retry-After"] = "5"
+            return resp, 503
+        created = attachment_service.finish_upload(db, upload_id, tenant_id, sha256, storage)
+        return jsonify({"attachment": _public(att_id, data), "deduplicated": not created}), 201
+    except Exception as e:
+        current_app.logger.exception("attachments.upload_chunk failed")
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------------------------------------------------------------
+# Attachments
+# -----------------------------------------------------------------------------
+@attachments_bp.route("/<attachment_id>", methods=["GET"])
+@require_auth
+@require_permission("attachments", "read")
+def get_attachment(attachment_id):
+    try:
+        _, tenant_id = _tenant()
+        data, err = _load_owned(get_db(), "attachments", attachment_id, tenant_id)
+        if err:
+            return jsonify({"error": err[0]}), err[1]
+        return jsonify(_public(attachment_id, data)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@attachments_bp.route("/<attachment_id>/content", methods=["GET"])
+@require_auth
+@require_permission("attachments", "read")
+def download_attachment(attachment_id):
+    """Stream the bytes; honours a single `Range: bytes=` request with 206."""
+    try:
+        _, tenant_id = _tenant()
+        data, err = _load_owned(get_db(), "attachments", attachment_id, tenant_id)
+        if err:
+            return jsonify({"error": err[0]}), err[1]
+
+        storage = get_storage()
+        key = data.get("storage_key") or content_key(tenant_id, data["sha256"])
+        total = storage.size(key)
+        if total is None:
+            return jsonify({"error": "content missing"}), 404
+
+        start, stop, status = 0, total, 200
+        rng = request.range
+        if rng is not None:
+            bounds = rng.range_for_length(total)
+            if bounds is None:
+                resp = Response(status=416)
+                resp.headers["Content-Range"] = f"bytes */{total}"
+                return resp
+            (start, stop), status = bounds, 206
+
+        resp = Response(storage.read_range(key, start, stop), status=status,
+                        mimetype=data.get("content_type") or "application/octet-stream")
+        resp.headers["Accept-Ranges"] = "bytes"
+        resp.headers["Content-Length"] = str(stop - start)
+        resp.headers["ETag"] = f'"{data.get("sha256")}"'
+        if status == 206:
+            resp.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{total}"
+        if data.get("filename"):
+            resp.headers["Content-Disposition"] = f'inline; filename="{data["filename"]}"'
+        return resp
+    except Exception as e:
+        current_app.logger.exception("attachments.download failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@attachments_bp.route("/<attachment_id>", methods=["DELETE"])
+@require_auth
+@require_permission("attachments", "delete")
+def delete_attachment(attachment_id):
+    """Drop one reference; the bytes are swept once the last one stays gone (``attachment_service``)."""
+    try:
+        _, tenant_id = _tenant()
+        db = get_db()
+        data, err = _load_owned(db, "attachments", attachment_id, tenant_id)
+        if err:
+            return jsonify({"error": err[0]}), err[1]
+
+        attachment_service.release_reference(db, attachment_id, tenant_id, data["sha256"])
+        return jsonify({"message": "Attachment deleted"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -8,6 +8,7 @@ from models.user import User
 from datetime import datetime
 from services.user_services import UserService
 from google.cloud import firestore
+from utils import rbac, tenant_limits
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -25,26 +26,78 @@ def require_role(*allowed_roles):
         @require_auth
         @require_role("admin")                       # one role
         @require_role("admin", "manager", "support") # any of these
+
+    Role aliases resolve through utils.rbac ("admin" == "tenant_admin",
+    "support" == "support_agent"); super_admin always passes.
     """
-    allowed = {r.lower() for r in allowed_roles}
+    allowed = {rbac.canonical_role(r) for r in allowed_roles}
 
     def decorator(fn):
         @wraps(fn)
         def wrapped(*args, **kwargs):
             user = getattr(request, "user", {}) or {}
-            role = _extract_role(user)
-            if not role or role not in allowed:
+            role = rbac.canonical_role(_extract_role(user))
+            if not role or (role not in allowed and role != rbac.SUPER_ADMIN):
                 return jsonify({"error": "Forbidden: insufficient role"}), 403
             return fn(*args, **kwargs)
         return wrapped
     return decorator
+
+
+def require_permission(resource: str, action: str):
+    """
+    Usage:
+        @require_auth
+        @require_permission("complaints", "update")
+
+    The permission bit is resolved once here; each request costs one mask
+    lookup for the principal's role (see utils/rbac.py).
+    """
+    bit = rbac.permission_bit(resource, action)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            if not rbac.has_bit(_extract_role(getattr(request, "user", None)), bit):
+                return jsonify({"error": f"Forbidden: missing permission {resource}:{action}"}), 403
+            return fn(*args, **kwargs)
+        return wrapped
+    return decorator
+
 # ==============================================================
 # 🔒 Middleware: Require authentication
 # ==============================================================
+# Server-side only: /api/batch dispatches sub-requests with the already verified,
+# enriched principal under this WSGI environ key (clients cannot set environ keys).
+PRINCIPAL_ENVIRON_KEY = "crms.principal"
+
+def _rate_limited(e: tenant_limits.RateLimited):
+    resp = jsonify({"error": f"Too many requests: {e.reason}", "retryAfter": e.retry_after_header})
+    resp.headers["Retry-After"] = e.retry_after_header
+    return resp, 429
+
+def _run_admitted(f, user, gate, *args, **kwargs):
+    """Per-tenant token bucket + concurrency gate (utils/tenant_limits.py) around the route."""
+    try:
+        release = tenant_limits.admit(user.get("tenant_id"), request.method,
+                                      getattr(f, "rate_cost", 1), gate=gate)
+    except tenant_limits.RateLimited as e:
+        return _rate_limited(e)
+    try:
+        return f(*args, **kwargs)
+    finally:
+        release()
+
 def require_auth(f):
     """Decorator to require Firebase ID token authentication and enrich request.user with role/tenant."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        shared = request.environ.get(PRINCIPAL_ENVIRON_KEY)
+        if shared is not None:
+            request.user = dict(shared)
+            # batch sub-requests pay tokens but run inside the batch's concurrency slot
+            return _run_admitted(f, request.user, False, *args, **kwargs)
+
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
             return jsonify({"authenticated": False, "error": "Authentication required"}), 401
@@ -70,7 +123,7 @@ def require_auth(f):
             pass
 
         request.user = decoded_token
-        return f(*args, **kwargs)
+        return _run_admitted(f, decoded_token, True, *args, **kwargs)
 
     return decorated_function
 
@@ -0,0 +1,134 @@
+# backend/api/batch.py
+"""
+POST /api/batch — run several API calls in one round trip.
+
+Body: {"requests": [{"id": "kpis", "method": "GET", "path": "/api/metrics/summary"},
+                    {"id": "c", "method": "GET", "path": "/api/customers?limit=5"},
+                    {"method": "POST", "path": "/api/logs", "body": {...}, "headers": {"Idempotency-Key": "..."}}]}
+(a bare JSON array is accepted too)
+
+The token is verified and the tenant/role resolved once; every sub-request
+runs through the normal route (permission checks included) with that shared
+principal. Consecutive GETs run concurrently; any other method is a barrier
+and runs alone, in order. Response: {"responses": [{"id", "status", "body", "headers"}]}
+in request order; a failing item never fails the batch.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from flask import Blueprint, request, jsonify, current_app
+from werkzeug.test import EnvironBuilder
+
+from .auth import require_auth, PRINCIPAL_ENVIRON_KEY
+from .helpers import current_user
+
+batch_bp = Blueprint("batch", __name__)
+
+MAX_BATCH_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE"}
+BLOCKED_HEADERS = {"authorization", "cookie", "host", "content-length"}
+EXPOSED_HEADERS = ("Content-Type", "ETag", "Retry-After", "Idempotent-Replayed", "Upload-Offset")
+
+
+def _parse_item(raw, index):
+    if not isinstance(raw, dict):
+        return None, "each request must be an object"
+    method = str(raw.get("method") or "GET").upper()
+    path = str(raw.get("path") or "")
+    if method not in METHODS:
+        return None, f"unsupported method '{method}'"
+    parts = urlsplit(path)
+    if parts.scheme or parts.netloc or not parts.path.startswith("/api/"):
+        return None, "path must be an /api/... path"
+    if parts.path.rstrip("/") == "/api/batch":
+        return None, "nested batches are not allowed"
+    headers = {k: str(v) for k, v in (raw.get("headers") or {}).items()
+               if str(k).lower() not in BLOCKED_HEADERS}
+    return {"id": raw.get("id", index), "method": method, "path": parts.path,
+            "query": parts.query, "body": raw.get("body"), "headers": headers}, None
+
+
+def _dispatch(app, base_environ, principal, item):
+    builder = EnvironBuilder(
+        path=item["path"], method=item["method"], query_string=item["query"],
+        headers=item["headers"],
+        json=item["body"] if item["body"] is not None and item["method"] != "GET" else None,
+        environ_base={
+            "REMOTE_ADDR": base_environ.get("REMOTE_ADDR"),
+            PRINCIPAL_ENVIRON_KEY: principal,
+        },
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    try:
+        with app.request_context(environ):
+            resp = app.make_response(app.full_dispatch_request())
+        if resp.is_streamed:
+            return {"id": item["id"], "status": 400,
+                    "body": {"error": "streaming responses are not available through /api/batch"}}
+        text = resp.get_data(as_text=True)
+        try:
+            body = json.loads(text) if resp.is_json else text
+        except ValueError:
+            body = text
+        return {"id": item["id"], "status": resp.status_code, "body": body,
+                "headers": {h: resp.headers[h] for h in EXPOSED_HEADERS if h in resp.headers}}
+    except Exception as e:
+        app.logger.exception("batch item %s failed", item["id"])
+        return {"id": item["id"], "status": 500, "body": {"error": str(e)}}
+
+
+@batch_bp.route("", methods=["POST"])
+@require_auth
+def run_batch():
+    data = request.get_json(force=True, silent=True)
+    raw_items = data.get("requests") if isinstance(data, dict) else data
+    if not isinstance(raw_items, list) or not raw_items:
+        return jsonify({"error": "requests must be a non-empty array"}), 400
+    if len(raw_items) > MAX_BATCH_REQUESTS:
+        return jsonify({"error": f"at most {MAX_BATCH_REQUESTS} requests per batch"}), 400
+
+    app = current_app._get_current_object()
+    principal = dict(current_user())
+    base_environ = request.environ
+
+    results = [None] * len(raw_items)
+    items = []
+    for i, raw in enumerate(raw_items):
+        item, err = _parse_item(raw, i)
+        if err:
+            results[i] = {"id": (raw or {}).get("id", i) if isinstance(raw, dict) else i,
+                          "status": 400, "body": {"error": err}}
+        else:
+            items.append((i, item))
+
+    # Consecutive GETs form a group that runs concurrently; writes run alone, in order.
+    groups, current = [], []
+    for i, item in items:
+        if item["method"] == "GET":
+            current.append((i, item))
+            continue
+        if current:
+            groups.append(current)
+            current = []
+        groups.append([(i, item)])
+    if current:
+        groups.append(current)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_CONCURRENCY, len(items) or 1))) as pool:
+        for group in groups:
+            if len(group) == 1:
+                i, item = group[0]
+                results[i] = _dispatch(app, base_environ, principal, item)
+                continue
+            futures = [(i, pool.submit(_dispatch, app, base_environ, principal, item)) for i, item in group]
+            for i, fut in futures:
+                results[i] = fut.result()
+
+    return jsonify({"responses": results}), 200
@@ -1,10 +1,23 @@
 # backend/api/complaints.py
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify, current_app
 from google.cloud import firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
-from .auth import require_auth
-from .helpers import current_user 
+from .auth import require_auth, require_permission
+from .idempotency import idempotent
+from schemas import BulkResult, Message, respond, validate_body
+from schemas.complaints import (
+    AgentLoads, AssignIn, Assigned, Board, BoardColumn, CommentIn, ComplaintBulk, ComplaintCreate,
+    ComplaintCreated, ComplaintList, ComplaintOut, CustomerUpdateIn, StatusUpdate, StatusUpdated,
+)
+from .helpers import current_user, user_in_tenant
 from utils.firebase import get_db  # your Firestore client factory
+from utils import query_planner, rbac
+from utils.query_planner import QuerySpec, QueryNotIndexed, DESC
+from services import (
+    rollup_service, customer_stats, bulk_service, sequence_allocator, board_service, outbox_service,
+    assignment_service,
+)
 
 complaints_bp = Blueprint("complaints", __name__)
 
@@ -23,11 +36,73 @@ def _ensure_same_tenant(doc, tenant_id):
         return False, ("Forbidden: cross-tenant access", 403)
     return True, data
 
+def _change_status(db, ref, tenant_id, uid, status, extra=None):
+    """
+    Transactionally move a complaint to `status`: re-reads the current status so
+    the timeline entry, the customer's open_complaints counter and the queued
+    rollup transition all agree even under concurrent updates. Returns the old status.
+    """
+    committed = {}
+
+    @firestore.transactional
+    def _txn(transaction):
+        committed.clear()
+        current = ref.get(transaction=transaction).to_dict() or {}
+        old_status = current.get("status")
+        customer_ref = None
+        if current.get("customer_id"):
+            customer_ref = db.collection("customers").document(current["customer_id"])
+            if customer_stats.read_customer(transaction, customer_ref, tenant_id) is None:
+                customer_ref = None
+
+        update = {"status": status, "updated_at": firestore.SERVER_TIMESTAMP, **(extra or {})}
+        if old_status != status:
+            # Plain datetime: SERVER_TIMESTAMP is not allowed inside array elements
+            update["timeline"] = firestore.ArrayUnion([{
+                "timestamp": datetime.now(timezone.utc),
+                "action": "status_change",
+                "userId": uid,
+                "from": old_status,
+                "to": status,
+            }])
+            stats = customer_stats.complaint_status_update(old_status, status)
+            if customer_ref is not None and stats:
+                transaction.update(customer_ref, stats)
+            loads = assignment_service.load_deltas(current.get("assigned_to"), old_status,
+                                                   current.get("assigned_to"), status)
+            assignment_service.apply(transaction, db, tenant_id, loads)
+            committed["loads"] = loads
+            outbox_service.enqueue(
+                transaction, db, tenant_id, outbox_service.STATUS_CHANGED, ref.id, uid,
+                {"from": old_status, "to": status, "customer_id": current.get("customer_id"),
+                 "ticket_number": current.get("ticket_number")},
+                recipients=[current.get("assigned_to"), current.get("created_by")])
+        transaction.update(ref, update)
+        return old_status
+
+    old_status = _txn(db.transaction())
+    if old_status != status:
+        # the day's rollup doc is shared by every complaint of the tenant: coalesce it
+        rollup_service.queue(tenant_id, rollup_service.status_transition_increments(old_status, status))
+        assignment_service.get_engine().observe(tenant_id, committed.get("loads") or {})
+        outbox_service.notify()
+    return old_status
+
+def _list_spec(tenant_id, customer_id=None, status=None):
+    """QuerySpec behind GET /api/complaints (tests plan it against firestore.indexes.json)."""
+    spec = QuerySpec("complaints").where("tenant_id", "==", tenant_id)
+    if customer_id:
+        spec.where("customer_id", "==", customer_id)
+    if status:
+        spec.where("status", "==", status)
+    return spec.order("created_at", DESC)
+
 # -----------------------------------------------------------------------------
 # NEW: List complaints (tenant scoped)  GET /api/complaints?customerId=&status=&search=&page=&pageSize=
 # -----------------------------------------------------------------------------
 @complaints_bp.route("", methods=["GET"])
 @require_auth
+@require_permission("complaints", "read")
 def list_complaints():
     try:
         db = get_db()
@@ -44,18 +119,8 @@ def list_complaints():
         except ValueError:
             page, page_size = 1, 20
 
-        q = db.collection("complaints").where(filter=FieldFilter("tenant_id", "==", tenant_id))
-        if customer_id:
-            q = q.where(filter=FieldFilter("customer_id", "==", customer_id))
-        if status:
-            q = q.where(filter=FieldFilter("status", "==", status))
-
-        # Order newest first by created_at if present; otherwise Firestore default
-        try:
-            from google.cloud import firestore
-            q = q.order_by("created_at", direction=firestore.Query.DESCENDING)
-        except Exception:
-            pass
+        # Newest first; the filter combination is checked against firestore.indexes.json
+        q = query_planner.plan(_list_spec(tenant_id, customer_id, status)).query(db)
 
         offset = (page - 1) * page_size
         q = q.offset(offset).limit(page_size)
@@ -73,13 +138,63 @@ def list_complaints():
             ]
 
         has_more = len(items) == page_size
-        return jsonify({
+        return respond(ComplaintList, {
             "complaints": items,
             "page": page,
             "pageSize": page_size,
             "hasMore": has_more,
             "total": len(items)
-        }), 200
+        })
+    except QueryNotIndexed as e:
+        return jsonify(e.to_dict()), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------------------------------------------------------------
+# NEW: Kanban board  GET /api/complaints/board?limit=
+#      one column   GET /api/complaints/board/<status>?cursor=&limit=
+# -----------------------------------------------------------------------------
+@complaints_bp.route("/board", methods=["GET"])
+@require_auth
+@require_permission("complaints", "read")
+def get_board():
+    try:
+        db = get_db()
+        uid, tenant_id = _uid_and_tenant()
+        if _bad(tenant_id):
+            return jsonify({"error": "Missing tenant_id on user"}), 401
+        try:
+            limit = int(request.args.get("limit", board_service.DEFAULT_COLUMN_SIZE))
+        except ValueError:
+            limit = board_service.DEFAULT_COLUMN_SIZE
+        return respond(Board, board_service.board(db, tenant_id, limit))
+    except QueryNotIndexed as e:
+        return jsonify(e.to_dict()), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@complaints_bp.route("/board/<status>", methods=["GET"])
+@require_auth
+@require_permission("complaints", "read")
+def get_board_column(status):
+    try:
+        db = get_db()
+        uid, tenant_id = _uid_and_tenant()
+        if _bad(tenant_id):
+            return jsonify({"error": "Missing tenant_id on user"}), 401
+        if status not in board_service.BOARD_STATUSES:
+            return jsonify({"error": "invalid status"}), 400
+        try:
+            limit = int(request.args.get("limit", board_service.DEFAULT_COLUMN_SIZE))
+        except ValueError:
+            limit = board_service.DEFAULT_COLUMN_SIZE
+        try:
+            page = board_service.column_cards(db, tenant_id, status, limit, request.args.get("cursor"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return respond(BoardColumn, page)
+    except QueryNotIndexed as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -88,6 +203,7 @@ def list_complaints():
 # -----------------------------------------------------------------------------
 @complaints_bp.route("/<complaint_id>", methods=["GET"])
 @require_auth
+@require_permission("complaints", "read")
 def get_complaint(complaint_id):
     try:
         if _bad(complaint_id):
@@ -105,7 +221,7 @@ def get_complaint(complaint_id):
             msg, code = payload
             return jsonify({"error": msg}), code
 
-        return jsonify({"id": snap.id, **payload}), 200
+        return respond(ComplaintOut, {"id": snap.id, **payload})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -115,16 +231,12 @@ def get_complaint(complaint_id):
 # -----------------------------------------------------------------------------
 @complaints_bp.route("", methods=["POST"])
 @require_auth
+@require_permission("complaints", "create")
+@idempotent
+@validate_body(ComplaintCreate)
 def create_complaint():
-    body = request.get_json(force=True) or {}
-    customer_id = body.get("customerId") or body.get("customer_id")
-    title = body.get("title")
-    description = body.get("description", "")
-    category = body.get("category", "other")
-    severity = body.get("severity", "low")
-    attachments = body.get("attachments", [])
-
-    if _bad(customer_id) or _bad(title):
+    body = request.validated
+    if _bad(body.customer_id) or _bad(body.title):
         return jsonify({"error": "customerId and title are required"}), 400
 
     db = get_db()
@@ -132,44 +244,232 @@ def create_complaint():
     if _bad(tenant_id):
         return jsonify({"error": "Missing tenant_id on user"}), 401
 
+    if not _bad(body.assigned_to) and not user_in_tenant(db, body.assigned_to, tenant_id):
+        return jsonify({"error": "assignedTo is not a user of this tenant"}), 400
+
     doc_ref = db.collection("complaints").document()  # auto ID
-    ticket_number = f"COMP-{doc_ref.id[:4].upper()}"
+    # sequential per tenant, handed out from a block this worker reserved
+    ticket_number, ticket_seq = sequence_allocator.next_ticket_number(tenant_id)
+
+    # An explicit assigned_to wins; otherwise the least-loaded eligible agent
+    assignee, auto_assigned = body.assigned_to, False
+    if _bad(assignee):
+        assignee = None
+        if assignment_service.AUTO_ASSIGN and customer_stats.is_open(body.status):
+            try:
+                assignee = assignment_service.get_engine().pick(db, tenant_id, body.category)
+                auto_assigned = assignee is not None
+            except Exception:
+                current_app.logger.warning("auto-assignment unavailable", exc_info=True)
+    loads = assignment_service.load_deltas(None, None, assignee, body.status)
 
     payload = {
         "tenant_id": tenant_id,
-        "customer_id": customer_id,
-        "title": title,
-        "description": description,
-        "category": category,
-        "severity": severity,
-        "status": body.get("status", "new"),
-        "priority": body.get("priority", 0),
-        "assigned_to": body.get("assigned_to"),
-        "sla": body.get("sla", {}),
+        **body.model_dump(),
         "timeline": [],
         "internal_comments": [],
         "customer_updates": [],
-        "attachments": attachments,
         "ticket_number": ticket_number,
+        "ticket_seq": ticket_seq,
+        "board_rank": board_service.initial_rank(),
+        "assigned_to": assignee,
+        "assigned_date": firestore.SERVER_TIMESTAMP if assignee else None,
+        "auto_assigned": auto_assigned,
         "created_at": firestore.SERVER_TIMESTAMP,  # server timestamp via your wrapper
+        "updated_at": firestore.SERVER_TIMESTAMP,
         "created_by": uid,
     }
-    doc_ref.set(payload)
-    return jsonify({
+    customer_ref = db.collection("customers").document(body.customer_id)
+
+    @firestore.transactional
+    def _write(transaction):
+        customer = customer_stats.read_customer(transaction, customer_ref, tenant_id)
+        transaction.set(doc_ref, payload)
+        if customer is not None:
+            transaction.update(customer_ref, customer_stats.complaint_created_update(payload["status"]))
+        assignment_service.apply(transaction, db, tenant_id, loads)
+
+    try:
+        _write(db.transaction())
+    except Exception:
+        if auto_assigned:
+            assignment_service.get_engine().release(tenant_id, assignee)
+        raise
+    if not auto_assigned:
+        assignment_service.get_engine().observe(tenant_id, loads)
+    # one rollup doc per tenant and day would serialize every create: coalesce it
+    rollup_service.queue(tenant_id, rollup_service.complaint_created_increments(payload))
+    return respond(ComplaintCreated, {
         "success": True,
-        "data": {"id": doc_ref.id, "ticketNumber": ticket_number, "message": "Complaint created successfully"}
-    }), 201
+        "data": {"id": doc_ref.id, "ticketNumber": ticket_number, "assignedTo": assignee,
+                 "message": "Complaint created successfully"}
+    }, 201)
+
+# -----------------------------------------------------------------------------
+# NEW: Bulk operations  POST /api/complaints/bulk
+# Body: { ids: [...], operation: assign|set_status|close|set_severity|set_priority, ... }
+# -----------------------------------------------------------------------------
+STATUSES = {"new", "acknowledged", "in_progress", "resolved", "closed"}
+
+@complaints_bp.route("/bulk", methods=["POST"])
+@require_auth
+@require_permission("complaints", "update")
+@validate_body(ComplaintBulk)
+def bulk_complaints():
+    try:
+        body = request.validated.model_dump()
+        op = body["operation"].strip().lower()
+        if op == "assign" and not rbac.allowed(current_user().get("role"), "complaints", "assign"):
+            return jsonify({"error": "Forbidden: missing permission complaints:assign"}), 403
+        ids = bulk_service.clean_ids(body.get("ids"))
+        if not ids:
+            return jsonify({"error": "ids is required"}), 400
+        if len(ids) > bulk_service.MAX_BULK_IDS:
+            return jsonify({"error": f"at most {bulk_service.MAX_BULK_IDS} ids per request"}), 400
+
+        db = get_db()
+        uid, tenant_id = _uid_and_tenant()
+        if _bad(tenant_id):
+            return jsonify({"error": "Missing tenant_id on user"}), 401
+
+        fields = {}
+        new_status = None
+        if op == "assign":
+            assignee = body.get("assigned_to")
+            if _bad(assignee):
+                return jsonify({"error": "assigned_to is required"}), 400
+            if not user_in_tenant(db, assignee, tenant_id):
+                return jsonify({"error": "assigned_to is not a user of this tenant"}), 400
+            fields["assigned_to"] = assignee
+            fields["assigned_date"] = firestore.SERVER_TIMESTAMP
+            fields["auto_assigned"] = False
+        elif op in ("set_status", "close"):
+            new_status = "closed" if op == "close" else (body.get("status") or "").strip().lower()
+            if new_status not in STATUSES:
+                return jsonify({"error": "invalid status"}), 400
+            fields["status"] = new_status
+        elif op in ("set_severity", "set_priority"):
+            key = op.split("_", 1)[1]
+            if body.get(key) is None:
+                return jsonify({"error": f"{key} is required"}), 400
+            fields[key] = body.get(key)
+        else:
+            return jsonify({"error": "unknown operation"}), 400
+        fields["updated_at"] = firestore.SERVER_TIMESTAMP
+
+        owned, results = bulk_service.load_owned(
+            db, "complaints", ids, tenant_id,
+            field_paths=["status", "customer_id", "assigned_to", "created_by", "ticket_number"])
+
+        updates = []
+        now = datetime.now(timezone.utc)
+        for ref, data in owned.values():
+            update = dict(fields)
+            if new_status and data.get("status") != new_status:
+                update["timeline"] = firestore.ArrayUnion([{
+                    "timestamp": now, "action": "status_change", "userId": uid,
+                    "from": data.get("status"), "to": new_status,
+                }])
+            updates.append((ref, update))
+
+        bulk_service.bulk_update(db, updates, results)
+        if new_status:
+            # every status change notifies, as PUT /:id/status does
+            _enqueue_status_events(db, tenant_id, uid, new_status, (
+                (cid, data) for cid, (_, data) in owned.items()
+                if results.get(cid, {}).get("ok") and data.get("status") != new_status))
+
+        # Counters below are written after the complaints (BulkWriter is not atomic
+        # across documents). A failed write is logged and reported back as
+        # `stale_counters` instead of failing the request: the complaints are
+        # already changed, and the rebuild scripts repair the counters.
+        stale = []
+
+        # Agent open-ticket counters, for re-assignments and open <-> closed moves
+        loads = {}
+        for cid, (_, data) in owned.items():
+            if results.get(cid, {}).get("ok"):
+                assignment_service.merge_deltas(loads, assignment_service.load_deltas(
+                    data.get("assigned_to"), data.get("status"),
+                    fields.get("assigned_to", data.get("assigned_to")), new_status or data.get("status")))
+        loads = {a: d for a, d in loads.items() if d}
+        if loads:
+            try:
+                batch = db.batch()
+                assignment_service.apply(batch, db, tenant_id, loads)
+                batch.commit()
+            except Exception:
+                current_app.logger.exception("bulk %s: agent loads not updated (tenant %s, deltas %s); "
+                                             "run scripts/rebuild_agent_loads.py", op, tenant_id, loads)
+                stale.append("agent_loads")
+            else:
+                assignment_service.get_engine().observe(tenant_id, loads)
+
+        # Derived counters for the writes that succeeded: one queued rollup increment
+        # plus one Increment per affected customer instead of one per complaint.
+        if new_status:
+            transitions = {}    # transition key -> Increment
+            open_delta = {}     # customer_id -> +/- open_complaints
+            for cid, (_, data) in owned.items():
+                old_status = data.get("status")
+                if not results.get(cid, {}).get("ok") or old_status == new_status:
+                    continue
+                key = rollup_service.transition_key(old_status, new_status)
+                transitions[key] = transitions.get(key, 0) + 1
+                delta = int(customer_stats.is_open(new_status)) - int(customer_stats.is_open(old_status))
+                if delta and data.get("customer_id"):
+                    open_delta[data["customer_id"]] = open_delta.get(data["customer_id"], 0) + delta
+            if transitions:
+                rollup_service.queue(tenant_id, {"complaints": {"transitions": {
+                    k: firestore.Increment(n) for k, n in transitions.items()}}})
+            counter_results = {}
+            bulk_service.bulk_update(db, (
+                (db.collection("customers").document(c), {
+                    "open_complaints": firestore.Increment(d),
+                    "last_activity_at": firestore.SERVER_TIMESTAMP,
+                })
+                for c, d in open_delta.items() if d
+            ), counter_results)
+            if any(not r.get("ok") for r in counter_results.values()):
+                current_app.logger.error("bulk %s: open_complaints not updated for customers %s; "
+                                         "run scripts/rebuild_customer_stats.py", op,
+                                         [c for c, r in counter_results.items() if not r.get("ok")])
+                stale.append("customer_stats")
+
+        summary = bulk_service.summarize(op, ids, results)
+        summary["stale_counters"] = stale
+        return respond(BulkResult, summary)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _enqueue_status_events(db, tenant_id, uid, new_status, changed):
+    """One STATUS_CHANGED outbox event per complaint the bulk pass moved, in batched commits."""
+    batch, n = db.batch(), 0
+    for cid, data in changed:
+        if outbox_service.enqueue(
+                batch, db, tenant_id, outbox_service.STATUS_CHANGED, cid, uid,
+                {"from": data.get("status"), "to": new_status, "customer_id": data.get("customer_id"),
+                 "ticket_number": data.get("ticket_number")},
+                recipients=[data.get("assigned_to"), data.get("created_by")]):
+            n += 1
+            if n % 400 == 0:
+                batch.commit()
+                batch = db.batch()
+    if n % 400:
+        batch.commit()
+    if n:
+        outbox_service.notify()
 
 # -----------------------------------------------------------------------------
 # EXISTING: Update status (kept)  PUT /api/complaints/<complaint_id>/status
 # -----------------------------------------------------------------------------
 @complaints_bp.route("/<complaint_id>/status", methods=["PUT"])
 @require_auth
+@require_permission("complaints", "update")
+@validate_body(StatusUpdate)
 def update_status(complaint_id):
-    body = request.get_json(force=True) or {}
-    status = (body.get("status") or "").strip().lower()
-    if status not in {"new", "acknowledged", "in_progress", "resolved", "closed"}:
-        return jsonify({"error": "invalid status"}), 400
+    body = request.validated
+    status = body.status
 
     db = get_db()
     uid, tenant_id = _uid_and_tenant()
@@ -183,27 +483,149 @@ def update_status(complaint_id):
         msg, code = existing
         return jsonify({"error": msg}), code
 
-    update = {"status": status, "updated_at": firestore.SERVER_TIMESTAMP}
+    # Kanban drag-and-drop: only this card gets a new rank. Either an explicit
+    # "rank" or the ids of the cards it was dropped between ("beforeId" above,
+    # "afterId" below).
+    extra = {}
+    if body.rank is not None:
+        extra["board_rank"] = body.rank
+    elif body.before_id or body.after_id:
+        try:
+            extra["board_rank"] = board_service.rank_for_move(
+                db, tenant_id, status, body.before_id, body.after_id)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+
     if status == "resolved":
-        update["resolution"] = {
-            "notes": body.get("resolutionNotes"),
-            "customerSatisfaction": body.get("customerSatisfaction"),
+        extra["resolution"] = {
+            "notes": body.resolution_notes,
+            "customerSatisfaction": body.customer_satisfaction,
             "resolvedAt": firestore.SERVER_TIMESTAMP,
             "resolvedBy": uid,
         }
-    ref.update(update)
-    return jsonify({"status": status, "message": "Status updated"})
+    _change_status(db, ref, tenant_id, uid, status, extra)
+    result = {"status": status, "message": "Status updated"}
+    if "board_rank" in extra:
+        result["rank"] = extra["board_rank"]
+    return respond(StatusUpdated, result)
+
+# -----------------------------------------------------------------------------
+# NEW: Assignment  PUT /api/complaints/<complaint_id>/assign
+# Body: { assignedTo: "<uid>" | null }  (manual override / unassign)
+#    or { auto: true }                  (least-loaded eligible support agent)
+# -----------------------------------------------------------------------------
+@complaints_bp.route("/<complaint_id>/assign", methods=["PUT"])
+@require_auth
+@require_permission("complaints", "assign")
+@validate_body(AssignIn)
+def assign_complaint(complaint_id):
+    body = request.validated
+    manual = "assigned_to" in body.model_fields_set
+    if not manual and not body.auto:
+        return jsonify({"error": "assignedTo or auto is required"}), 400
+
+    db = get_db()
+    uid, tenant_id = _uid_and_tenant()
+    if _bad(tenant_id):
+        return jsonify({"error": "Missing tenant_id on user"}), 401
+
+    ref = db.collection("complaints").document(complaint_id)
+    snap = ref.get()
+    ok, existing = _ensure_same_tenant(snap, tenant_id)
+    if not ok:
+        msg, code = existing
+        return jsonify({"error": msg}), code
+
+    engine = assignment_service.get_engine()
+    if manual:
+        assignee = None if _bad(body.assigned_to) else body.assigned_to
+        if assignee and not user_in_tenant(db, assignee, tenant_id):
+            return jsonify({"error": "assignedTo is not a user of this tenant"}), 400
+    else:
+        if not customer_stats.is_open(existing.get("status")):
+            return jsonify({"error": "only open complaints are auto-assigned"}), 409
+        assignee = engine.pick(db, tenant_id, existing.get("category"))
+        if assignee is None:
+            return jsonify({"error": "no eligible support agent"}), 409
+
+    committed = {}
+
+    @firestore.transactional
+    def _txn(transaction):
+        current = ref.get(transaction=transaction).to_dict() or {}
+        previous = current.get("assigned_to")
+        loads = assignment_service.load_deltas(previous, current.get("status"), assignee, current.get("status"))
+        transaction.update(ref, {
+            "assigned_to": assignee,
+            "assigned_date": firestore.SERVER_TIMESTAMP if assignee else None,
+            "auto_assigned": not manual,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+            # Plain datetime: SERVER_TIMESTAMP is not allowed inside array elements
+            "timeline": firestore.ArrayUnion([{
+                "timestamp": datetime.now(timezone.utc),
+                "action": "assigned",
+                "userId": uid,
+                "from": previous,
+                "to": assignee,
+            }]),
+        })
+        assignment_service.apply(transaction, db, tenant_id, loads)
+        committed["loads"] = loads
+
+    try:
+        _txn(db.transaction())
+    except Exception as e:
+        if not manual:
+            engine.release(tenant_id, assignee)
+        return jsonify({"error": str(e)}), 500
+    observed = dict(committed["loads"])
+    if not manual:
+        observed[assignee] = observed.get(assignee, 0) - 1     # already reserved by pick()
+    engine.observe(tenant_id, observed)
+    return respond(Assigned, {"assigned_to": assignee, "auto_assigned": not manual, "message": "Complaint assigned"})
+
+# -----------------------------------------------------------------------------
+# NEW: Agent load  GET /api/complaints/agents
+# -----------------------------------------------------------------------------
+@complaints_bp.route("/agents", methods=["GET"])
+@require_auth
+@require_permission("complaints", "assign")
+def agent_loads():
+    """Support agents with their open-ticket counts, least loaded first."""
+    try:
+        db = get_db()
+        _, tenant_id = _uid_and_tenant()
+        if _bad(tenant_id):
+            return jsonify({"error": "Missing tenant_id on user"}), 401
+        return respond(AgentLoads, {"agents": assignment_service.get_engine().snapshot(db, tenant_id)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _append_note(field, entry, action, uid, details):
+    """Update appending ``entry`` to ``field`` plus its timeline entry.
+
+    Plain datetime: SERVER_TIMESTAMP is not allowed inside array elements.
+    """
+    now = datetime.now(timezone.utc)
+    return {
+        field: firestore.ArrayUnion([{**entry, "timestamp": now}]),
+        "timeline": firestore.ArrayUnion([{
+            "timestamp": now, "action": action, "userId": uid, "details": details,
+        }]),
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
 
 # -----------------------------------------------------------------------------
 # EXISTING: Add internal comment (kept)  POST /api/complaints/<complaint_id>/comments
 # -----------------------------------------------------------------------------
 @complaints_bp.route("/<complaint_id>/comments", methods=["POST"])
 @require_auth
+@require_permission("complaints", "update")
+@validate_body(CommentIn)
 def add_internal_comment(complaint_id):
-    body = request.get_json(force=True) or {}
-    comment = (body.get("comment") or "").strip()
-    if not comment:
-        return jsonify({"error": "comment required"}), 400
+    comment = request.validated.comment
 
     db = get_db()
     uid, tenant_id = _uid_and_tenant()
@@ -217,32 +639,29 @@ def add_internal_comment(complaint_id):
         msg, code = _
         return jsonify({"error": msg}), code
 
-    ref.update({
-        "internal_comments": firestore.ArrayUnion([{
-            "userId": uid,
-            "comment": comment,
-            "timestamp": firestore.SERVER_TIMESTAMP,
-        }]),
-        "timeline": firestore.ArrayUnion([{
-            "timestamp": firestore.SERVER_TIMESTAMP,
-            "action": "internal_comment",
-            "userId": uid,
-            "details": comment[:140],
-        }]),
-        "updated_at": firestore.SERVER_TIMESTAMP,
-    })
-    return jsonify({"message": "Comment added"})
+    # the event is committed with the comment (transactional outbox)
+    batch = db.batch()
+    batch.update(ref, _append_note("internal_comments", {"userId": uid, "comment": comment},
+                                   "internal_comment", uid, comment[:140]))
+    current = snap.to_dict() or {}
+    outbox_service.enqueue(
+        batch, db, tenant_id, outbox_service.COMMENT_ADDED, complaint_id, uid,
+        {"comment": comment[:500], "customer_id": current.get("customer_id"),
+         "ticket_number": current.get("ticket_number")},
+        recipients=[current.get("assigned_to"), current.get("created_by")])
+    batch.commit()
+    outbox_service.notify()
+    return respond(Message, {"message": "Comment added"})
 
 # -----------------------------------------------------------------------------
 # EXISTING: Add customer update (kept)  POST /api/complaints/<complaint_id>/updates
 # -----------------------------------------------------------------------------
 @complaints_bp.route("/<complaint_id>/updates", methods=["POST"])
 @require_auth
+@require_permission("complaints", "update")
+@validate_body(CustomerUpdateIn)
 def add_customer_update(complaint_id):
-    body = request.get_json(force=True) or {}
-    message = (body.get("message") or "").strip()
-    if not message:
-        return jsonify({"error": "message required"}), 400
+    message = request.validated.message
 
     db = get_db()
     uid, tenant_id = _uid_and_tenant()
@@ -256,27 +675,25 @@ def add_customer_update(complaint_id):
         msg, code = _
         return jsonify({"error": msg}), code
 
-    ref.update({
-        "customer_updates": firestore.ArrayUnion([{
-            "message": message,
-            "timestamp": firestore.SERVER_TIMESTAMP,
-            "sentBy": uid,
-        }]),
-        "timeline": firestore.ArrayUnion([{
-            "timestamp": firestore.SERVER_TIMESTAMP,
-            "action": "customer_update",
-            "userId": uid,
-            "details": message[:140],
-        }]),
-        "updated_at": firestore.SERVER_TIMESTAMP,
-    })
-    return jsonify({"message": "Update recorded"})
+    batch = db.batch()
+    batch.update(ref, _append_note("customer_updates", {"message": message, "sentBy": uid},
+                                   "customer_update", uid, message[:140]))
+    current = snap.to_dict() or {}
+    outbox_service.enqueue(
+        batch, db, tenant_id, outbox_service.CUSTOMER_UPDATE, complaint_id, uid,
+        {"message": message, "customer_id": current.get("customer_id"),
+         "ticket_number": current.get("ticket_number")},
+        recipients=[current.get("assigned_to"), current.get("created_by")])
+    batch.commit()
+    outbox_service.notify()
+    return respond(Message, {"message": "Update recorded"})
 
 # -----------------------------------------------------------------------------
 # NEW: Delete (soft close)  DELETE /api/complaints/<complaint_id>
 # -----------------------------------------------------------------------------
 @complaints_bp.route("/<complaint_id>", methods=["DELETE"])
 @require_auth
+@require_permission("complaints", "delete")
 def delete_complaint(complaint_id):
     try:
         if _bad(complaint_id):
@@ -295,7 +712,7 @@ def delete_complaint(complaint_id):
             return jsonify({"error": msg}), code
 
         # Soft delete: mark closed (keeps history)
-        ref.update({"status": "closed", "updated_at": firestore.SERVER_TIMESTAMP})
+        _change_status(db, ref, tenant_id, uid, "closed")
         return jsonify({"message": "Complaint closed"}), 200
 
         # If you prefer hard delete, use:
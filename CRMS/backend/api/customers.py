@@ -1,15 +1,42 @@
 """Customer API endpoints"""
-from flask import Blueprint, request, jsonify,current_app
+from flask import Blueprint, request, jsonify,current_app, stream_with_context
 from utils.firebase import get_db
 from models.customer import Customer
-from api.auth import require_auth
+from api.auth import require_auth, require_permission
+from api.helpers import current_user, user_in_tenant
+from api.idempotency import idempotent
+from schemas import BulkResult, respond, validate_body
+from schemas.base import dump_json
+from schemas.customers import (
+    CustomerBulk, CustomerComplaints, CustomerCreate, CustomerList, CustomerLogs, CustomerOut,
+    CustomerSaved, CustomerUpdate, DuplicateCheck, DuplicateCheckResult, SegmentIn, SegmentList, SegmentOut,
+    SegmentUpdate,
+)
+from schemas.logs import LogOut
 from google.cloud.firestore_v1.base_query import FieldFilter
 from google.cloud import firestore
 from datetime import datetime,timezone
 from google.api_core.exceptions import FailedPrecondition
+from services import customer_stats, bulk_service, retention_service, segment_service
+from utils import cursors, query_planner, rbac, singleflight
+from utils.query_planner import QuerySpec, QueryNotIndexed, check_order, direction_of, DESC
+from services.dedup_service import blocking_keys, affects_keys, find_candidates, DUPLICATE_THRESHOLD
 
 customers_bp = Blueprint('customers', __name__)
 
+LOGS_PAGE_SIZE = 50
+MAX_LOGS_PAGE_SIZE = 200
+LOGS_STREAM_PAGE_SIZE = 500     # Firestore read page size for ?stream=1
+
+# orderBy values the list endpoints offer (each has an index in firestore.indexes.json)
+SORT_FIELDS = ('created_at', 'last_contact_date', 'last_activity_at', 'logs_count', 'logs_this_month',
+               'open_complaints')
+LOG_SORT_FIELDS = ('created_at',)
+
+# written by the server only; stripped from create/update bodies
+SERVER_FIELDS = {'id', 'tenant_id', 'created_at', 'created_by', 'updated_at', 'dedup_keys', 'segment_ids',
+                 *customer_stats.STAT_FIELDS}
+
 def _bad_id(x: str) -> bool:
     return (not x) or x.strip().lower() in {"undefined", "null", "none"}
 
@@ -17,6 +44,14 @@ def _safe_int(v, d):
     try: return int(v)
     except: return d
 
+def _tenant_id(db):
+    """Tenant from the principal enriched by @require_auth; fall back to users/{uid}."""
+    tenant_id = (request.user or {}).get('tenant_id')
+    if tenant_id:
+        return tenant_id
+    udoc = db.collection('users').document(request.user['uid']).get()
+    return (udoc.to_dict() or {}).get('tenant_id', 'default') if udoc.exists else 'default'
+
 def _parse_iso_dt(s):
     """Return timezone-aware UTC datetime (or None) from ISO or YYYY-MM-DD."""
     if not s: return None
@@ -28,11 +63,40 @@ def _parse_iso_dt(s):
     except Exception:
         return None
 
+def _list_spec(tenant_id, order_by='created_at', direction=DESC, status=None, type_filter=None,
+               owner_id=None, segment=None, has_open=False):
+    """QuerySpec behind GET /api/customers (tests plan it against firestore.indexes.json)."""
+    spec = QuerySpec('customers').where('tenant_id', '==', tenant_id)
+    if status:
+        spec.where('status', '==', status)
+    if type_filter:
+        spec.where('type', '==', type_filter)
+    if owner_id:
+        spec.where('owner_id', '==', owner_id)
+    if segment:
+        # membership is kept on the customer (services/segment_service.py)
+        spec.where('segment_ids', 'array_contains', segment)
+    # denormalized stats (services/customer_stats.py) – served by tenant_id composites
+    if has_open:
+        spec.where('open_complaints', '>', 0)
+    elif order_by == 'logs_this_month':
+        # the counter only means "this month" while stats_month is current
+        spec.where('stats_month', '==', customer_stats.month_key())
+    return spec.order(order_by, direction)
+
+def _logs_spec(tenant_id, customer_id, order_by='created_at', direction=DESC):
+    """QuerySpec behind GET /api/customers/:id/logs."""
+    return (QuerySpec('logs')
+            .where('tenant_id', '==', tenant_id)
+            .where('customer_id', '==', customer_id)
+            .order(order_by, direction))
+
+
 @customers_bp.route('', methods=['GET'])
 @require_auth
+@require_permission('customers', 'read')
 def list_customers():
     from flask import current_app
-    from google.api_core.exceptions import FailedPrecondition
 
     try:
         db = get_db()
@@ -55,47 +119,54 @@ def list_customers():
         status      = request.args.get('status')
         type_filter = request.args.get('type')
         owner_id    = request.args.get('ownerId') or request.args.get('owner_id')
+        segment     = (request.args.get('segment') or '').strip()
         search      = (request.args.get('search') or '').strip().lower()
+        has_open    = (request.args.get('hasOpenComplaints') or '').strip().lower() in {'1', 'true', 'yes'}
 
         # order
-        order_by  = (request.args.get('orderBy') or 'created_at').strip()
-        order_dir = (request.args.get('orderDir') or 'desc').strip().lower()
-        from google.cloud import firestore
-        direction = firestore.Query.DESCENDING if order_dir != 'asc' else firestore.Query.ASCENDING
-
-        # base query (tenant)
-        q = db.collection('customers').where(filter=FieldFilter('tenant_id', '==', tenant_id))
-        if status:
-            q = q.where(filter=FieldFilter('status', '==', status))
-        if type_filter:
-            q = q.where(filter=FieldFilter('type', '==', type_filter))
-        if owner_id:
-            q = q.where(filter=FieldFilter('owner_id', '==', owner_id))
-
-        # try requested order; fallback to created_at; then fallback to NO order if index missing
-        try:
-            q1 = q.order_by(order_by, direction=direction)
-            docs = list(q1.offset(offset).limit(pageSize).stream())
-        except Exception:
-            try:
-                current_app.logger.warning("customers.list: bad orderBy '%s' -> fallback 'created_at'", order_by)
-                q2 = q.order_by('created_at', direction=direction)
-                docs = list(q2.offset(offset).limit(pageSize).stream())
-            except FailedPrecondition:
-                current_app.logger.warning("customers.list: index missing -> fallback NO order")
-                docs = list(q.offset(offset).limit(pageSize).stream())
+        order_by  = check_order('customers', request.args.get('orderBy'), SORT_FIELDS)
+        direction = direction_of(request.args.get('orderDir') or 'desc')
+
+        if has_open:
+            order_by = 'open_complaints'
+
+        # base query (tenant); validated against firestore.indexes.json before running
+        spec = _list_spec(tenant_id, order_by, direction, status=status, type_filter=type_filter,
+                          owner_id=owner_id, segment=segment, has_open=has_open)
+
+        if (request.args.get('include') or '').strip().lower() == 'archived':
+            # explicit path that also reads customers moved out by retention
+            archive = spec.on(retention_service.archive_collection('customers'))
+            docs = [(d.id, d.to_dict()) for d in retention_service.merged_page(
+                query_planner.plan(spec).query(db), query_planner.plan(archive).query(db),
+                order_by, direction == DESC, offset, pageSize)]
+        else:
+            q = query_planner.plan(spec).query(db)
+            fetch = lambda: [(d.id, d.to_dict()) for d in q.offset(offset).limit(pageSize).stream()]
+            if page == 1:
+                # the dashboard's first page: identical concurrent loads share one query
+                # (search filters the rows afterwards, so it is not part of the key)
+                docs = singleflight.do(singleflight.make_key(tenant_id, 'customers.list', {
+                    'status': status, 'type': type_filter, 'owner_id': owner_id, 'segment': segment,
+                    'has_open': has_open,
+                    'order_by': order_by, 'direction': direction, 'limit': pageSize,
+                }), fetch)
+            else:
+                docs = fetch()
 
         items = []
-        for d in docs:
-            c = Customer.from_dict(d.id, d.to_dict()).to_dict(include_id=True)
+        for doc_id, data in docs:
+            c = Customer.from_dict(doc_id, dict(data or {})).to_dict(include_id=True)
             if search:
                 hay = (c.get('name','') + ' ' + c.get('email','') + ' ' + c.get('phone','') + ' ' + c.get('company','')).lower()
                 if search not in hay:
                     continue
             items.append(c)
 
-        return jsonify({'customers': items, 'page': page, 'limit': pageSize, 'returned': len(items)}), 200
+        return respond(CustomerList, {'customers': items, 'page': page, 'limit': pageSize, 'returned': len(items)})
 
+    except QueryNotIndexed as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         current_app.logger.exception("customers.list failed")
         # keep the UI alive; return empty list instead of 400/500
@@ -104,6 +175,7 @@ def list_customers():
 
 @customers_bp.route('/<customer_id>', methods=['GET'])
 @require_auth
+@require_permission('customers', 'read')
 def get_customer(customer_id):
     """Get a single customer by ID"""
     try:
@@ -117,13 +189,17 @@ def get_customer(customer_id):
 
        doc = db.collection('customers').document(customer_id).get()
        if not doc.exists:
+         if (request.args.get('include') or '').strip().lower() == 'archived':
+           archived = retention_service.get_archived(db, 'customers', customer_id, tenant_id)
+           if archived is not None:
+             return respond(CustomerOut, {**Customer.from_dict(customer_id, archived).to_dict(include_id=True), 'archived': True})
          return jsonify({'error': 'Customer not found'}), 404
        data = doc.to_dict() or {}
        if data.get('tenant_id') != tenant_id:
          return jsonify({'error': 'Forbidden: cross-tenant access'}), 403
 
        customer = Customer.from_dict(doc.id, data)
-       return jsonify(customer.to_dict(include_id=True)), 200
+       return respond(CustomerOut, customer.to_dict(include_id=True))
     except Exception as e:
         return jsonify({'error': str(e)}), 500     
         
@@ -132,12 +208,17 @@ def get_customer(customer_id):
 
 @customers_bp.route('', methods=['POST'])
 @require_auth
+@require_permission('customers', 'create')
+@idempotent
+@validate_body(CustomerCreate)
 def create_customer():
     """Create a new customer"""
     try:
         db = get_db()
         user_id = request.user['uid']
-        data = request.get_json(force=True) or {}
+        # server-maintained fields are never taken from the client (extra keys are allowed)
+        data = {k: v for k, v in request.validated.model_dump(exclude_unset=True).items()
+                if k not in SERVER_FIELDS}
 
         # Get user to determine tenant
         user_doc = db.collection('users').document(user_id).get()
@@ -145,31 +226,170 @@ def create_customer():
             return jsonify({'error': 'User not found'}), 404
         tenant_id = (user_doc.to_dict() or {}).get('tenant_id', 'default')
 
-        # Minimal validation
-        name = (data.get('name') or '').strip()
-        if not name:
-            return jsonify({'error': 'name is required'}), 400
-
         payload = {
             **data,
-            "name": name,
             "created_by": user_id,
             "tenant_id": tenant_id,
             "created_at": firestore.SERVER_TIMESTAMP,
             "updated_at": firestore.SERVER_TIMESTAMP,
         }
+        payload["dedup_keys"] = blocking_keys(payload)
+        payload.update(customer_stats.initial_stats())
+        payload["segment_ids"] = []
+        payload["segment_ids"], added, _ = segment_service.on_write(db, tenant_id, {}, payload)
         doc_ref = db.collection('customers').document()
         payload["id"] = doc_ref.id
         doc_ref.set(payload)
+        segment_service.queue_counts(segment_service.count_deltas(added, ()))
 
-        return jsonify({'message': 'Customer created successfully', 'customer': payload}), 201
+        return respond(CustomerSaved, {'message': 'Customer created successfully', 'customer': payload}, 201)
     except Exception as e:
         current_app.logger.exception("customers.create failed")
         return jsonify({'error': 'internal_error', 'detail': str(e)}), 500
 
 
+@customers_bp.route('/check-duplicates', methods=['POST'])
+@require_auth
+@require_permission('customers', 'read')
+@validate_body(DuplicateCheck)
+def check_duplicates():
+    """
+    Pre-create duplicate check.
+    Body: { name, email, phone, secondary_phone?, secondary_email?, excludeId?, limit? }
+    One indexed query on dedup_keys; candidates are scored in memory.
+    """
+    try:
+        db = get_db()
+        tenant_id = _tenant_id(db)
+        body = request.validated
+        data = body.model_dump(exclude_none=True, exclude={'limit', 'exclude_id'})
+        limit = min(max(body.limit, 1), 50)
+        exclude_id = body.exclude_id
+
+        keys = blocking_keys(data)
+        if not keys:
+            return jsonify({'error': 'name, email or phone is required'}), 400
+
+        candidates = find_candidates(db, tenant_id, data, limit=limit, exclude_id=exclude_id)
+        return respond(DuplicateCheckResult, {
+            'keys': keys,
+            'candidates': candidates,
+            'has_duplicates': any(c['score'] >= DUPLICATE_THRESHOLD for c in candidates),
+        })
+    except Exception as e:
+        current_app.logger.exception("customers.check_duplicates failed")
+        return jsonify({'error': str(e)}), 500
+
+
+CUSTOMER_STATUSES = {'active', 'inactive', 'prospect', 'archived'}
+
+def _customer_bulk_update(op, params):
+    """Return (field_updates, error) for one bulk operation."""
+    if op == 'archive':
+        return {'status': 'archived'}, None
+    if op == 'restore':
+        return {'status': 'active'}, None
+    if op == 'set_status':
+        status = (params.get('status') or '').strip().lower()
+        if status not in CUSTOMER_STATUSES:
+            return None, f'status must be one of {sorted(CUSTOMER_STATUSES)}'
+        return {'status': status}, None
+    if op == 'assign':
+        owner_id = params.get('ownerId') or params.get('owner_id')
+        if _bad_id(owner_id or ''):
+            return None, 'ownerId is required'
+        return {'owner_id': owner_id}, None
+    if op in ('add_tags', 'remove_tags'):
+        tags = [str(t).strip() for t in (params.get('tags') or []) if str(t).strip()]
+        if not tags:
+            return None, 'tags is required'
+        transform = firestore.ArrayUnion(tags) if op == 'add_tags' else firestore.ArrayRemove(tags)
+        return {'tags': transform}, None
+    return None, 'unknown operation'
+
+
+def _write_with_membership(db, ref, update, added, removed):
+    """Merge ``update`` into the customer with its segment membership change in the same commit."""
+    batch = db.batch()
+    extra = segment_service.stage(update, added, removed)
+    batch.set(ref, update, merge=True)
+    if extra:
+        batch.update(ref, extra)
+    batch.commit()
+    segment_service.queue_counts(segment_service.count_deltas(added, removed))
+
+def _preview(doc, fields):
+    """``doc`` as it will read after ``fields`` (tag transforms applied) - for segment matching."""
+    after = {**doc, **fields}
+    tags = fields.get('tags')
+    if isinstance(tags, (firestore.ArrayUnion, firestore.ArrayRemove)):
+        current = list(doc.get('tags') or [])
+        if isinstance(tags, firestore.ArrayUnion):
+            after['tags'] = current + [t for t in tags.values if t not in current]
+        else:
+            after['tags'] = [t for t in current if t not in tags.values]
+    return after
+
+
+@customers_bp.route('/bulk', methods=['POST'])
+@require_auth
+@require_permission('customers', 'update')
+@validate_body(CustomerBulk)
+def bulk_customers():
+    """
+    Body: { ids: [...], operation: archive|restore|set_status|assign|add_tags|remove_tags,
+            status?, ownerId?, tags? }
+    Tenant ownership is checked with batched get_all; writes go through a BulkWriter.
+    """
+    try:
+        db = get_db()
+        tenant_id = _tenant_id(db)
+        data = request.validated.model_dump()
+        op = data['operation'].strip().lower()
+        # archive/restore are (soft) deletes
+        if op in ('archive', 'restore') and not rbac.allowed(current_user().get('role'), 'customers', 'delete'):
+            return jsonify({'error': 'Forbidden: missing permission customers:delete'}), 403
+        ids = bulk_service.clean_ids(data.get('ids'))
+        if not ids:
+            return jsonify({'error': 'ids is required'}), 400
+        if len(ids) > bulk_service.MAX_BULK_IDS:
+            return jsonify({'error': f'at most {bulk_service.MAX_BULK_IDS} ids per request'}), 400
+
+        fields, err = _customer_bulk_update(op, data)
+        if err:
+            return jsonify({'error': err}), 400
+        if 'owner_id' in fields and not user_in_tenant(db, fields['owner_id'], tenant_id):
+            return jsonify({'error': 'ownerId is not a user of this tenant'}), 400
+        fields['updated_at'] = firestore.SERVER_TIMESTAMP
+
+        owned, results = bulk_service.load_owned(db, 'customers', ids, tenant_id,
+                                                 field_paths=segment_service.RULE_FIELDS)
+        pairs, moves = [], {}
+        for cid, (ref, cur) in owned.items():
+            update = dict(fields)
+            _, added, removed = segment_service.on_write(db, tenant_id, cur, _preview(cur, fields))
+            extra = segment_service.stage(update, added, removed)
+            moves[cid] = (added, removed)
+            pairs.append((ref, update))
+            if extra:
+                pairs.append((ref, extra))
+        bulk_service.bulk_update(db, pairs, results)
+
+        counts = {}
+        for cid, (added, removed) in moves.items():
+            if results.get(cid, {}).get('ok'):
+                segment_service.count_deltas(added, removed, counts)
+        segment_service.queue_counts(counts)
+        return respond(BulkResult, bulk_service.summarize(op, ids, results))
+    except Exception as e:
+        current_app.logger.exception("customers.bulk failed")
+        return jsonify({'error': str(e)}), 500
+
+
 @customers_bp.route('/<customer_id>', methods=['PUT'])
 @require_auth
+@require_permission('customers', 'update')
+@validate_body(CustomerUpdate)
 def update_customer(customer_id):
     """Update an existing customer"""
     try:
@@ -191,18 +411,20 @@ def update_customer(customer_id):
         if existing.get('tenant_id') != tenant_id:
             return jsonify({'error': 'Forbidden: cross-tenant update'}), 403
 
-        data = request.get_json(force=True) or {}
+        data = request.validated.model_dump(exclude_unset=True)
         # Only allow safe fields
-        blocked = {'id', 'tenant_id', 'created_at', 'created_by'}
-        delta = {k: v for k, v in data.items() if k not in blocked}
+        delta = {k: v for k, v in data.items() if k not in SERVER_FIELDS}
         if not delta:
             return jsonify({'message': 'No changes'}), 200
 
+        if affects_keys(delta):
+            delta['dedup_keys'] = blocking_keys({**existing, **delta})
         delta['updated_at'] = firestore.SERVER_TIMESTAMP
-        ref.set(delta, merge=True)
+        ids, added, removed = segment_service.on_write(db, tenant_id, existing, {**existing, **delta})
+        _write_with_membership(db, ref, delta, added, removed)
 
-        merged = {**existing, **delta, "id": customer_id}
-        return jsonify({'message': 'Customer updated successfully', 'customer': merged}), 200
+        merged = {**existing, **delta, "segment_ids": ids, "id": customer_id}
+        return respond(CustomerSaved, {'message': 'Customer updated successfully', 'customer': merged})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -210,6 +432,7 @@ def update_customer(customer_id):
 
 @customers_bp.route('/<customer_id>', methods=['DELETE'])
 @require_auth
+@require_permission('customers', 'delete')
 def delete_customer(customer_id):
     """Delete a customer"""
     try:
@@ -227,11 +450,14 @@ def delete_customer(customer_id):
         snap = ref.get()
         if not snap.exists:
             return jsonify({'error': 'Customer not found'}), 404
-        if (snap.to_dict() or {}).get('tenant_id') != tenant_id:
+        existing = snap.to_dict() or {}
+        if existing.get('tenant_id') != tenant_id:
             return jsonify({'error': 'Forbidden: cross-tenant delete'}), 403
 
         # Soft delete - archive + timestamp
-        ref.set({'status': 'archived', 'updated_at': firestore.SERVER_TIMESTAMP}, merge=True)
+        update = {'status': 'archived', 'updated_at': firestore.SERVER_TIMESTAMP}
+        _, added, removed = segment_service.on_write(db, tenant_id, existing, {**existing, **update})
+        _write_with_membership(db, ref, update, added, removed)
         return jsonify({'message': 'Customer deleted (archived) successfully'}), 200
         
     except Exception as e:
@@ -240,11 +466,16 @@ def delete_customer(customer_id):
 
 @customers_bp.route('/<customer_id>/logs', methods=['GET'])
 @require_auth
+@require_permission('logs', 'read')
 def get_customer_logs(customer_id):
-    """Get all logs for a customer (tenant-aware, JSON-safe)."""
+    """
+    Logs of a customer (tenant-aware), one bounded page at a time.
+
+    Query: limit (default 50, max 200), cursor (``nextCursor`` of the previous
+    page), orderBy/orderDir. ``stream=1`` instead returns every log as one JSON
+    array, written while the logs are read from Firestore page by page.
+    """
     from flask import current_app
-    from google.api_core.exceptions import FailedPrecondition
-    from google.cloud import firestore
 
     try:
         if _bad_id(customer_id):
@@ -257,59 +488,61 @@ def get_customer_logs(customer_id):
         udoc = db.collection('users').document(uid).get()
         tenant_id = (udoc.to_dict() or {}).get('tenant_id', 'default') if udoc.exists else 'default'
 
-        # optional order params
-        order_by  = (request.args.get('orderBy') or 'created_at').strip()
-        order_dir = (request.args.get('orderDir') or 'desc').strip().lower()
-        direction = firestore.Query.DESCENDING if order_dir != 'asc' else firestore.Query.ASCENDING
+        # optional order params (validated against the index file; 400 when unsupported)
+        order_by  = check_order('logs', request.args.get('orderBy'), LOG_SORT_FIELDS)
+        order_dir = direction_of(request.args.get('orderDir') or 'desc')
+        query = query_planner.plan(_logs_spec(tenant_id, customer_id, order_by, order_dir)).query(db)
 
-        # base query
-        q = (db.collection('logs')
-               .where(filter=FieldFilter('tenant_id', '==', tenant_id))
-               .where(filter=FieldFilter('customer_id', '==', customer_id)))
+        if request.args.get('stream') in ('1', 'true'):
+            return current_app.response_class(stream_with_context(_stream_logs(query, order_dir)),
+                                              mimetype='application/json')
 
-        # try requested order; fallback to created_at; fallback to no order
+        limit = min(max(_safe_int(request.args.get('limit', request.args.get('pageSize')), LOGS_PAGE_SIZE), 1),
+                    MAX_LOGS_PAGE_SIZE)
         try:
-            q1 = q.order_by(order_by, direction=direction)
-            docs = list(q1.stream())
-        except Exception:
-            try:
-                current_app.logger.warning("customer logs: bad orderBy '%s' -> fallback 'created_at'", order_by)
-                q2 = q.order_by('created_at', direction=direction)
-                docs = list(q2.stream())
-            except FailedPrecondition:
-                current_app.logger.warning("customer logs: index missing -> fallback NO order")
-                docs = list(q.stream())
-
-        def _to_json_safe(d: dict):
-            out = dict(d or {})
-            # normalize common timestamp fields
-            for k in ('created_at', 'updated_at', 'log_date', 'next_action_date'):
-                v = out.get(k)
-                if v is not None:
-                    # Firestore Timestamp and datetime both have isoformat()
-                    try:
-                        out[k] = v.isoformat()
-                    except Exception:
-                        # best-effort stringify
-                        out[k] = str(v)
-            return out
-
-        logs = [{ 'id': doc.id, **_to_json_safe(doc.to_dict()) } for doc in docs]
-
-        return jsonify({
-            'logs': logs,
-            'total': len(logs)
-        }), 200
-
+            result = cursors.page(query, order_by, order_dir, limit, request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # timestamps come out as ISO 8601 through the response schema
+        return respond(CustomerLogs, {
+            'logs': result['rows'],
+            'limit': limit,
+            'returned': len(result['rows']),
+            'nextCursor': result['nextCursor'],
+            'hasMore': result['hasMore'],
+        })
+
+    except QueryNotIndexed as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         # keep UI alive and log the error
         current_app.logger.exception("get_customer_logs failed")
-        return jsonify({'logs': [], 'total': 0, '__error': str(e)}), 200
+        return jsonify({'logs': [], 'returned': 0, '__error': str(e)}), 200
+
 
+def _stream_logs(query, order_dir):
+    """JSON array of all logs; one Firestore page in memory at a time."""
+    yield b'['
+    first = True
+    try:
+        for docs in cursors.iter_pages(query, order_dir, LOGS_STREAM_PAGE_SIZE):
+            for doc in docs:
+                if not first:
+                    yield b','
+                first = False
+                yield dump_json(LogOut, {'id': doc.id, **(doc.to_dict() or {})})
+    except Exception:
+        # the 200 is already sent: leave the array unterminated so the client
+        # sees a parse error instead of a silently truncated list
+        current_app.logger.exception("get_customer_logs stream failed")
+        return
+    yield b']'
 
 
 @customers_bp.route('/<customer_id>/complaints', methods=['GET'])
 @require_auth
+@require_permission('complaints', 'read')
 def get_customer_complaints(customer_id):
     """Get all complaints for a customer"""
     try:
@@ -336,9 +569,156 @@ def get_customer_complaints(customer_id):
         docs = list(query.offset(offset).limit(pageSize).stream())
         items = [{'id': d.id, **(d.to_dict() or {})} for d in docs]
 
-        return jsonify({'complaints': items, 'page': page, 'limit': pageSize, 'returned': len(items)}), 200
+        return respond(CustomerComplaints, {'complaints': items, 'page': page, 'limit': pageSize, 'returned': len(items)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# ---------- saved segments ----------
+
+def _segment_row(snap):
+    return {'id': snap.id, **(snap.to_dict() or {})}
+
+def _owned_segment(db, tenant_id, segment_id):
+    """(ref, data) of the tenant's segment, or (None, error response)."""
+    if _bad_id(segment_id):
+        return None, (jsonify({'error': 'segment_id is required'}), 400)
+    ref = segment_service.segment_ref(db, segment_id)
+    snap = ref.get()
+    if not snap.exists or (snap.to_dict() or {}).get('tenant_id') != tenant_id:
+        return None, (jsonify({'error': 'Segment not found'}), 404)
+    return ref, snap.to_dict() or {}
+
+
+@customers_bp.route('/segments', methods=['GET'])
+@require_auth
+@require_permission('customers', 'read')
+def list_segments():
+    """Saved segments with their member counts; list members with GET /api/customers?segment=<id>."""
+    try:
+        db = get_db()
+        tenant_id = _tenant_id(db)
+        q = db.collection(segment_service.SEGMENTS).where(filter=FieldFilter('tenant_id', '==', tenant_id))
+        rows = sorted((_segment_row(s) for s in q.stream()), key=lambda r: (r.get('name') or '').lower())
+        return respond(SegmentList, {'segments': rows, 'total': len(rows)})
+    except Exception as e:
+        current_app.logger.exception("customers.segments.list failed")
+        return jsonify({'error': str(e)}), 500
+
+
+@customers_bp.route('/segments', methods=['POST'])
+@require_auth
+@require_permission('customers', 'update')
+@validate_body(SegmentIn)
+def create_segment():
+    """
+    Body: { name, description?, rule }. Membership is built in the background
+    (status "building" until the first count is in), then kept up to date on
+    every customer write.
+    """
+    try:
+        db = get_db()
+        tenant_id = _tenant_id(db)
+        body = request.validated
+        try:
+            segment_service.validate_rule(body.rule)
+        except ValueError as e:
+            return jsonify({'error': 'Invalid rule', 'detail': str(e)}), 400
+        if len(segment_service.segments_of(db, tenant_id)) >= segment_service.MAX_SEGMENTS:
+            return jsonify({'error': f'at most {segment_service.MAX_SEGMENTS} segments per tenant'}), 400
+
+        ref = db.collection(segment_service.SEGMENTS).document()
+        payload = {
+            'id': ref.id,
+            'tenant_id': tenant_id,
+            'name': body.name,
+            'description': body.description,
+            'rule': body.rule,
+            'count': 0,
+            'status': segment_service.STATUS_BUILDING,
+            'time_dependent': bool(segment_service.day_boundaries(body.rule)),
+            'created_by': request.user['uid'],
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP,
+        }
+        ref.set(payload)
+        segment_service.invalidate(tenant_id)
+        segment_service.build_in_background(db, tenant_id, ref.id, body.rule)
+        return respond(SegmentOut, payload, 201)
+    except Exception as e:
+        current_app.logger.exception("customers.segments.create failed")
+        return jsonify({'error': str(e)}), 500
+
+
+@customers_bp.route('/segments/<segment_id>', methods=['GET'])
+@require_auth
+@require_permission('customers', 'read')
+def get_segment(segment_id):
+    try:
+        db = get_db()
+        ref, data = _owned_segment(db, _tenant_id(db), segment_id)
+        if ref is None:
+            return data
+        return respond(SegmentOut, {**data, 'id': segment_id})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@customers_bp.route('/segments/<segment_id>', methods=['PUT'])
+@require_auth
+@require_permission('customers', 'update')
+@validate_body(SegmentUpdate)
+def update_segment(segment_id):
+    """Rename, or change the rule (members are rebuilt in the background)."""
+    try:
+        db = get_db()
+        tenant_id = _tenant_id(db)
+        ref, data = _owned_segment(db, tenant_id, segment_id)
+        if ref is None:
+            return data
+        delta = request.validated.model_dump(exclude_unset=True)
+        rule = delta.get('rule')
+        if rule is not None:
+            try:
+                segment_service.validate_rule(rule)
+            except ValueError as e:
+                return jsonify({'error': 'Invalid rule', 'detail': str(e)}), 400
+            if rule == data.get('rule'):
+                rule = None
+            else:
+                delta.update(status=segment_service.STATUS_BUILDING,
+                             time_dependent=bool(segment_service.day_boundaries(rule)))
+        delta = {k: v for k, v in delta.items() if v is not None or k == 'description'}
+        if not delta:
+            return jsonify({'message': 'No changes'}), 200
+
+        delta['updated_at'] = firestore.SERVER_TIMESTAMP
+        ref.set(delta, merge=True)
+        if rule is not None:
+            segment_service.invalidate(tenant_id)
+            segment_service.build_in_background(db, tenant_id, segment_id, rule)
+        return respond(SegmentOut, {**data, **delta, 'id': segment_id})
+    except Exception as e:
+        current_app.logger.exception("customers.segments.update failed")
+        return jsonify({'error': str(e)}), 500
+
+
+@customers_bp.route('/segments/<segment_id>', methods=['DELETE'])
+@require_auth
+@require_permission('customers', 'update')
+def delete_segment(segment_id):
+    """Delete the definition; its id is removed from the members in the background."""
+    try:
+        db = get_db()
+        tenant_id = _tenant_id(db)
+        ref, data = _owned_segment(db, tenant_id, segment_id)
+        if ref is None:
+            return data
+        ref.delete()
+        segment_service.invalidate(tenant_id)
+        segment_service.build_in_background(db, tenant_id, segment_id, None)
+        return jsonify({'message': 'Segment deleted', 'id': segment_id}), 200
+    except Exception as e:
+        current_app.logger.exception("customers.segments.delete failed")
+        return jsonify({'error': str(e)}), 500
@@ -4,3 +4,8 @@ from flask import request
 def current_user():
     """Return the user dict attached by @require_auth, or {} if missing."""
     return getattr(request, "user", {}) or {}
+
+def user_in_tenant(db, uid, tenant_id):
+    """True if ``users/{uid}`` exists and belongs to ``tenant_id`` (assignee/owner checks)."""
+    snap = db.collection("users").document(uid).get(field_paths=["tenant_id"])
+    return snap.exists and (snap.to_dict() or {}).get("tenant_id") == tenant_id
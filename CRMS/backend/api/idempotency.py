@@ -0,0 +1,136 @@
+# backend/api/idempotency.py
+"""
+Idempotency-Key support for create endpoints.
+
+Usage (below @require_auth so the tenant is known):
+
+    @customers_bp.route('', methods=['POST'])
+    @require_auth
+    @idempotent
+    def create_customer(): ...
+
+The first request with a given key claims ``idempotency_keys/{tenant}_{sha256(key)}``
+in a transaction, so concurrent duplicates collapse to one handler run: the
+losers get 409 while the first is still running and the stored response once
+it has finished. Retries replay the original status/body without writing.
+Reusing a key with a different body is a 422. 5xx responses release the key
+so the client can retry. Records expire via a Firestore TTL on ``expires_at``.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import request, jsonify, make_response, Response
+from google.cloud import firestore
+
+from utils.firebase import get_db
+from .helpers import current_user
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+COLLECTION = "idempotency_keys"
+TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))   # in-progress claim from a crashed worker expires
+MAX_KEY_LENGTH = 255
+MAX_STORED_BODY = 256 * 1024
+
+
+def _fingerprint():
+    h = hashlib.sha256()
+    h.update(request.method.encode())
+    h.update(b"\0")
+    h.update(request.path.encode())
+    h.update(b"\0")
+    h.update(request.get_data(cache=True) or b"")  # cached: the view can still call get_json()
+    return h.hexdigest()
+
+
+def _claim(db, ref, tenant_id, uid, fingerprint):
+    """Returns ("claimed"|"replay"|"busy"|"mismatch", record)."""
+
+    @firestore.transactional
+    def _txn(transaction):
+        now = datetime.now(timezone.utc)
+        snap = ref.get(transaction=transaction)
+        if snap.exists:
+            rec = snap.to_dict() or {}
+            expires_at = rec.get("expires_at")
+            if expires_at is None or expires_at > now:
+                if rec.get("fingerprint") != fingerprint:
+                    return "mismatch", rec
+                if rec.get("state") == "complete":
+                    return "replay", rec
+                locked_until = rec.get("locked_until")
+                if locked_until is not None and locked_until > now:
+                    return "busy", rec
+        transaction.set(ref, {
+            "tenant_id": tenant_id,
+            "created_by": uid,
+            "method": request.method,
+            "path": request.path,
+            "fingerprint": fingerprint,
+            "state": "in_progress",
+            "locked_until": now + timedelta(seconds=LOCK_SECONDS),
+            "expires_at": now + timedelta(hours=TTL_HOURS),
+            "created_at": firestore.SERVER_TIMESTAMP,
+        })
+        return "claimed", None
+
+    return _txn(db.transaction())
+
+
+def _replay(rec):
+    resp = Response(rec.get("body") or "", status=int(rec.get("status_code") or 200),
+                    mimetype=rec.get("mimetype") or "application/json")
+    resp.headers[REPLAY_HEADER] = "true"
+    return resp
+
+
+def idempotent(fn):
+    @wraps(fn)
+    def wrapped(*args, **kwargs):
+        key = (request.headers.get(HEADER) or "").strip()
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        user = current_user()
+        tenant_id = user.get("tenant_id") or (user.get("claims") or {}).get("tenant_id") or "default"
+        db = get_db()
+        ref = db.collection(COLLECTION).document(
+            f"{tenant_id}_{hashlib.sha256(key.encode('utf-8')).hexdigest()}")
+
+        outcome, rec = _claim(db, ref, tenant_id, user.get("uid"), _fingerprint())
+        if outcome == "replay":
+            return _replay(rec)
+        if outcome == "mismatch":
+            return jsonify({"error": f"{HEADER} was already used with a different request"}), 422
+        if outcome == "busy":
+            resp = jsonify({"error": "A request with this Idempotency-Key is still in progress"})
+            resp.headers["Retry-After"] = "1"
+            return resp, 409
+
+        try:
+            resp = make_response(fn(*args, **kwargs))
+        except Exception:
+            ref.delete()
+            raise
+
+        if resp.status_code >= 500 or resp.is_streamed:
+            ref.delete()            # not a final answer; let the client retry
+            return resp
+        body = resp.get_data(as_text=True)
+        if len(body.encode("utf-8")) > MAX_STORED_BODY:
+            # keep the record under Firestore's document limit; the retry still writes nothing
+            body = '{"message": "Request already processed"}'
+        ref.update({
+            "state": "complete",
+            "status_code": resp.status_code,
+            "body": body,
+            "mimetype": resp.mimetype,
+            "completed_at": firestore.SERVER_TIMESTAMP,
+        })
+        return resp
+    return wrapped
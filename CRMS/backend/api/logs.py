@@ -5,11 +5,20 @@ from google.cloud import firestore
 from google.cloud.firestore_v1 import FieldFilter
 
 from utils.firebase import get_db
+from utils import query_planner
+from utils.query_planner import QuerySpec, QueryNotIndexed, check_order, direction_of, DESC
 from models.log import Log
-from api.auth import require_auth
+from api.auth import require_auth, require_permission
+from api.idempotency import idempotent
+from schemas import respond, validate_body
+from schemas.logs import LogCreate, LogList, LogOut, LogSaved, LogUpdate
+from services import rollup_service, customer_stats, retention_service, segment_service, sync_service
 
 logs_bp = Blueprint("logs", __name__)
 
+# orderBy values GET /api/logs offers (indexed in firestore.indexes.json)
+SORT_FIELDS = ("created_at",)
+
 # ---------- helpers ----------
 
 def _safe_int(v, default):
@@ -36,15 +45,96 @@ def _tenant_id(db, uid):
 def _forbidden_cross_tenant(doc_data, tenant_id):
     return (doc_data or {}).get("tenant_id") != tenant_id
 
+def _list_spec(tenant_id, order_by="created_at", direction=DESC, customer_id=None, log_type=None,
+               from_dt=None, to_dt=None):
+    """QuerySpec behind GET /api/logs (tests plan it against firestore.indexes.json)."""
+    spec = QuerySpec("logs").where("tenant_id", "==", tenant_id)
+    if customer_id:
+        spec.where("customer_id", "==", customer_id)
+    if log_type:
+        spec.where("type", "==", log_type)
+    if from_dt:
+        spec.where("created_at", ">=", from_dt)
+    if to_dt:
+        spec.where("created_at", "<=", to_dt)
+    return spec.order(order_by, direction)
+
+def _read_customer(transaction, db, tenant_id, customer_id):
+    """(ref, data) of the tenant's customer inside a transaction; (None, None) if absent/foreign."""
+    if not customer_id:
+        return None, None
+    ref = db.collection("customers").document(customer_id)
+    data = customer_stats.read_customer(transaction, ref, tenant_id)
+    return (ref, data) if data is not None else (None, None)
+
+def _apply_log_update(db, ref, tenant_id, delta):
+    """
+    Write ``delta`` to the log; when it moves the log to another customer the
+    activity counters move with it, and a type change moves the log between
+    the rollup's ``by_type`` buckets, in the same transaction. Returns the log
+    as it was. LookupError if the target customer is not one of the tenant's.
+    """
+    moved = {}
+
+    @firestore.transactional
+    def _txn(transaction):
+        moved.clear()
+        existing = ref.get(transaction=transaction).to_dict() or {}
+        old_cid, new_cid = existing.get("customer_id"), delta.get("customer_id", existing.get("customer_id"))
+        if new_cid != old_cid:
+            new_ref, new_customer = _read_customer(transaction, db, tenant_id, new_cid)
+            if new_ref is None:
+                raise LookupError("customer_id must be a customer of your tenant")
+            old_ref, old_customer = _read_customer(transaction, db, tenant_id, old_cid)
+            if old_ref is not None:
+                transaction.update(old_ref, customer_stats.log_removed_update(old_customer, existing))
+            update = customer_stats.log_moved_in_update(new_customer, existing)
+            _, added, removed = segment_service.on_write(db, tenant_id, new_customer, {**new_customer, **update})
+            extra = segment_service.stage(update, added, removed)
+            moved.update(segment_service.count_deltas(added, removed))
+            transaction.update(new_ref, update)
+            if extra:
+                transaction.update(new_ref, extra)
+        if "type" in delta:
+            retyped = rollup_service.log_type_change_increments(existing.get("type"), delta["type"])
+            if retyped:
+                rollup_service.apply(transaction, db, tenant_id, retyped, day=rollup_service.log_day(existing))
+        transaction.set(ref, delta, merge=True)
+        return existing
+
+    existing = _txn(db.transaction())
+    segment_service.queue_counts(moved)
+    return existing
+
+def _delete_log(db, ref, tenant_id):
+    """Hard delete + tombstone + the customer's counters and the day's rollup taken back, in one transaction."""
+
+    @firestore.transactional
+    def _txn(transaction):
+        log = ref.get(transaction=transaction).to_dict() or {}
+        customer_ref, customer = _read_customer(transaction, db, tenant_id, log.get("customer_id"))
+        if customer_ref is not None:
+            transaction.update(customer_ref, customer_stats.log_removed_update(customer, log))
+        rollup_service.apply(transaction, db, tenant_id, rollup_service.log_increments(log, -1),
+                             day=rollup_service.log_day(log))
+        transaction.delete(ref)
+        # tombstone in the same commit so synced clients drop it too
+        sync_service.stage_tombstone(transaction, db, tenant_id, "logs", ref.id)
+        return log
+
+    return _txn(db.transaction())
+
 # ---------- routes ----------
 
 @logs_bp.route("", methods=["GET"])
 @require_auth
+@require_permission("logs", "read")
 def list_logs():
     """
     GET /logs  (via app's url_prefix)
     PRD filters: customerId, type, start/end -> 'from'/'to', page, limit, orderBy, orderDir
     Backward-compatible aliases: pageSize, customer_id
+    include=archived also pages through logs moved to logs_archive by retention.
     """
     try:
         db = get_db()
@@ -65,31 +155,24 @@ def list_logs():
         from_dt = _parse_iso_dt(request.args.get("from") or request.args.get("startDate"))
         to_dt   = _parse_iso_dt(request.args.get("to") or request.args.get("endDate"))
 
-        # Ordering (default newest first)
-        order_by = (request.args.get("orderBy") or "created_at").strip()
-        order_dir = (request.args.get("orderDir") or "desc").strip().lower()
-        direction = firestore.Query.DESCENDING if order_dir != "asc" else firestore.Query.ASCENDING
+        # Ordering (default newest first); validated against firestore.indexes.json
+        order_by = check_order("logs", request.args.get("orderBy"), SORT_FIELDS)
+        direction = direction_of(request.args.get("orderDir") or "desc")
 
-        # Base query: tenant isolation
-        query = db.collection("logs").where(filter=FieldFilter("tenant_id", "==", tenant_id))
-
-        if customer_id:
-            query = query.where(filter=FieldFilter("customer_id", "==", customer_id))
-        if log_type:
-            query = query.where(filter=FieldFilter("type", "==", log_type))
-        if from_dt:
-            query = query.where(filter=FieldFilter("created_at", ">=", from_dt))
-        if to_dt:
-            query = query.where(filter=FieldFilter("created_at", "<=", to_dt))
-
-        # Firestore requires order_by with inequality; also guard unknown fields
-        try:
-            query = query.order_by(order_by, direction=direction)
-        except Exception:
-            query = query.order_by("created_at", direction=direction)
+        include_archived = (request.args.get("include") or "").strip().lower() == "archived"
 
-        # Simple offset pagination (MVP). For large sets, move to cursor-based.
-        docs = list(query.offset(offset).limit(page_size).stream())
+        # Base query: tenant isolation
+        spec = _list_spec(tenant_id, order_by, direction, customer_id=customer_id, log_type=log_type,
+                          from_dt=from_dt, to_dt=to_dt)
+
+        if include_archived:
+            archive = spec.on(retention_service.archive_collection("logs"))
+            docs = retention_service.merged_page(
+                query_planner.plan(spec).query(db), query_planner.plan(archive).query(db),
+                order_by, direction == DESC, offset, page_size)
+        else:
+            # Simple offset pagination (MVP). For large sets, move to cursor-based.
+            docs = list(query_planner.plan(spec).query(db).offset(offset).limit(page_size).stream())
 
         items = []
         for d in docs:
@@ -109,19 +192,22 @@ def list_logs():
                     continue
             items.append(data)
 
-        return jsonify({
+        return respond(LogList, {
             "logs": items,
             "page": page,
             "limit": page_size,
             "returned": len(items)
-        }), 200
+        })
 
+    except QueryNotIndexed as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @logs_bp.route("/<log_id>", methods=["GET"])
 @require_auth
+@require_permission("logs", "read")
 def get_log(log_id):
     """GET /logs/:id — with tenant check"""
     try:
@@ -134,6 +220,10 @@ def get_log(log_id):
 
         doc = db.collection("logs").document(log_id).get()
         if not doc.exists:
+            if (request.args.get("include") or "").strip().lower() == "archived":
+                archived = retention_service.get_archived(db, "logs", log_id, tenant_id)
+                if archived is not None:
+                    return respond(LogOut, {**Log.from_dict(log_id, archived).to_dict(), "id": log_id, "archived": True})
             return jsonify({"error": "Log not found"}), 404
 
         data = doc.to_dict() or {}
@@ -142,7 +232,7 @@ def get_log(log_id):
 
         # Normalize via model (keeps your existing serializer behavior)
         log = Log.from_dict(doc.id, data)
-        return jsonify(log.to_dict()), 200
+        return respond(LogOut, {**log.to_dict(), "id": doc.id})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -150,6 +240,9 @@ def get_log(log_id):
 
 @logs_bp.route("", methods=["POST"])
 @require_auth
+@require_permission("logs", "create")
+@idempotent
+@validate_body(LogCreate)
 def create_log():
     """POST /logs — create log (PRD allows POST /customers/:customerId/logs too; this variant accepts customerId in body)."""
     try:
@@ -157,72 +250,41 @@ def create_log():
         uid = request.user["uid"]
         tenant_id = _tenant_id(db, uid)
 
-        data = request.get_json(force=True) or {}
+        data = request.validated      # type and customer_id are required by LogCreate
+        customer = db.collection("customers").document(data.customer_id).get()
+        if not customer.exists or _forbidden_cross_tenant(customer.to_dict(), tenant_id):
+            return jsonify({"error": "customer_id must be a customer of your tenant"}), 400
 
-        # Normalize expected fields
         payload = {
-            "type": data.get("type"),
-            "title": data.get("title"),
-            "subject": data.get("subject"),
-            "description": data.get("description"),
-            "customer_id": data.get("customerId") or data.get("customer_id"),
-            "thread_id": data.get("threadId") or data.get("thread_id"),
-            "attachments": data.get("attachments") or [],
-            "tags": data.get("tags") or [],
+            **data.model_dump(exclude={"log_date"}),
             "created_by": uid,
             "tenant_id": tenant_id,
-            # optional client-provided log date (string ISO or YYYY-MM-DD)
-            "log_date": data.get("log_date") or data.get("logDate"),
+            # optional client-provided log date (ISO or YYYY-MM-DD), stored as a Timestamp
+            "log_date": _parse_iso_dt(data.log_date) or data.log_date,
             # timestamps via server
             "created_at": firestore.SERVER_TIMESTAMP,
             "updated_at": firestore.SERVER_TIMESTAMP,
         }
 
-        # Minimal validation (MVP)
-        if not payload["type"]:
-            return jsonify({"error": "type is required"}), 400
-        if not payload["customer_id"]:
-            return jsonify({"error": "customerId is required"}), 400
-
         # Persist (let Firestore allocate id)
         doc_ref = db.collection("logs").document()
         payload["id"] = doc_ref.id
 
-        # If client sent a simple date like '2025-11-09', keep it as date string
-        # If they sent ISO, store as string; you can later parse to Timestamp if needed.
-        # (Keeping as string avoids JSON serialization issues here.)
         doc_ref.set(payload)
 
-        # Touch customer's last_contact_date (best-effort)
-        try:
-            db.collection("customers").document(payload["customer_id"]).update({
-                "last_contact_date": firestore.SERVER_TIMESTAMP,
-                "updated_at": firestore.SERVER_TIMESTAMP,
-            })
-        except Exception:
-            pass
+        # The customer's activity stats and the daily rollup are hot documents under
+        # log bursts: coalesce them through the write-behind buffer.
+        customer_stats.queue_log_activity(tenant_id, payload["customer_id"])
+        rollup_service.queue(tenant_id, rollup_service.log_increments(payload))
 
         # Re-read to get resolved server timestamps
         snap = doc_ref.get()
         doc = snap.to_dict() or {}
 
-        # JSON-safe conversion for timestamp-like fields
-        def _iso(v):
-            try:
-                return v.isoformat()
-            except Exception:
-                return v  # keep original (string or None)
-
-        for k in ("created_at", "updated_at"):
-            if k in doc:
-                doc[k] = _iso(doc[k])
-
-        # If you decide to store log_date as a Timestamp later, the same _iso() will handle it.
-
-        return jsonify({
+        return respond(LogSaved, {
             "message": "Log created successfully",
             "log": {"id": doc_ref.id, **doc}
-        }), 201
+        }, 201)
 
     except Exception as e:
         current_app.logger.exception("create_log failed")
@@ -231,6 +293,8 @@ def create_log():
 
 @logs_bp.route("/<log_id>", methods=["PUT"])
 @require_auth
+@require_permission("logs", "update")
+@validate_body(LogUpdate)
 def update_log(log_id):
     """PUT /logs/:id — update log (tenant checked)"""
     try:
@@ -247,26 +311,24 @@ def update_log(log_id):
         if _forbidden_cross_tenant(existing, tenant_id):
             return jsonify({"error": "Forbidden: cross-tenant update"}), 403
 
-        body = request.get_json(force=True) or {}
-        # Only allow safe fields to change
-        updatable = {
-            "type", "title", "subject", "description",
-            "thread_id", "attachments", "tags", "customer_id"
-        }
-        delta = {k: v for k, v in body.items() if k in updatable}
+        # Only the fields declared on LogUpdate can change
+        delta = request.validated.model_dump(exclude_unset=True)
         if not delta:
             return jsonify({"message": "No changes"}), 200
 
         delta["updated_at"] = firestore.SERVER_TIMESTAMP
-        ref.set(delta, merge=True)
+        try:
+            existing = _apply_log_update(db, ref, tenant_id, delta)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 400
 
         # Return merged doc
         merged = {**existing, **delta}
         merged["id"] = log_id
-        return jsonify({
+        return respond(LogSaved, {
             "message": "Log updated successfully",
             "log": merged
-        }), 200
+        })
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -274,6 +336,7 @@ def update_log(log_id):
 
 @logs_bp.route("/<log_id>", methods=["DELETE"])
 @require_auth
+@require_permission("logs", "delete")
 def delete_log(log_id):
     """DELETE /logs/:id — delete with tenant check"""
     try:
@@ -292,7 +355,7 @@ def delete_log(log_id):
         if _forbidden_cross_tenant(snap.to_dict(), tenant_id):
             return jsonify({"error": "Forbidden: cross-tenant delete"}), 403
 
-        ref.delete()
+        _delete_log(db, ref, tenant_id)
         return jsonify({"message": "Log deleted successfully"}), 200
 
     except Exception as e:
@@ -2,20 +2,81 @@ from flask import Blueprint, jsonify, request, current_app
 from google.cloud.firestore_v1 import FieldFilter
 from datetime import datetime, timedelta, timezone
 
+import os
+
 from utils.firebase import get_db
-from api.auth import require_auth
+from utils import singleflight, tenant_limits
+from api.auth import require_auth, require_permission
+from services import outbox_service
 
 metrics_bp = Blueprint("metrics", __name__)
 
+# Dashboard KPIs may be served this many seconds stale while one refresh runs (0 = off)
+METRICS_STALE_SECONDS = float(os.getenv("METRICS_STALE_SECONDS", str(singleflight.STALE_SECONDS)))
+
 def _utc_now():
     return datetime.now(timezone.utc)
 
+def _compute_summary(db, tenant_id):
+    """KPI counts for one tenant (shared between concurrent identical requests)."""
+    now = _utc_now()
+    start_7d = now - timedelta(days=7)
+    start_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    # Customers
+    customers_col = db.collection("customers")
+    total_customers = sum(
+        1 for _ in customers_col
+        .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+        .where(filter=FieldFilter("status", "in", ["active", "prospect", "inactive"]))
+        .stream()
+    )
+    active_customers = sum(
+        1 for _ in customers_col
+        .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+        .where(filter=FieldFilter("status", "==", "active"))
+        .stream()
+    )
+
+    # Complaints
+    complaints_col = db.collection("complaints")
+    open_complaints = sum(
+        1 for _ in complaints_col
+        .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+        .where(filter=FieldFilter("status", "in", ["open", "in_progress"]))
+        .stream()
+    )
+
+    # Logs
+    logs_col = db.collection("logs")
+    recent_logs_7d = sum(
+        1 for _ in logs_col
+        .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+        .where(filter=FieldFilter("created_at", ">=", start_7d))
+        .stream()
+    )
+    performance_month = sum(
+        1 for _ in logs_col
+        .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+        .where(filter=FieldFilter("created_at", ">=", start_month))
+        .stream()
+    )
+
+    return {
+        "total_customers": total_customers,
+        "active_customers": active_customers,
+        "open_complaints": open_complaints,
+        "recent_logs_7d": recent_logs_7d,
+        "performance_month": performance_month
+    }
+
 @metrics_bp.route("/summary", methods=["GET"])
 @require_auth
 def summary():
     """
     Returns dashboard KPIs for the current tenant with robust error handling.
     Always returns 200 with numbers (0 on failure) so the UI never breaks.
+    Identical concurrent requests of a tenant share one set of Firestore reads.
     """
     db = get_db()
     uid = request.user.get("uid")
@@ -32,58 +93,49 @@ def summary():
         udoc = db.collection("users").document(uid).get()
         tenant_id = (udoc.to_dict() or {}).get("tenant_id", "default") if udoc.exists else "default"
 
-        now = _utc_now()
-        start_7d = now - timedelta(days=7)
-        start_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # Customers
-        customers_col = db.collection("customers")
-        total_customers = sum(
-            1 for _ in customers_col
-            .where(filter=FieldFilter("tenant_id", "==", tenant_id))
-            .where(filter=FieldFilter("status", "in", ["active", "prospect", "inactive"]))
-            .stream()
-        )
-        active_customers = sum(
-            1 for _ in customers_col
-            .where(filter=FieldFilter("tenant_id", "==", tenant_id))
-            .where(filter=FieldFilter("status", "==", "active"))
-            .stream()
-        )
-
-        # Complaints
-        complaints_col = db.collection("complaints")
-        open_complaints = sum(
-            1 for _ in complaints_col
-            .where(filter=FieldFilter("tenant_id", "==", tenant_id))
-            .where(filter=FieldFilter("status", "in", ["open", "in_progress"]))
-            .stream()
-        )
-
-        # Logs
-        logs_col = db.collection("logs")
-        recent_logs_7d = sum(
-            1 for _ in logs_col
-            .where(filter=FieldFilter("tenant_id", "==", tenant_id))
-            .where(filter=FieldFilter("created_at", ">=", start_7d))
-            .stream()
-        )
-        performance_month = sum(
-            1 for _ in logs_col
-            .where(filter=FieldFilter("tenant_id", "==", tenant_id))
-            .where(filter=FieldFilter("created_at", ">=", start_month))
-            .stream()
-        )
-
-        return jsonify({
-            "total_customers": total_customers,
-            "active_customers": active_customers,
-            "open_complaints": open_complaints,
-            "recent_logs_7d": recent_logs_7d,
-            "performance_month": performance_month
-        }), 200
+        result = singleflight.do(singleflight.make_key(tenant_id, "metrics.summary"),
+                                 lambda: _compute_summary(db, tenant_id),
+                                 stale_seconds=METRICS_STALE_SECONDS)
+        return jsonify(result), 200
 
     except Exception as e:
         # Log but keep the UI alive
         current_app.logger.exception("metrics.summary failed")
         return jsonify(safe | {"__error": str(e)}), 200
+
+
+@metrics_bp.route("/write-behind", methods=["GET"])
+@require_auth
+@require_permission("settings", "read")
+def write_behind_stats():
+    """Per-process write-behind counters: updates received vs. coalesced vs. documents written."""
+    from utils.write_behind import get_buffer
+    return jsonify(get_buffer().snapshot()), 200
+
+
+@metrics_bp.route("/singleflight", methods=["GET"])
+@require_auth
+@require_permission("settings", "read")
+def singleflight_stats():
+    """Per-process counters: calls vs. executions vs. calls coalesced onto an in-flight read."""
+    return jsonify(singleflight.get_group().snapshot()), 200
+
+@metrics_bp.route("/tenant-limits", methods=["GET"])
+@require_auth
+@require_permission("settings", "read")
+def tenant_limits_stats():
+    """Per-process admission counters and the configured per-tenant limits."""
+    return jsonify(tenant_limits.snapshot()), 200
+
+@metrics_bp.route("/outbox", methods=["GET"])
+@require_auth
+@require_permission("settings", "read")
+def outbox_stats():
+    """This process's dispatcher counters plus the tenant's pending / failed event counts."""
+    try:
+        db = get_db()
+        tenant_id = request.user.get("tenant_id") or "default"
+        return jsonify({"dispatcher": outbox_service.get_dispatcher().snapshot(),
+                        "backlog": outbox_service.backlog(db, tenant_id)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
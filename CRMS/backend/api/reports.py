@@ -0,0 +1,52 @@
+# backend/api/reports.py
+from datetime import date, datetime, timedelta, timezone
+from flask import Blueprint, request, jsonify, current_app
+from .auth import require_auth, require_permission
+from .helpers import current_user
+from services import rollup_service
+from utils.firebase import get_db
+
+reports_bp = Blueprint("reports", __name__)
+
+def _parse_day(s):
+    try:
+        return date.fromisoformat((s or "")[:10])
+    except ValueError:
+        return None
+
+@reports_bp.route("/timeseries", methods=["GET"])
+@require_auth
+@require_permission("reports", "read")
+def timeseries():
+    """
+    GET /api/reports/timeseries?from=YYYY-MM-DD&to=YYYY-MM-DD[&metric=logs.by_type.call]
+    Reads at most one rollup document per day (default: last 30 days).
+    """
+    try:
+        tenant_id = current_user().get("tenant_id")
+        if not tenant_id:
+            return jsonify({"error": "Missing tenant_id on user"}), 401
+
+        today = datetime.now(timezone.utc).date()
+        end = _parse_day(request.args.get("to")) or today
+        start = _parse_day(request.args.get("from")) or (end - timedelta(days=29))
+        if start > end:
+            return jsonify({"error": "from must be on or before to"}), 400
+        if (end - start).days >= rollup_service.MAX_RANGE_DAYS:
+            return jsonify({"error": f"range exceeds {rollup_service.MAX_RANGE_DAYS} days"}), 400
+
+        days = rollup_service.read_days(get_db(), tenant_id, rollup_service.day_range(start, end))
+        body = {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "days": days,
+            "totals": rollup_service.totals(days),
+        }
+        metric = (request.args.get("metric") or "").strip()
+        if metric:
+            body["metric"] = metric
+            body["series"] = [{"date": d["date"], "value": rollup_service.pick(d, metric)} for d in days]
+        return jsonify(body), 200
+    except Exception as e:
+        current_app.logger.exception("reports.timeseries failed")
+        return jsonify({"error": str(e)}), 500
@@ -1,5 +1,7 @@
 # backend/api/roles.py
 # Keep these EXACT strings in sync with your Firestore Rules & PRD
+# (ADMIN / SUPPORT are aliases of tenant_admin / support_agent in utils/rbac.py,
+#  which holds the per-role permission table.)
 ADMIN       = "admin"
 MANAGER     = "manager"
 SALES_REP   = "sales_rep"
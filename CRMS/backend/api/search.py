@@ -4,11 +4,13 @@ from google.cloud.firestore_v1.base_query import FieldFilter
 from .auth import require_auth
 from .helpers import current_user
 from utils.firebase import get_db
+from utils.tenant_limits import rate_cost
 
 search_bp = Blueprint("search", __name__)
 
 @search_bp.route("/search", methods=["GET"])
 @require_auth
+@rate_cost(5)  # fans out to several collection scans
 def search():
     q = (request.args.get("q") or "").strip().lower()
     scope = (request.args.get("type") or "all").lower()
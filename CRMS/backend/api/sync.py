@@ -0,0 +1,46 @@
+# backend/api/sync.py
+"""
+Delta sync  GET /api/sync/<collection>?since=<token>&limit=
+  collection: customers | logs | complaints
+  -> { changes: [...docs updated since token], tombstones: [{id, reason, deleted_at}],
+       token, hasMore }
+Without `since` it pages through the whole collection (initial load). Keep calling
+with the returned token while hasMore is true. 410 means the token is too old:
+drop the replica and start again without `since`.
+"""
+from flask import Blueprint, request, jsonify, current_app
+from .auth import require_auth
+from .helpers import current_user
+from services import sync_service
+from utils import rbac
+from utils.firebase import get_db
+from utils.query_planner import QueryNotIndexed
+
+sync_bp = Blueprint("sync", __name__)
+
+@sync_bp.route("/<collection>", methods=["GET"])
+@require_auth
+def sync_collection(collection):
+    try:
+        if collection not in sync_service.SYNC_COLLECTIONS:
+            return jsonify({"error": f"collection must be one of {list(sync_service.SYNC_COLLECTIONS)}"}), 404
+        user = current_user()
+        if not rbac.allowed(user.get("role"), collection, "read"):
+            return jsonify({"error": f"Forbidden: missing permission {collection}:read"}), 403
+        tenant_id = user.get("tenant_id") or "default"
+        try:
+            limit = int(request.args.get("limit", sync_service.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            limit = sync_service.DEFAULT_PAGE_SIZE
+
+        result = sync_service.changes(get_db(), tenant_id, collection, request.args.get("since"), limit)
+        return jsonify(result), 200
+    except sync_service.TokenExpired as e:
+        return jsonify({"error": str(e), "resync": True}), 410
+    except QueryNotIndexed as e:
+        return jsonify(e.to_dict()), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception("sync failed")
+        return jsonify({"error": str(e)}), 500
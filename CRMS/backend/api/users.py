@@ -8,6 +8,14 @@ from firebase_admin import auth as fb_auth
 from .auth import require_auth, require_role
 from .helpers import current_user
 from .roles import ADMIN, MANAGER, ALL_ROLES
+from services import assignment_service, invite_service
+from pydantic import ValidationError
+from schemas import respond, validate_body
+from schemas.base import errors_of
+from schemas.users import (
+    AgentCategories, AgentCategoriesUpdated, BulkInvite, Invite, Invited, InviteReport, NotificationList,
+    RoleUpdate, RoleUpdated, UserList,
+)
 
 users_bp = Blueprint("users", __name__)
 
@@ -35,19 +43,37 @@ def list_users():
         })
     # sort by role then email
     items.sort(key=lambda x: (x.get("role") or "", x.get("email") or ""))
-    return jsonify({"users": items, "total": len(items)}), 200
+    return respond(UserList, {"users": items, "total": len(items)})
+
+@users_bp.route("/me/notifications", methods=["GET"])
+@require_auth
+def my_notifications():
+    """In-app notifications of the caller, newest first (written by the outbox dispatcher)."""
+    db = get_db()
+    u = current_user()
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 200)
+    except ValueError:
+        limit = 50
+    q = (db.collection("notifications")
+           .where(filter=FieldFilter("tenant_id", "==", _tenant_of_request()))
+           .where(filter=FieldFilter("user_id", "==", u.get("uid")))
+           .order_by("created_at", direction=firestore.Query.DESCENDING)
+           .limit(limit))
+    items = [{"id": doc.id, **(doc.to_dict() or {})} for doc in q.stream()]
+    return respond(NotificationList, {"notifications": items, "total": len(items)})
 
 @users_bp.route("/<uid>/role", methods=["PUT"])
 @require_auth
 @require_role(ADMIN)  # only tenant admin changes roles
+@validate_body(RoleUpdate)
 def set_user_role(uid):
     """
     Body: { "role": "manager" }
     Effect: updates Firebase custom claims & users/{uid}.role in same tenant.
     """
     db = get_db()
-    body = request.get_json(force=True) or {}
-    role = (body.get("role") or "").lower()
+    role = request.validated.role.lower()
 
     if role not in ALL_ROLES:
         return jsonify({"error": f"Invalid role. Allowed: {sorted(ALL_ROLES)}"}), 400
@@ -70,20 +96,43 @@ def set_user_role(uid):
         "role": role,
         "updated_at": firestore.SERVER_TIMESTAMP,
     })
+    # the agent may have joined or left the auto-assignment pool
+    assignment_service.get_engine().invalidate(tenant_id)
+
+    return respond(RoleUpdated, {"message": "Role updated", "uid": uid, "role": role})
+
+@users_bp.route("/<uid>/categories", methods=["PUT"])
+@require_auth
+@require_role(ADMIN, MANAGER)
+@validate_body(AgentCategories)
+def set_agent_categories(uid):
+    """
+    Body: { "categories": ["billing", "delivery"] }  ([] = any category)
+    Complaint categories this support agent is auto-assigned.
+    """
+    db = get_db()
+    tenant_id = _tenant_of_request()
+    categories = sorted({c.strip().lower() for c in request.validated.categories if c.strip()})
+    user_ref = db.collection("users").document(uid)
+    snap = user_ref.get()
+    if not snap.exists:
+        return jsonify({"error": "User not found"}), 404
+    if (snap.to_dict() or {}).get("tenant_id") != tenant_id:
+        return jsonify({"error": "Forbidden: cross-tenant update"}), 403
 
-    return jsonify({"message": "Role updated", "uid": uid, "role": role}), 200
+    user_ref.update({"categories": categories, "updated_at": firestore.SERVER_TIMESTAMP})
+    assignment_service.get_engine().invalidate(tenant_id)
+    return respond(AgentCategoriesUpdated, {"uid": uid, "categories": categories})
 
 @users_bp.route('/invite', methods=['POST'])
 @require_auth
 @require_role(ADMIN)  # or ADMIN, MANAGER
+@validate_body(Invite)
 def invite_user():
     db = get_db()
     tenant_id = _tenant_of_request()
-    data = request.get_json() or {}
-    email = (data.get('email') or '').strip().lower()
-    role = (data.get('role') or 'viewer').lower()
-    if not email:
-        return jsonify({'error':'Email required'}), 400
+    email = request.validated.email.lower()
+    role = (request.validated.role or 'viewer').lower()
     if role not in ALL_ROLES:
         return jsonify({'error': f'Invalid role; allowed: {sorted(ALL_ROLES)}'}), 400
 
@@ -100,4 +149,45 @@ def invite_user():
         "is_active": True, "created_at": firestore.SERVER_TIMESTAMP
     }, merge=True)
 
-    return jsonify({"message":"Invitation recorded","uid":user.uid,"role":role}), 201
\ No newline at end of file
+    return respond(Invited, {"message": "Invitation recorded", "uid": user.uid, "role": role}, 201)
+
+@users_bp.route('/invite/bulk', methods=['POST'])
+@require_auth
+@require_role(ADMIN)
+def invite_users_bulk():
+    """
+    Body (JSON): { "invites": [{"email", "role"?, "display_name"?}, ...] | ["a@x.com", ...],
+                   "role": "<default role>" }  or  { "csv": "email,role\n..." }
+    Body (text/csv or multipart "file"): email[,role[,display_name]] rows.
+    Returns a per-row result report.
+    """
+    db = get_db()
+    tenant_id = _tenant_of_request()
+    try:
+        default_role = (request.args.get('role') or 'viewer').lower()
+        if request.files.get('file'):
+            rows = invite_service.parse_csv(request.files['file'].read().decode('utf-8-sig'))
+        elif (request.mimetype or '') == 'text/csv':
+            rows = invite_service.parse_csv(request.get_data(as_text=True))
+        else:
+            data = BulkInvite.model_validate_json(request.get_data() or b'{}')
+            default_role = (data.role or default_role).lower()
+            rows = invite_service.parse_csv(data.csv) if data.csv else data.invites
+    except UnicodeDecodeError:
+        return jsonify({'error': 'CSV must be UTF-8'}), 400
+    except ValidationError as e:
+        return jsonify({'error': 'Invalid request body', 'details': errors_of(e)}), 400
+
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'error': 'invites (list) or csv required'}), 400
+    if len(rows) > invite_service.MAX_INVITES:
+        return jsonify({'error': f'At most {invite_service.MAX_INVITES} invites per request'}), 400
+    if default_role not in ALL_ROLES:
+        return jsonify({'error': f'Invalid role; allowed: {sorted(ALL_ROLES)}'}), 400
+
+    try:
+        report = invite_service.invite_many(db, tenant_id, rows, default_role, ALL_ROLES,
+                                            invited_by=(current_user() or {}).get('uid'))
+        return respond(InviteReport, report)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
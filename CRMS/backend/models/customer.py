@@ -37,6 +37,20 @@ class Customer(BaseModel):
         # Statistics
         self.total_orders = kwargs.get('total_orders', 0)
         self.total_value = kwargs.get('total_value', 0.0)
+
+        # Activity stats maintained by log/complaint writes (services/customer_stats.py)
+        self.logs_count = kwargs.get('logs_count', 0)
+        self.stats_month = kwargs.get('stats_month')
+        self.logs_this_month = kwargs.get('logs_this_month', 0)
+        if self.stats_month != datetime.utcnow().strftime('%Y-%m'):
+            self.logs_this_month = 0  # counter belongs to an earlier month
+        self.last_log_at = kwargs.get('last_log_at')
+        self.last_activity_at = kwargs.get('last_activity_at')
+        self.complaints_count = kwargs.get('complaints_count', 0)
+        self.open_complaints = kwargs.get('open_complaints', 0)
+
+        # Saved segments this customer matches (services/segment_service.py)
+        self.segment_ids = kwargs.get('segment_ids', [])
     
     def to_dict(self, include_id: bool = False) -> Dict[str, Any]:
         """Convert customer to dictionary for Firestore/JSON responses.
@@ -69,6 +83,13 @@ class Customer(BaseModel):
             'last_contact_date': self.last_contact_date,
             'total_orders': self.total_orders,
             'total_value': self.total_value,
+            'logs_count': self.logs_count,
+            'logs_this_month': self.logs_this_month,
+            'last_log_at': self.last_log_at,
+            'last_activity_at': self.last_activity_at,
+            'complaints_count': self.complaints_count,
+            'open_complaints': self.open_complaints,
+            'segment_ids': self.segment_ids,
         })
         return data
     
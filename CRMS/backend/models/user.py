@@ -2,6 +2,7 @@
 
 from typing import Optional, Dict, Any
 from models.base import BaseModel
+from utils import rbac
 
 
 class User(BaseModel):
@@ -123,38 +124,5 @@ class User(BaseModel):
         return bool(self.email and self.role in self.ROLES and self.tenant_id)
 
     def has_permission(self, resource: str, action: str) -> bool:
-        """Check if user has permission to perform an action on a resource"""
-        if self.role == self.ROLE_SUPER_ADMIN:
-            return True
-
-        permissions = {
-            self.ROLE_TENANT_ADMIN: {
-                "customers": ["create", "read", "update", "delete"],
-                "logs": ["create", "read", "update", "delete"],
-                "complaints": ["create", "read", "update", "delete", "assign"],
-                "users": ["create", "read", "update"],
-            },
-            self.ROLE_MANAGER: {
-                "customers": ["create", "read", "update"],
-                "logs": ["create", "read", "update", "delete"],
-                "complaints": ["create", "read", "update", "assign"],
-            },
-            self.ROLE_SALES_REP: {
-                "customers": ["create", "read", "update"],
-                "logs": ["create", "read", "update"],
-                "complaints": ["create", "read"],
-            },
-            self.ROLE_SUPPORT_AGENT: {
-                "customers": ["read", "update"],
-                "logs": ["create", "read", "update"],
-                "complaints": ["create", "read", "update"],
-            },
-            self.ROLE_VIEWER: {
-                "customers": ["read"],
-                "logs": ["read"],
-                "complaints": ["read"],
-            },
-        }
-
-        role_perms = permissions.get(self.role, {})
-        return action in role_perms.get(resource, [])
+        """Check if user has permission to perform an action on a resource (compiled policy in utils/rbac.py)"""
+        return rbac.allowed(self.role, resource, action)
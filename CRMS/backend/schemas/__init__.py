@@ -0,0 +1,4 @@
+"""pydantic v2 request/response schemas for the API blueprints"""
+from schemas.base import BulkResult, Message, respond, validate_body
+
+__all__ = ['BulkResult', 'Message', 'respond', 'validate_body']
@@ -0,0 +1,126 @@
+"""Shared pieces for the pydantic v2 request/response schemas.
+
+Request bodies are parsed straight from the raw bytes by the model's
+compiled pydantic-core validator (``model_validate_json``) in
+``@validate_body``; handlers read the result from ``request.validated``.
+Responses go through ``respond(Model, payload)``: the payload is validated
+by the response model and written with ``pydantic_core.to_json``, so every
+response of a kind has the same shape and datetimes are always ISO 8601.
+
+Firestore values JSON has no type for (``SERVER_TIMESTAMP`` sentinels still
+in a just-written payload, document references, geo points) are mapped by
+``_json_fallback``. Documents written before a schema existed may not match
+it; those responses are logged and sent unvalidated rather than failing.
+"""
+import logging
+from datetime import datetime
+from functools import wraps
+from typing import Any, Dict, List, Optional, Type, Union
+
+import pydantic_core
+from flask import current_app, jsonify, request
+from google.cloud.firestore_v1 import GeoPoint
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+from pydantic import BaseModel, ConfigDict, ValidationError
+from pydantic.alias_generators import to_camel
+
+logger = logging.getLogger(__name__)
+
+# Stored timestamps: Firestore datetimes, or ISO strings in older documents
+Timestamp = Optional[Union[datetime, str]]
+
+
+class RequestSchema(BaseModel):
+    """Request bodies: snake_case fields, camelCase accepted too; unknown keys dropped."""
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True,
+                              str_strip_whitespace=True, extra="ignore")
+
+
+class OpenRequestSchema(RequestSchema):
+    """Request bodies whose unknown keys are stored as-is (customer documents)."""
+    model_config = ConfigDict(extra="allow")
+
+
+class ResponseSchema(BaseModel):
+    """Responses: declared fields are typed, any other document field passes through."""
+    model_config = ConfigDict(extra="allow")
+
+
+class Document(ResponseSchema):
+    id: str
+    tenant_id: Optional[str] = None
+    created_at: Timestamp = None
+    updated_at: Timestamp = None
+    created_by: Optional[str] = None
+
+
+class Message(ResponseSchema):
+    message: str
+
+
+class BulkItem(ResponseSchema):
+    id: str
+    ok: bool
+    error: Optional[str] = None
+
+
+class BulkResult(ResponseSchema):
+    operation: str
+    requested: int
+    succeeded: int
+    failed: int
+    results: List[BulkItem]
+    # derived counters that failed to update after the documents were written
+    # (each has a rebuild script); empty when everything is consistent
+    stale_counters: List[str] = []
+
+
+def _json_fallback(value: Any) -> Any:
+    if isinstance(value, BaseDocumentReference):
+        return value.path
+    if isinstance(value, GeoPoint):
+        return {"latitude": value.latitude, "longitude": value.longitude}
+    if type(value).__name__ == "Sentinel":          # SERVER_TIMESTAMP, DELETE_FIELD, ...
+        return None
+    return str(value)
+
+
+def errors_of(exc: ValidationError) -> List[Dict[str, str]]:
+    return [{"field": ".".join(str(p) for p in e["loc"]) or "body", "message": e["msg"]}
+            for e in exc.errors(include_url=False, include_input=False)]
+
+
+def validate_body(schema: Type[BaseModel]):
+    """
+    Usage (below the auth decorators):
+        @validate_body(CustomerCreate)
+        def create_customer(): body = request.validated
+
+    Malformed JSON or a body that does not match -> 400 with per-field details.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            raw = request.get_data(cache=True) or b"{}"
+            try:
+                request.validated = schema.model_validate_json(raw)
+            except ValidationError as e:
+                return jsonify({"error": "Invalid request body", "details": errors_of(e)}), 400
+            return fn(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def dump_json(schema: Type[BaseModel], payload: Any) -> bytes:
+    try:
+        instance = payload if isinstance(payload, schema) else schema.model_validate(payload)
+    except ValidationError as e:
+        logger.warning("response does not match %s: %s", schema.__name__, errors_of(e)[:3])
+        instance = payload
+    return pydantic_core.to_json(instance, fallback=_json_fallback)
+
+
+def respond(schema: Type[BaseModel], payload: Any, status: int = 200, headers=None):
+    """Serialize ``payload`` through ``schema``'s compiled serializer."""
+    return current_app.response_class(dump_json(schema, payload), status=status, headers=headers,
+                                      mimetype="application/json")
@@ -0,0 +1,123 @@
+"""Complaint request/response schemas (api/complaints.py)."""
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from pydantic import AliasChoices, Field, field_validator
+
+from schemas.base import Document, RequestSchema, ResponseSchema
+
+ComplaintStatus = Literal["new", "acknowledged", "in_progress", "resolved", "closed"]
+
+
+class ComplaintCreate(RequestSchema):
+    customer_id: str = Field(min_length=1)
+    title: str = Field(min_length=1)
+    description: str = ""
+    category: str = "other"
+    severity: str = "low"
+    status: ComplaintStatus = "new"
+    priority: Union[int, str] = 0
+    assigned_to: Optional[str] = Field(None, validation_alias=AliasChoices("assigned_to", "assignedTo"))
+    sla: Dict[str, Any] = {}
+    attachments: List[Any] = []
+
+
+class ComplaintBulk(RequestSchema):
+    ids: List[Any] = []
+    operation: str = Field("", validation_alias=AliasChoices("operation", "op"))
+    assigned_to: Optional[str] = Field(None, validation_alias=AliasChoices("assigned_to", "assignedTo"))
+    status: Optional[str] = None
+    severity: Optional[Any] = None
+    priority: Optional[Any] = None
+
+
+class StatusUpdate(RequestSchema):
+    status: ComplaintStatus
+    resolution_notes: Optional[str] = None
+    customer_satisfaction: Optional[Union[int, float, str]] = None
+    # Kanban position: an explicit rank, or the neighbouring cards
+    rank: Optional[float] = None
+    before_id: Optional[str] = None
+    after_id: Optional[str] = None
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def _lower(cls, v):
+        return v.strip().lower() if isinstance(v, str) else v
+
+
+class AssignIn(RequestSchema):
+    assigned_to: Optional[str] = Field(None, validation_alias=AliasChoices("assigned_to", "assignedTo"))
+    auto: bool = False
+
+
+class CommentIn(RequestSchema):
+    comment: str = Field(min_length=1)
+
+
+class CustomerUpdateIn(RequestSchema):
+    message: str = Field(min_length=1)
+
+
+class ComplaintOut(Document):
+    customer_id: Optional[str] = None
+    title: Optional[str] = None
+    status: Optional[str] = None
+    severity: Optional[str] = None
+    ticket_number: Optional[str] = None
+    assigned_to: Optional[str] = None
+    board_rank: Optional[float] = None
+
+
+class ComplaintList(ResponseSchema):
+    complaints: List[ComplaintOut]
+    page: int
+    pageSize: int
+    hasMore: bool
+    total: int
+
+
+class ComplaintCreatedData(ResponseSchema):
+    id: str
+    ticketNumber: str
+    assignedTo: Optional[str] = None
+    message: str
+
+
+class ComplaintCreated(ResponseSchema):
+    success: bool
+    data: ComplaintCreatedData
+
+
+class StatusUpdated(ResponseSchema):
+    status: str
+    message: str
+    rank: Optional[float] = None
+
+
+class BoardColumn(ResponseSchema):
+    status: str
+    cards: List[ComplaintOut]
+    nextCursor: Optional[str] = None
+    hasMore: bool
+    count: Optional[int] = None
+
+
+class Board(ResponseSchema):
+    columns: List[BoardColumn]
+    limit: int
+
+
+class Assigned(ResponseSchema):
+    assigned_to: Optional[str] = None
+    auto_assigned: bool
+    message: str
+
+
+class AgentLoad(ResponseSchema):
+    uid: str
+    open: int
+    categories: List[str] = []
+
+
+class AgentLoads(ResponseSchema):
+    agents: List[AgentLoad]
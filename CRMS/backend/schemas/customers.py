@@ -0,0 +1,135 @@
+"""Customer request/response schemas (api/customers.py)."""
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import AliasChoices, Field
+
+from schemas.base import Document, OpenRequestSchema, RequestSchema, ResponseSchema, Timestamp
+from schemas.complaints import ComplaintOut
+from schemas.logs import LogOut
+
+CustomerStatus = Literal["active", "inactive", "prospect", "archived"]
+
+
+class CustomerFields(OpenRequestSchema):
+    """Known customer fields; other keys are stored as sent (custom fields)."""
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    company: Optional[str] = None
+    address: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+    postal_code: Optional[str] = None
+    industry: Optional[str] = None
+    type: Optional[str] = None
+    status: Optional[CustomerStatus] = None
+    tags: Optional[List[str]] = None
+    secondary_phone: Optional[str] = None
+    secondary_email: Optional[str] = None
+    website: Optional[str] = None
+    notes: Optional[str] = None
+    owner_id: Optional[str] = None
+    last_contact_date: Timestamp = None
+
+
+class CustomerCreate(CustomerFields):
+    name: str = Field(min_length=1)
+
+
+class CustomerUpdate(CustomerFields):
+    pass
+
+
+class DuplicateCheck(RequestSchema):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    secondary_phone: Optional[str] = None
+    secondary_email: Optional[str] = None
+    exclude_id: Optional[str] = None
+    limit: int = 10
+
+
+class CustomerBulk(RequestSchema):
+    ids: List[Any] = []
+    operation: str = Field("", validation_alias=AliasChoices("operation", "op"))
+    status: Optional[str] = None
+    owner_id: Optional[str] = None
+    tags: List[Any] = []
+
+
+class CustomerOut(Document):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    company: Optional[str] = None
+    type: Optional[str] = None
+    status: Optional[str] = None
+    tags: List[Any] = []
+    logs_count: int = 0
+    logs_this_month: int = 0
+    complaints_count: int = 0
+    open_complaints: int = 0
+    last_activity_at: Timestamp = None
+    segment_ids: List[str] = []
+
+
+class CustomerList(ResponseSchema):
+    customers: List[CustomerOut]
+    page: int
+    limit: int
+    returned: int
+
+
+class CustomerSaved(ResponseSchema):
+    message: str
+    customer: CustomerOut
+
+
+class DuplicateCheckResult(ResponseSchema):
+    keys: List[str]
+    candidates: List[Dict[str, Any]]
+    has_duplicates: bool
+
+
+class CustomerLogs(ResponseSchema):
+    logs: List[LogOut]
+    limit: int
+    returned: int
+    nextCursor: Optional[str] = None
+    hasMore: bool
+
+
+class CustomerComplaints(ResponseSchema):
+    complaints: List[ComplaintOut]
+    page: int
+    limit: int
+    returned: int
+
+
+class SegmentIn(RequestSchema):
+    name: str = Field(min_length=1, max_length=100)
+    description: Optional[str] = None
+    rule: Dict[str, Any]
+
+
+class SegmentUpdate(RequestSchema):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    description: Optional[str] = None
+    rule: Optional[Dict[str, Any]] = None
+
+
+class SegmentOut(Document):
+    name: str
+    description: Optional[str] = None
+    rule: Dict[str, Any]
+    count: int = 0
+    status: Optional[str] = None
+    time_dependent: bool = False
+    refreshed_at: Timestamp = None
+
+
+class SegmentList(ResponseSchema):
+    segments: List[SegmentOut]
+    total: int
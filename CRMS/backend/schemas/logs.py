@@ -0,0 +1,52 @@
+"""Log request/response schemas (api/logs.py)."""
+from typing import Any, List, Optional
+
+from pydantic import Field
+
+from schemas.base import Document, RequestSchema, ResponseSchema, Timestamp
+
+
+class LogCreate(RequestSchema):
+    type: str = Field(min_length=1)
+    customer_id: str = Field(min_length=1)
+    title: Optional[str] = None
+    subject: Optional[str] = None
+    description: Optional[str] = None
+    thread_id: Optional[str] = None
+    attachments: List[Any] = []
+    tags: List[str] = []
+    log_date: Optional[str] = None
+
+
+class LogUpdate(RequestSchema):
+    """Only these fields may change after creation."""
+    type: Optional[str] = None
+    title: Optional[str] = None
+    subject: Optional[str] = None
+    description: Optional[str] = None
+    thread_id: Optional[str] = None
+    attachments: Optional[List[Any]] = None
+    tags: Optional[List[str]] = None
+    customer_id: Optional[str] = None
+
+
+class LogOut(Document):
+    type: Optional[str] = None
+    title: Optional[str] = None
+    subject: Optional[str] = None
+    description: Optional[str] = None
+    customer_id: Optional[str] = None
+    tags: List[Any] = []
+    log_date: Timestamp = None
+
+
+class LogList(ResponseSchema):
+    logs: List[LogOut]
+    page: int
+    limit: int
+    returned: int
+
+
+class LogSaved(ResponseSchema):
+    message: str
+    log: LogOut
@@ -0,0 +1,87 @@
+"""User request/response schemas (api/users.py)."""
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import Field
+
+from schemas.base import RequestSchema, ResponseSchema, Timestamp
+
+
+class RoleUpdate(RequestSchema):
+    role: str = Field(min_length=1)
+
+
+class AgentCategories(RequestSchema):
+    categories: List[str]
+
+
+class Invite(RequestSchema):
+    email: str = Field(min_length=3)
+    role: str = "viewer"
+
+
+class BulkInvite(RequestSchema):
+    invites: Optional[List[Union[str, Dict[str, Any]]]] = None
+    csv: Optional[str] = None
+    role: Optional[str] = None
+
+
+class UserOut(ResponseSchema):
+    id: str
+    email: Optional[str] = None
+    displayName: Optional[str] = None
+    role: str = ""
+    tenant_id: Optional[str] = None
+
+
+class UserList(ResponseSchema):
+    users: List[UserOut]
+    total: int
+
+
+class RoleUpdated(ResponseSchema):
+    message: str
+    uid: str
+    role: str
+
+
+class AgentCategoriesUpdated(ResponseSchema):
+    uid: str
+    categories: List[str]
+
+
+class Invited(ResponseSchema):
+    message: str
+    uid: str
+    role: str
+
+
+class InviteResult(ResponseSchema):
+    row: int
+    email: str
+    ok: bool
+    uid: Optional[str] = None
+    role: Optional[str] = None
+    created: Optional[bool] = None
+    error: Optional[str] = None
+
+
+class InviteReport(ResponseSchema):
+    requested: int
+    invited: int
+    created: int
+    failed: int
+    results: List[InviteResult]
+
+
+class NotificationOut(ResponseSchema):
+    id: str
+    type: str
+    complaint_id: Optional[str] = None
+    data: Dict[str, Any] = {}
+    read: bool = False
+    created_at: Timestamp = None
+
+
+class NotificationList(ResponseSchema):
+    notifications: List[NotificationOut]
+    total: int
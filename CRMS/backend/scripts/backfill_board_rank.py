@@ -0,0 +1,52 @@
+"""
+Give every complaint a `board_rank` so it shows up on the Kanban board.
+
+Board columns are ordered by `board_rank`; Firestore skips documents missing
+the order field, so complaints created before the board existed would never
+appear. Ranks are derived from `created_at` (newest on top), the same as for
+new complaints.
+
+Usage: python scripts/backfill_board_rank.py <tenant_id> [--dry-run]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from google.cloud.firestore_v1 import FieldFilter
+
+from utils.firebase import initialize_firebase, get_db
+from services.board_service import initial_rank
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python scripts/backfill_board_rank.py <tenant_id> [--dry-run]")
+        raise SystemExit(1)
+    tenant_id, dry_run = args[0], "--dry-run" in args
+
+    initialize_firebase()
+    db = get_db()
+    q = (db.collection("complaints")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .select(["created_at", "board_rank"]))
+    writer = None if dry_run else db.bulk_writer()
+    fixed = 0
+    for snap in q.stream():
+        data = snap.to_dict() or {}
+        if data.get("board_rank") is not None:
+            continue
+        fixed += 1
+        if writer is not None:
+            created = data.get("created_at")
+            writer.update(snap.reference, {
+                "board_rank": initial_rank(created.timestamp() if hasattr(created, "timestamp") else None)
+            })
+    if writer is not None:
+        writer.close()
+    print(f"✅ complaints: {fixed} document(s) {'missing board_rank' if dry_run else 'backfilled'}")
+
+
+if __name__ == "__main__":
+    main()
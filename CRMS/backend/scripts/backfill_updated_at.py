@@ -0,0 +1,50 @@
+"""
+Give every customer/log/complaint an `updated_at` so delta sync sees it.
+
+Documents written before every write path set `updated_at` are invisible to
+`GET /api/sync/...` (Firestore skips documents missing the order field).
+This copies `created_at` (or the current server time) into the missing field.
+
+Usage: python scripts/backfill_updated_at.py <tenant_id> [--dry-run]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from utils.firebase import initialize_firebase, get_db
+from services.sync_service import SYNC_COLLECTIONS
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python scripts/backfill_updated_at.py <tenant_id> [--dry-run]")
+        raise SystemExit(1)
+    tenant_id, dry_run = args[0], "--dry-run" in args
+
+    initialize_firebase()
+    db = get_db()
+    for collection in SYNC_COLLECTIONS:
+        q = (db.collection(collection)
+               .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+               .select(["created_at", "updated_at"]))
+        writer = None if dry_run else db.bulk_writer()
+        fixed = 0
+        for snap in q.stream():
+            data = snap.to_dict() or {}
+            if data.get("updated_at") is not None:
+                continue
+            fixed += 1
+            if writer is not None:
+                writer.update(snap.reference, {"updated_at": data.get("created_at") or firestore.SERVER_TIMESTAMP})
+        if writer is not None:
+            writer.close()
+        print(f"✅ {collection}: {fixed} document(s) {'missing updated_at' if dry_run else 'backfilled'}")
+
+
+if __name__ == "__main__":
+    main()
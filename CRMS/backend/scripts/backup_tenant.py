@@ -0,0 +1,89 @@
+"""
+Point-in-time backup / restore of one tenant (customers, logs, complaints, users).
+
+Exports read every collection at the same read_time and write gzip NDJSON
+shards plus a manifest to the storage backend (STORAGE_BACKEND) under
+backups/<tenant_id>/<backup_id>/. Restore writes the documents back through
+BulkWriter, overwriting live versions; documents created later are kept.
+Afterwards customer stats, agent loads and segment membership are rebuilt
+from the restored data (skip with --no-rebuild and run the rebuild scripts
+yourself); daily rollups still need scripts/recompute_rollups.py.
+
+Usage: python scripts/backup_tenant.py export <tenant_id> [--partitions N] [--workers N]
+       python scripts/backup_tenant.py restore <tenant_id> <backup_id> [--only customers,logs] [--workers N] [--no-rebuild] [--yes]
+       python scripts/backup_tenant.py list <tenant_id>
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services import backup_service
+
+USAGE = ("Usage: python scripts/backup_tenant.py export <tenant_id> [--partitions N] [--workers N]\n"
+         "       python scripts/backup_tenant.py restore <tenant_id> <backup_id> [--only c1,c2] [--workers N] [--no-rebuild] [--yes]\n"
+         "       python scripts/backup_tenant.py list <tenant_id>")
+
+
+def _opt(args, flag, default):
+    return args[args.index(flag) + 1] if flag in args else default
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in {"export", "restore", "list"}:
+        print(USAGE)
+        raise SystemExit(1)
+    command, tenant_id = args[0], args[1]
+    workers = int(_opt(args, "--workers", backup_service.DEFAULT_WORKERS))
+
+    initialize_firebase()
+    db = get_db()
+
+    if command == "list":
+        for b in backup_service.list_backups(db, tenant_id):
+            print(f"{b.get('backup_id')}  {b.get('status'):8}  {b.get('documents') or ''}")
+        return
+
+    if command == "export":
+        started = time.monotonic()
+        manifest = backup_service.export_tenant(
+            db, tenant_id, partitions=int(_opt(args, "--partitions", backup_service.DEFAULT_PARTITIONS)),
+            workers=workers)
+        counts = ", ".join(f"{c}: {v['documents']}" for c, v in manifest["collections"].items())
+        print(f"✅ Backup {manifest['backup_id']} of {tenant_id} at {manifest['read_time']} "
+              f"({counts}) in {time.monotonic() - started:.1f}s")
+        return
+
+    if len(args) < 3:
+        print(USAGE)
+        raise SystemExit(1)
+    backup_id = args[2]
+    only = _opt(args, "--only", None)
+    if "--yes" not in args:
+        answer = input(f"Overwrite live documents of tenant {tenant_id} with backup {backup_id}? [y/N] ")
+        if answer.strip().lower() not in {"y", "yes"}:
+            print("Aborted")
+            return
+    totals = backup_service.restore_tenant(db, tenant_id, backup_id,
+                                           collections=only.split(",") if only else None, workers=workers,
+                                           rebuild=False)
+    for c, t in totals.items():
+        print(f"✅ {c}: restored {t['restored']}, skipped {t['skipped']}, failed {t['failed']}")
+    if not set(totals) & {"customers", "logs", "complaints"}:
+        return
+    if "--no-rebuild" in args:
+        print(f"⚠️  Derived counters are stale: run scripts/rebuild_customer_stats.py, "
+              f"scripts/rebuild_agent_loads.py and scripts/refresh_segments.py {tenant_id} --rebuild")
+    else:
+        r = backup_service.rebuild_derived(db, tenant_id)
+        print(f"✅ Rebuilt stats of {r['customers']} customers, loads of {r['agents']} agents, "
+              f"{r['segments']} segments")
+    print(f"⚠️  Daily rollups are not rebuilt: run scripts/recompute_rollups.py {tenant_id} <from> <to> "
+          f"over the dates the restored documents cover")
+
+
+if __name__ == "__main__":
+    main()
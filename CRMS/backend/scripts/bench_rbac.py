@@ -0,0 +1,76 @@
+"""
+Micro-benchmark for permission checks.
+
+Compares the old per-call permissions dict in User.has_permission with the
+compiled bitsets, and measures the full @require_permission wrapper inside a
+Flask request context against an undecorated view.
+
+Usage: python scripts/bench_rbac.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask, request
+
+from utils import rbac
+from api.auth import require_permission
+
+
+def legacy_has_permission(role, resource, action):
+    """The pre-compiled implementation: rebuilds the table on every call."""
+    if role == "super_admin":
+        return True
+    permissions = {
+        "tenant_admin": {"customers": ["create", "read", "update", "delete"],
+                         "logs": ["create", "read", "update", "delete"],
+                         "complaints": ["create", "read", "update", "delete", "assign"],
+                         "users": ["create", "read", "update"]},
+        "manager": {"customers": ["create", "read", "update"],
+                    "logs": ["create", "read", "update", "delete"],
+                    "complaints": ["create", "read", "update", "assign"]},
+        "sales_rep": {"customers": ["create", "read", "update"],
+                      "logs": ["create", "read", "update"],
+                      "complaints": ["create", "read"]},
+        "support_agent": {"customers": ["read", "update"],
+                          "logs": ["create", "read", "update"],
+                          "complaints": ["create", "read", "update"]},
+        "viewer": {"customers": ["read"], "logs": ["read"], "complaints": ["read"]},
+    }
+    return action in permissions.get(role, {}).get(resource, [])
+
+
+def _ns(seconds, n):
+    return seconds / n * 1e9
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    legacy = timeit.timeit(lambda: legacy_has_permission("support_agent", "complaints", "update"), number=n)
+    compiled = timeit.timeit(lambda: rbac.allowed("support_agent", "complaints", "update"), number=n)
+    bit = rbac.permission_bit("complaints", "update")
+    precomputed = timeit.timeit(lambda: rbac.has_bit("support_agent", bit), number=n)
+
+    app = Flask(__name__)
+
+    def view():
+        return "ok"
+
+    guarded = require_permission("complaints", "update")(view)
+    with app.test_request_context("/api/complaints/x/status", method="PUT"):
+        request.user = {"uid": "u1", "role": "support", "tenant_id": "t1"}
+        bare = timeit.timeit(view, number=n)
+        wrapped = timeit.timeit(guarded, number=n)
+
+    print(f"iterations: {n}")
+    print(f"legacy dict per call        {_ns(legacy, n):8.1f} ns/check")
+    print(f"compiled allowed()          {_ns(compiled, n):8.1f} ns/check")
+    print(f"compiled has_bit()          {_ns(precomputed, n):8.1f} ns/check")
+    print(f"@require_permission overhead {_ns(wrapped - bare, n):7.1f} ns/request")
+
+
+if __name__ == "__main__":
+    main()
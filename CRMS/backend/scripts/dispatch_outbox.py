@@ -0,0 +1,51 @@
+"""
+Deliver complaint events from the outbox (notifications, webhooks, email).
+
+API processes already run a dispatcher in the background; run this as a
+dedicated worker (with OUTBOX_DISPATCH_IN_PROCESS=false on the API) or with
+--once to drain what is due, e.g. from cron.
+
+Usage: python scripts/dispatch_outbox.py [--once] [--sinks in_app,webhook,email]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services import outbox_service
+
+
+def main():
+    args = sys.argv[1:]
+    if "-h" in args or "--help" in args:
+        print("Usage: python scripts/dispatch_outbox.py [--once] [--sinks in_app,webhook,email]")
+        raise SystemExit(0)
+
+    sinks = args[args.index("--sinks") + 1].split(",") if "--sinks" in args else None
+
+    initialize_firebase()
+    db = get_db()
+    dispatcher = outbox_service.Dispatcher(sinks=outbox_service.build_sinks(sinks), db_factory=lambda: db)
+    print(f"✅ Dispatching to: {', '.join(dispatcher.sinks)}")
+
+    if "--once" in args:
+        total = 0
+        while True:
+            claimed = dispatcher.run_once()
+            total += claimed
+            if claimed < dispatcher.batch_size:
+                break
+        s = dispatcher.snapshot()
+        print(f"✅ {total} events: {s['delivered']} delivered, {s['retried']} scheduled for retry, "
+              f"{s['failed']} failed")
+        return
+
+    try:
+        dispatcher.run_forever()
+    except KeyboardInterrupt:
+        print("✅ Stopped")
+
+
+if __name__ == "__main__":
+    main()
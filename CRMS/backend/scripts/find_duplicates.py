@@ -0,0 +1,67 @@
+"""
+Batch duplicate finder for one tenant.
+
+Usage: python scripts/find_duplicates.py <tenant_id> [--threshold 0.6] [--backfill]
+
+Streams the tenant's customers once, groups them by blocking key and scores
+pairs only within each block. With --backfill, customers written before
+dedup_keys existed get their keys stored (batched writes).
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from google.cloud.firestore_v1 import FieldFilter
+
+from utils.firebase import initialize_firebase, get_db
+from services.dedup_service import blocking_keys, find_duplicate_pairs, DUPLICATE_THRESHOLD
+
+FIELDS = ["name", "email", "phone", "secondary_phone", "secondary_email", "dedup_keys"]
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python scripts/find_duplicates.py <tenant_id> [--threshold 0.6] [--backfill]")
+        raise SystemExit(1)
+
+    tenant_id = args[0]
+    threshold = DUPLICATE_THRESHOLD
+    if "--threshold" in args:
+        threshold = float(args[args.index("--threshold") + 1])
+    backfill = "--backfill" in args
+
+    initialize_firebase()
+    db = get_db()
+
+    q = (db.collection("customers")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .select(FIELDS))
+
+    customers = []
+    batch, pending = db.batch(), 0
+    for doc in q.stream():
+        data = {"id": doc.id, **(doc.to_dict() or {})}
+        keys = blocking_keys(data)
+        if backfill and data.get("dedup_keys") != keys:
+            batch.update(doc.reference, {"dedup_keys": keys})
+            pending += 1
+            if pending >= 450:
+                batch.commit()
+                batch, pending = db.batch(), 0
+        data["dedup_keys"] = keys
+        customers.append(data)
+    if pending:
+        batch.commit()
+
+    pairs = find_duplicate_pairs(customers, threshold=threshold)
+    for p in pairs:
+        print(json.dumps(p))
+    print(f"✅ {len(customers)} customers scanned, {len(pairs)} candidate pairs (threshold={threshold})",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
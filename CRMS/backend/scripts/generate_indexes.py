@@ -0,0 +1,65 @@
+"""
+Add the composite indexes that real traffic asked for to firestore.indexes.json.
+
+The query planner records every filter/orderBy combination it had to reject
+in `query_index_misses`; this merges them into the index file (deduplicated).
+
+Usage: python scripts/generate_indexes.py [--min-count N] [--dry-run] [--file path]
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from utils.query_planner import INDEXES_FILE, MISSES_COLLECTION
+
+
+def _key(index):
+    return (index["collectionGroup"], index.get("queryScope", "COLLECTION"),
+            tuple((f["fieldPath"], f.get("order") or f.get("arrayConfig")) for f in index["fields"]))
+
+
+def main():
+    args = sys.argv[1:]
+    min_count = int(args[args.index("--min-count") + 1]) if "--min-count" in args else 1
+    path = args[args.index("--file") + 1] if "--file" in args else INDEXES_FILE
+    dry_run = "--dry-run" in args
+
+    with open(path, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    indexes = data.setdefault("indexes", [])
+    known = {_key(i) for i in indexes}
+
+    initialize_firebase()
+    added = []
+    for snap in get_db().collection(MISSES_COLLECTION).stream():
+        miss = snap.to_dict() or {}
+        if int(miss.get("count") or 0) < min_count:
+            continue
+        index = {"collectionGroup": miss["collectionGroup"], "queryScope": "COLLECTION", "fields": miss["fields"]}
+        if _key(index) in known:
+            continue
+        known.add(_key(index))
+        indexes.append(index)
+        added.append((index, miss.get("count")))
+
+    for index, count in added:
+        fields = ", ".join(f"{f['fieldPath']} {f.get('order') or f.get('arrayConfig')}" for f in index["fields"])
+        print(f"+ {index['collectionGroup']}: {fields}  ({count} requests)")
+
+    if not added:
+        print("✅ No missing indexes recorded")
+        return
+    if dry_run:
+        print(f"(dry run) {len(added)} index(es) not written")
+        return
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2)
+        fh.write("\n")
+    print(f"✅ Added {len(added)} index(es) to {os.path.abspath(path)}; deploy with `firebase deploy --only firestore:indexes`")
+
+
+if __name__ == "__main__":
+    main()
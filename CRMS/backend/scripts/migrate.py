@@ -0,0 +1,73 @@
+"""
+Run a registered data migration over a whole collection, in parallel and resumably.
+
+The collection is split with Firestore partition queries; partitions run in
+a worker pool and checkpoint after every page in `migrations/{name}`.
+Interrupt with Ctrl-C at any time and re-run the same command to resume.
+
+Usage: python scripts/migrate.py --list
+       python scripts/migrate.py <name> [--partitions N] [--workers N] [--page-size N] [--dry-run] [--restart]
+       python scripts/migrate.py <name> --status
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services import migration_service
+
+
+def _opt(args, flag, default):
+    return int(args[args.index(flag) + 1]) if flag in args else default
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python scripts/migrate.py --list | <name> [--partitions N] [--workers N] "
+              "[--page-size N] [--dry-run] [--restart] [--status]")
+        raise SystemExit(1)
+
+    if args[0] == "--list":
+        for m in migration_service.available():
+            print(f"{m.name:28} {m.collection:12} {m.description}")
+        return
+
+    name = args[0]
+    try:
+        migration_service.get(name)
+    except KeyError as e:
+        print(f"❌ {e.args[0]} (see --list)")
+        raise SystemExit(1)
+
+    initialize_firebase()
+    db = get_db()
+    if "--status" in args:
+        print(migration_service.status(db, name))
+        return
+
+    stop = threading.Event()
+    try:
+        result = migration_service.run(
+            db, name,
+            partitions=_opt(args, "--partitions", migration_service.DEFAULT_PARTITIONS),
+            workers=_opt(args, "--workers", migration_service.DEFAULT_WORKERS),
+            page_size=_opt(args, "--page-size", migration_service.PAGE_SIZE),
+            dry_run="--dry-run" in args,
+            restart="--restart" in args,
+            stop=stop,
+        )
+    except KeyboardInterrupt:
+        print(f"⏸️  {name} interrupted; progress is checkpointed, re-run to resume")
+        raise SystemExit(130)
+
+    verb = "would update" if "--dry-run" in args else "updated"
+    state = "done" if result["done"] else "incomplete, re-run to resume"
+    print(f"✅ {name}: scanned {result['scanned']}, {verb} {result['updated']}, "
+          f"failed {result['failed']} across {result['partitions']} partition(s) ({state})")
+
+
+if __name__ == "__main__":
+    main()
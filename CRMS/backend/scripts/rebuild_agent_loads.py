@@ -0,0 +1,34 @@
+"""
+Recount every support agent's open complaints into agent_loads.
+
+The API keeps the counters up to date on every write; run this once after
+deploying auto-assignment (to seed them) or after a restore / manual edits.
+
+Usage: python scripts/rebuild_agent_loads.py <tenant_id>
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services import assignment_service
+from services.customer_stats import OPEN_STATUSES
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python scripts/rebuild_agent_loads.py <tenant_id>")
+        raise SystemExit(1)
+    tenant_id = sys.argv[1]
+
+    initialize_firebase()
+    db = get_db()
+    counts = assignment_service.rebuild_loads(db, tenant_id, OPEN_STATUSES)
+    for uid, n in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])):
+        print(f"  {uid}: {n} open")
+    print(f"✅ Rebuilt open-ticket counters of {len(counts)} assignees for {tenant_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Recompute denormalized customer stats (logs_count, open_complaints, ...) for a tenant.
+Use once to backfill customers created before the counters existed, or to repair drift.
+
+Usage: python scripts/rebuild_customer_stats.py <tenant_id>
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services.customer_stats import rebuild
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python scripts/rebuild_customer_stats.py <tenant_id>")
+        raise SystemExit(1)
+
+    initialize_firebase()
+    n = rebuild(get_db(), sys.argv[1])
+    print(f"✅ Rebuilt stats for {n} customer(s) in tenant {sys.argv[1]}")
+
+
+if __name__ == "__main__":
+    main()
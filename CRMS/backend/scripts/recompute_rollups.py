@@ -0,0 +1,30 @@
+"""
+Rebuild daily reporting rollups for a tenant from the source collections.
+
+Usage: python scripts/recompute_rollups.py <tenant_id> <from YYYY-MM-DD> <to YYYY-MM-DD>
+"""
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services.rollup_service import recompute
+
+
+def main():
+    if len(sys.argv) != 4:
+        print("Usage: python scripts/recompute_rollups.py <tenant_id> <from YYYY-MM-DD> <to YYYY-MM-DD>")
+        raise SystemExit(1)
+
+    tenant_id = sys.argv[1]
+    start, end = date.fromisoformat(sys.argv[2]), date.fromisoformat(sys.argv[3])
+
+    initialize_firebase()
+    n = recompute(get_db(), tenant_id, start, end)
+    print(f"✅ Recomputed {n} day(s) of rollups for tenant {tenant_id}")
+
+
+if __name__ == "__main__":
+    main()
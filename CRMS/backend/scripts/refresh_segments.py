@@ -0,0 +1,44 @@
+"""
+Catch up saved customer segments with the passage of time and re-count them.
+
+Customer writes keep segment membership current; a rule on days since last
+contact also changes as days pass, so run this daily (e.g. from cron). Only
+customers whose last contact crossed a rule's day boundary are re-read.
+--rebuild re-evaluates every segment over all customers instead (repair).
+
+Usage: python scripts/refresh_segments.py <tenant_id>|--all [--rebuild]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services import segment_service
+
+
+def main():
+    args = [a for a in sys.argv[1:] if a != "--rebuild"]
+    if len(args) != 1 or args[0] in ("-h", "--help"):
+        print("Usage: python scripts/refresh_segments.py <tenant_id>|--all [--rebuild]")
+        raise SystemExit(1)
+
+    initialize_firebase()
+    db = get_db()
+    tenants = segment_service.tenants_with_segments(db) if args[0] == "--all" else [args[0]]
+
+    for tenant_id in tenants:
+        if "--rebuild" in sys.argv:
+            rules = segment_service.segments_of(db, tenant_id)
+            for segment_id, rule in rules.items():
+                n = segment_service.build(db, tenant_id, segment_id, rule)
+                print(f"✅ {tenant_id}/{segment_id}: {n} members")
+            segment_service.invalidate(tenant_id)
+            continue
+        r = segment_service.refresh_tenant(db, tenant_id)
+        print(f"✅ {tenant_id}: {r['segments']} segments re-counted, "
+              f"{r['customers_changed']} of {r['customers_checked']} boundary customers moved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Apply retention policies: move old logs / long-archived customers to cold storage.
+Safe to interrupt and re-run; each batch copies and deletes atomically.
+
+Usage: python scripts/run_retention.py <tenant_id>|--all [--dry-run] [--rate <docs/sec>] [--max <docs>]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services import retention_service
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python scripts/run_retention.py <tenant_id>|--all [--dry-run] [--rate <docs/sec>] [--max <docs>]")
+        raise SystemExit(1)
+
+    dry_run = "--dry-run" in args
+    rate = float(args[args.index("--rate") + 1]) if "--rate" in args else retention_service.DOCS_PER_SECOND
+    max_docs = int(args[args.index("--max") + 1]) if "--max" in args else None
+
+    initialize_firebase()
+    db = get_db()
+    tenants = retention_service.enabled_tenants(db) if args[0] == "--all" else [args[0]]
+
+    for tenant_id in tenants:
+        result = retention_service.run(db, tenant_id, dry_run=dry_run, docs_per_second=rate, max_docs=max_docs)
+        verb = "eligible" if dry_run else "moved"
+        summary = ", ".join(f"{c}: {n}" for c, n in result.items()) or "policy disabled"
+        print(f"✅ {tenant_id} ({verb}) {summary}")
+
+
+if __name__ == "__main__":
+    main()
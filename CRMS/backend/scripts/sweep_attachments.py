@@ -0,0 +1,31 @@
+"""
+Garbage-collect attachment storage: expired upload sessions (and their staging
+files) and blobs whose last reference was dropped more than
+ATTACHMENT_ORPHAN_GRACE_HOURS ago. Safe to run concurrently with uploads;
+run it periodically (e.g. hourly from cron).
+
+Usage: python scripts/sweep_attachments.py [--dry-run]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.firebase import initialize_firebase, get_db
+from services import attachment_service
+
+
+def main():
+    args = sys.argv[1:]
+    if args not in ([], ["--dry-run"]):
+        print("Usage: python scripts/sweep_attachments.py [--dry-run]")
+        raise SystemExit(1)
+
+    initialize_firebase()
+    result = attachment_service.sweep(get_db(), dry_run="--dry-run" in args)
+    verb = "eligible" if "--dry-run" in args else "removed"
+    print(f"✅ ({verb}) uploads: {result['uploads']}, blobs: {result['blobs']}")
+
+
+if __name__ == "__main__":
+    main()
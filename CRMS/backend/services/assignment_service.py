@@ -0,0 +1,269 @@
+"""Load-aware complaint auto-assignment.
+
+Every support agent has a live open-ticket counter in
+``agent_loads/{tenant}_{uid}``. The complaint handlers add
+``Increment`` deltas (``load_deltas``) to the same transaction / batch as
+the complaint write whenever a complaint is created, re-assigned, or moves
+between an open and a closed status, so no counting scan is ever needed.
+
+To pick an assignee, each process keeps an in-memory ``AgentPool`` per
+tenant. It is built from two small queries: the tenant's support users
+and their load documents. It holds one min-heap of ``(open, uid)`` per
+complaint category, so picking the least-loaded eligible agent is
+O(log n). The heaps use lazy deletion: a load change pushes a fresh entry,
+and stale entries are dropped when they reach the top. A pick reserves its
+slot right away, so concurrent requests in one process spread across
+agents. Other processes' assignments are picked up when the pool is
+rebuilt every ``REFRESH_SECONDS`` (outside the engine's lock, see
+``AssignmentEngine``).
+
+Agents are users with role ``support`` who are not deactivated. An agent
+with a ``categories`` list only receives those categories; an agent
+without one receives any category. An explicit ``assigned_to`` (on create,
+``PUT /:id/assign``, or the bulk ``assign`` operation) always overrides
+the engine.
+"""
+import heapq
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from services.customer_stats import is_open
+
+AGENT_LOADS = "agent_loads"
+AGENT_ROLE = "support"
+AUTO_ASSIGN = os.getenv("ASSIGNMENT_AUTO", "true").lower() == "true"
+REFRESH_SECONDS = float(os.getenv("ASSIGNMENT_REFRESH_SECONDS", "60"))
+MAX_OPEN_PER_AGENT = int(os.getenv("ASSIGNMENT_MAX_OPEN", "0"))   # 0 = no cap
+ANY = "*"
+
+
+def load_ref(db, tenant_id: str, uid: str):
+    return db.collection(AGENT_LOADS).document(f"{tenant_id}_{uid}")
+
+
+def load_deltas(old_assignee: Optional[str], old_status: Optional[str],
+                new_assignee: Optional[str], new_status: Optional[str]) -> Dict[str, int]:
+    """Open-ticket counter changes for one complaint going from (assignee, status) to the new pair."""
+    deltas: Dict[str, int] = {}
+    if old_assignee and is_open(old_status):
+        deltas[old_assignee] = deltas.get(old_assignee, 0) - 1
+    if new_assignee and is_open(new_status):
+        deltas[new_assignee] = deltas.get(new_assignee, 0) + 1
+    return {uid: d for uid, d in deltas.items() if d}
+
+
+def merge_deltas(into: Dict[str, int], deltas: Dict[str, int]) -> Dict[str, int]:
+    for uid, d in deltas.items():
+        into[uid] = into.get(uid, 0) + d
+    return into
+
+
+def apply(writer, db, tenant_id: str, deltas: Dict[str, int]):
+    """Add the counter updates to ``writer`` (Transaction or WriteBatch)."""
+    for uid, d in deltas.items():
+        if d:
+            writer.set(load_ref(db, tenant_id, uid), {
+                "tenant_id": tenant_id,
+                "uid": uid,
+                "open": firestore.Increment(d),
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            }, merge=True)
+
+
+# ---------- in-memory pool ----------
+
+class AgentPool:
+    """Eligible agents of one tenant with a lazy-deletion min-heap per category."""
+
+    def __init__(self, agents: Dict[str, Iterable[str]], loads: Dict[str, int], max_open: int = MAX_OPEN_PER_AGENT):
+        self.categories = {uid: frozenset(c.strip().lower() for c in cats if c) for uid, cats in agents.items()}
+        self.loads = {uid: max(0, int(loads.get(uid) or 0)) for uid in agents}
+        self.max_open = max_open
+        self._heaps: Dict[str, List[Tuple[int, str]]] = {}
+        self.built_at = time.monotonic()
+
+    def _members(self, category: str) -> List[str]:
+        return [uid for uid, cats in self.categories.items()
+                if category == ANY or not cats or category in cats]
+
+    def _heap(self, category: str) -> List[Tuple[int, str]]:
+        heap = self._heaps.get(category)
+        if heap is None or len(heap) > 2 * len(self.loads) + 16:
+            # first use, or too many stale entries: rebuild from current loads (O(n))
+            heap = [(self.loads[uid], uid) for uid in self._members(category)]
+            heapq.heapify(heap)
+            self._heaps[category] = heap
+        return heap
+
+    def pick(self, category: Optional[str] = None) -> Optional[str]:
+        """Least-loaded eligible agent (ties by uid), reserved (+1) immediately; None if nobody fits."""
+        category = (category or "").strip().lower() or ANY
+        heap = self._heap(category)
+        while heap:
+            load, uid = heap[0]
+            if self.loads.get(uid) != load:
+                heapq.heappop(heap)       # stale entry
+                continue
+            if self.max_open and load >= self.max_open:
+                return None
+            self.adjust(uid, 1)
+            return uid
+        return None
+
+    def adjust(self, uid: str, delta: int):
+        if uid not in self.loads or not delta:
+            return
+        self.loads[uid] = max(0, self.loads[uid] + delta)
+        cats = self.categories[uid]
+        for category, heap in self._heaps.items():
+            if category == ANY or not cats or category in cats:
+                heapq.heappush(heap, (self.loads[uid], uid))
+
+
+def fetch_pool(db, tenant_id: str) -> AgentPool:
+    agents = {}
+    q = (db.collection("users")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .where(filter=FieldFilter("role", "==", AGENT_ROLE)))
+    for snap in q.stream():
+        d = snap.to_dict() or {}
+        if d.get("is_active") is False or d.get("isActive") is False:
+            continue
+        agents[snap.id] = d.get("categories") or []
+    loads = {}
+    for snap in db.collection(AGENT_LOADS).where(filter=FieldFilter("tenant_id", "==", tenant_id)).stream():
+        d = snap.to_dict() or {}
+        if d.get("uid"):
+            loads[d["uid"]] = d.get("open") or 0
+    return AgentPool(agents, loads)
+
+
+class AssignmentEngine:
+    """Per-tenant pools behind one lock that only guards memory.
+
+    A refresh runs its Firestore queries outside the lock, one build per
+    tenant at a time; meanwhile other requests keep picking from the expired
+    pool (or wait, if the tenant has none yet), and the new pool is swapped in
+    under the lock. A build that overlaps ``invalidate`` is used once but not
+    kept.
+    """
+
+    def __init__(self, refresh_seconds: float = REFRESH_SECONDS, fetch=fetch_pool):
+        self.refresh_seconds = refresh_seconds
+        self._fetch = fetch
+        self._pools: Dict[str, AgentPool] = {}
+        self._building: Dict[str, threading.Event] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _pool(self, db, tenant_id: str) -> AgentPool:
+        while True:
+            with self._lock:
+                pool = self._pools.get(tenant_id)
+                if pool is not None and (time.monotonic() - pool.built_at <= self.refresh_seconds
+                                         or tenant_id in self._building):
+                    return pool
+                building = self._building.get(tenant_id)
+                if building is None:
+                    building = self._building[tenant_id] = threading.Event()
+                    generation = self._generation
+                    break
+            building.wait()
+
+        try:
+            pool = self._fetch(db, tenant_id)
+            with self._lock:
+                if generation == self._generation:
+                    self._pools[tenant_id] = pool
+            return pool
+        finally:
+            with self._lock:
+                self._building.pop(tenant_id, None)
+            building.set()
+
+    def pick(self, db, tenant_id: str, category: Optional[str] = None) -> Optional[str]:
+        """Choose and reserve an agent. Call ``release`` if the write that assigns it fails."""
+        pool = self._pool(db, tenant_id)
+        with self._lock:
+            return pool.pick(category)
+
+    def release(self, tenant_id: str, uid: Optional[str]):
+        if uid:
+            self.observe(tenant_id, {uid: -1})
+
+    def observe(self, tenant_id: str, deltas: Dict[str, int]):
+        """Mirror committed counter changes (made outside ``pick``) into this process's pool."""
+        with self._lock:
+            pool = self._pools.get(tenant_id)
+            if pool is not None:
+                for uid, d in deltas.items():
+                    pool.adjust(uid, d)
+
+    def invalidate(self, tenant_id: Optional[str] = None):
+        with self._lock:
+            self._generation += 1
+            if tenant_id is None:
+                self._pools.clear()
+            else:
+                self._pools.pop(tenant_id, None)
+
+    def snapshot(self, db, tenant_id: str) -> List[Dict[str, Any]]:
+        pool = self._pool(db, tenant_id)
+        with self._lock:
+            rows = [{"uid": uid, "open": load, "categories": sorted(pool.categories[uid])}
+                    for uid, load in pool.loads.items()]
+        return sorted(rows, key=lambda r: (r["open"], r["uid"]))
+
+
+_engine: Optional[AssignmentEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> AssignmentEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AssignmentEngine()
+    return _engine
+
+
+def set_engine(engine: Optional[AssignmentEngine]):
+    """Override the process-wide engine (tests)."""
+    global _engine
+    _engine = engine
+
+
+# ---------- repair ----------
+
+def rebuild_loads(db, tenant_id: str, open_statuses: Iterable[str]) -> Dict[str, int]:
+    """Recount every agent's open complaints (maintenance only; the API never scans)."""
+    counts: Dict[str, int] = {}
+    q = (db.collection("complaints")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .where(filter=FieldFilter("status", "in", list(open_statuses)))
+           .select(["assigned_to"]))
+    for snap in q.stream():
+        uid = (snap.to_dict() or {}).get("assigned_to")
+        if uid:
+            counts[uid] = counts.get(uid, 0) + 1
+    existing = {(s.to_dict() or {}).get("uid")
+                for s in db.collection(AGENT_LOADS).where(filter=FieldFilter("tenant_id", "==", tenant_id)).stream()}
+    batch, n = db.batch(), 0
+    for uid in set(counts) | {u for u in existing if u}:
+        batch.set(load_ref(db, tenant_id, uid), {
+            "tenant_id": tenant_id, "uid": uid, "open": counts.get(uid, 0),
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        })
+        n += 1
+        if n % 400 == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+    get_engine().invalidate(tenant_id)
+    return counts
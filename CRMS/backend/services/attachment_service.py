@@ -0,0 +1,251 @@
+"""Blob reference counting and garbage collection for attachments.
+
+Attachments are content-addressed: every ``attachments/{id}`` points at the
+bytes under ``content_key(tenant, sha256)`` and holds one reference on
+``blobs/{tenant}_{sha256}``. All reference changes are transactions on that
+blob doc:
+
+- taking a reference (dedup upload or finished upload) re-reads the blob, so
+  it can never resurrect one that is being collected;
+- dropping the last reference only marks the blob ``orphaned_at``; the bytes
+  stay, and a dedup upload within the grace period simply revives it.
+
+``sweep`` (``scripts/sweep_attachments.py``, e.g. hourly from cron) claims
+blobs that stayed orphaned for ``ORPHAN_GRACE`` in a transaction (``deleting``),
+deletes their bytes and then the doc. Uploads finishing against a claimed
+blob get ``BlobBusy`` and retry once it is gone. The sweep also expires
+abandoned ``uploads`` and their staging files.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from utils.storage import content_key, get_storage
+
+ORPHAN_GRACE = timedelta(hours=float(os.getenv("ATTACHMENT_ORPHAN_GRACE_HOURS", "24")))
+UPLOAD_TTL = timedelta(hours=float(os.getenv("ATTACHMENT_UPLOAD_TTL_HOURS", "24")))
+
+UPLOAD_PENDING = "pending"
+UPLOAD_COMMITTING = "committing"   # attachment + reference written, bytes not yet moved into place
+UPLOAD_COMPLETE = "complete"
+UPLOAD_FAILED = "failed"
+
+
+class BlobBusy(Exception):
+    """The blob is being garbage-collected; retry the upload shortly."""
+
+
+class UploadClosed(Exception):
+    """The upload failed or expired; it can no longer produce an attachment."""
+
+
+def blob_ref(db, tenant_id: str, sha256: str):
+    return db.collection("blobs").document(f"{tenant_id}_{sha256}")
+
+
+def upload_expiry(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.now(timezone.utc)) + UPLOAD_TTL
+
+
+# ---------- blob state ----------
+
+def reference_update(blob: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fields to write on the blob for one more reference (``blob`` is the current doc or None)."""
+    if blob and blob.get("deleting"):
+        raise BlobBusy("blob is being deleted")
+    update: Dict[str, Any] = {
+        "ref_count": max(int((blob or {}).get("ref_count") or 0), 0) + 1,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+    if blob and "orphaned_at" in blob:
+        update["orphaned_at"] = firestore.DELETE_FIELD
+    return update
+
+
+def release_update(blob: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields to write on the blob for one reference less; the last one marks it orphaned."""
+    remaining = int(blob.get("ref_count") or 0) - 1
+    update: Dict[str, Any] = {"ref_count": max(remaining, 0), "updated_at": firestore.SERVER_TIMESTAMP}
+    if remaining <= 0:
+        update["orphaned_at"] = firestore.SERVER_TIMESTAMP
+    return update
+
+
+def collectable(blob: Optional[Dict[str, Any]], cutoff: datetime) -> bool:
+    """True if the sweep may (keep) delete(ing) this blob's bytes."""
+    if not blob or int(blob.get("ref_count") or 0) > 0:
+        return False
+    if blob.get("deleting"):
+        return True
+    orphaned_at = blob.get("orphaned_at")
+    return isinstance(orphaned_at, datetime) and orphaned_at < cutoff
+
+
+# ---------- references ----------
+
+def _attachment_data(tenant_id, uid, sha256, size, filename, content_type) -> Dict[str, Any]:
+    return {
+        "tenant_id": tenant_id,
+        "sha256": sha256,
+        "size": size,
+        "filename": filename,
+        "content_type": content_type,
+        "storage_key": content_key(tenant_id, sha256),
+        "created_by": uid,
+        "created_at": firestore.SERVER_TIMESTAMP,
+    }
+
+
+def add_reference(db, tenant_id: str, uid: str, sha256: str, size: int, filename: str,
+                  content_type: str, existing_only: bool = False,
+                  upload_id: Optional[str] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Create an attachment and take its blob reference in one transaction.
+
+    ``existing_only`` (dedup): only if a blob of that size is already stored,
+    otherwise returns None. ``upload_id``: the upload is re-read in the
+    transaction and moved to ``committing``, so concurrent or retried final
+    chunks all get the one attachment the first of them created (raises
+    ``UploadClosed`` if the upload failed meanwhile). Raises ``BlobBusy``
+    while the blob is swept.
+    """
+    ref = blob_ref(db, tenant_id, sha256)
+    upload_ref = db.collection("uploads").document(upload_id) if upload_id else None
+    att_ref = db.collection("attachments").document()
+    data = _attachment_data(tenant_id, uid, sha256, size, filename, content_type)
+
+    @firestore.transactional
+    def _txn(transaction):
+        upload = None
+        if upload_ref is not None:
+            upload = upload_ref.get(transaction=transaction).to_dict() or {}
+        snap = ref.get(transaction=transaction)
+        if upload is not None and upload.get("status") != UPLOAD_PENDING:
+            if upload.get("attachment_id"):
+                return upload["attachment_id"]
+            raise UploadClosed(f"upload is {upload.get('status') or 'gone'}")
+        blob = (snap.to_dict() or {}) if snap.exists else None
+        if existing_only and (blob is None or blob.get("deleting") or blob.get("size") != size):
+            return None
+        update = reference_update(blob)
+        transaction.set(att_ref, data)
+        if blob is None:
+            transaction.set(ref, {**update, "tenant_id": tenant_id, "sha256": sha256, "size": size,
+                                  "storage_key": data["storage_key"], "created_at": firestore.SERVER_TIMESTAMP})
+        else:
+            transaction.update(ref, update)
+        if upload_ref is not None:
+            transaction.update(upload_ref, {
+                "status": UPLOAD_COMMITTING, "sha256": sha256, "attachment_id": att_ref.id,
+            })
+        return att_ref.id
+
+    att_id = _txn(db.transaction())
+    if att_id is None:
+        return None
+    if att_id != att_ref.id:
+        return att_id, db.collection("attachments").document(att_id).get().to_dict() or {}
+    return att_id, data
+
+
+def finish_upload(db, upload_id: str, tenant_id: str, sha256: str, storage=None) -> bool:
+    """Move the staged bytes into place (idempotent) and mark the upload complete.
+
+    Returns True if these bytes were stored for the first time.
+    """
+    storage = storage or get_storage()
+    created = False
+    key = content_key(tenant_id, sha256)
+    if storage.staging_size(upload_id):
+        try:
+            created = storage.commit_staging(upload_id, key)
+        except OSError:
+            # a concurrent request for the same upload moved the staged bytes first
+            if not storage.exists(key):
+                raise
+    db.collection("uploads").document(upload_id).update({
+        "status": UPLOAD_COMPLETE, "completed_at": firestore.SERVER_TIMESTAMP,
+    })
+    return created
+
+
+def release_reference(db, attachment_id: str, tenant_id: str, sha256: str):
+    """Delete the attachment and drop its blob reference (bytes are left to ``sweep``)."""
+    att_ref = db.collection("attachments").document(attachment_id)
+    ref = blob_ref(db, tenant_id, sha256)
+
+    @firestore.transactional
+    def _txn(transaction):
+        snap = ref.get(transaction=transaction)
+        transaction.delete(att_ref)
+        if snap.exists:
+            transaction.update(ref, release_update(snap.to_dict() or {}))
+
+    _txn(db.transaction())
+
+
+# ---------- garbage collection ----------
+
+def _claim(db, ref, cutoff: datetime) -> Optional[Dict[str, Any]]:
+    @firestore.transactional
+    def _txn(transaction):
+        snap = ref.get(transaction=transaction)
+        blob = (snap.to_dict() or {}) if snap.exists else None
+        if not collectable(blob, cutoff):
+            return None
+        if not blob.get("deleting"):
+            transaction.update(ref, {"deleting": True})
+        return blob
+
+    return _txn(db.transaction())
+
+
+def sweep_blobs(db, storage=None, now: Optional[datetime] = None, dry_run: bool = False) -> int:
+    """Delete bytes and docs of blobs orphaned for longer than ``ORPHAN_GRACE``."""
+    storage = storage or get_storage()
+    cutoff = (now or datetime.now(timezone.utc)) - ORPHAN_GRACE
+    q = db.collection("blobs").where(filter=FieldFilter("orphaned_at", "<", cutoff))
+    deleted = 0
+    for snap in q.stream():
+        if dry_run:
+            deleted += int(collectable(snap.to_dict() or {}, cutoff))
+            continue
+        blob = _claim(db, snap.reference, cutoff)
+        if blob is None:
+            continue
+        # Claimed: no reference can be taken any more, so the bytes can go before the doc.
+        storage.delete(blob.get("storage_key") or content_key(blob["tenant_id"], blob["sha256"]))
+        snap.reference.delete()
+        deleted += 1
+    return deleted
+
+
+def sweep_uploads(db, storage=None, now: Optional[datetime] = None, dry_run: bool = False) -> int:
+    """Drop expired upload sessions and their staging files.
+
+    An upload left in ``committing`` already has its attachment, so its staged
+    bytes are moved into place instead of being discarded.
+    """
+    storage = storage or get_storage()
+    q = db.collection("uploads").where(filter=FieldFilter("expires_at", "<", now or datetime.now(timezone.utc)))
+    expired = 0
+    for snap in q.stream():
+        expired += 1
+        if dry_run:
+            continue
+        upload = snap.to_dict() or {}
+        if upload.get("status") == UPLOAD_COMMITTING:
+            finish_upload(db, snap.id, upload["tenant_id"], upload["sha256"], storage)
+        else:
+            storage.discard_staging(snap.id)
+        snap.reference.delete()
+    return expired
+
+
+def sweep(db, storage=None, now: Optional[datetime] = None, dry_run: bool = False) -> Dict[str, int]:
+    return {
+        "uploads": sweep_uploads(db, storage, now, dry_run),
+        "blobs": sweep_blobs(db, storage, now, dry_run),
+    }
@@ -0,0 +1,243 @@
+"""Point-in-time tenant backup and restore.
+
+``export_tenant`` snapshots one tenant's customers, logs, complaints and
+users as of a single ``read_time``: every read in the export passes the same
+``read_time``, so the backup is consistent across collections even while
+the tenant keeps writing. Each collection is split with partition queries
+and the partitions are read in a worker pool; documents stream into gzip
+NDJSON shards (``utils/ndjson.py`` encoding) of at most ``SHARD_DOCS``
+documents in the storage backend:
+
+    backups/{tenant}/{backup_id}/{collection}/{partition}-{shard}.ndjson.gz
+    backups/{tenant}/{backup_id}/manifest.json
+
+Firestore only serves reads up to an hour in the past (longer with
+point-in-time recovery enabled), so an export must finish within that
+window. ``restore_tenant`` streams shards back through BulkWriter one shard
+at a time, so memory stays bounded by one shard regardless of tenant size.
+
+Restored documents carry the denormalized fields of the backup time
+(customer stats, ``segment_ids``) and bypass the counters the API keeps on
+every write (agent loads, segment counts), so a restore ends with
+``rebuild_derived``. Daily rollups are not rebuilt: run
+``scripts/recompute_rollups.py`` over the dates the restore touched.
+"""
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+
+from services import assignment_service, bulk_service, customer_stats, segment_service
+from services.sync_service import SYNC_COLLECTIONS
+from utils import ndjson
+from utils.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+BACKUP_COLLECTIONS = ("customers", "logs", "complaints", "users")
+BACKUPS = "backups"               # Firestore: one status document per backup
+MANIFEST_VERSION = 1
+SHARD_DOCS = 5000
+DEFAULT_PARTITIONS = 16
+DEFAULT_WORKERS = 8
+
+
+class BackupNotFound(LookupError):
+    """No manifest for this tenant/backup id."""
+
+
+def backup_id_for(read_time: datetime) -> str:
+    return read_time.strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def prefix(tenant_id: str, backup_id: str) -> str:
+    return f"backups/{tenant_id}/{backup_id}"
+
+
+def manifest_key(tenant_id: str, backup_id: str) -> str:
+    return f"{prefix(tenant_id, backup_id)}/manifest.json"
+
+
+def record_ref(db, tenant_id: str, backup_id: str):
+    return db.collection(BACKUPS).document(f"{tenant_id}_{backup_id}")
+
+
+# ---------- export ----------
+
+def _partition_bounds(db, collection: str, count: int, read_time: datetime):
+    """Split points over the whole collection; each range is then read with the tenant filter."""
+    bounds, start = [], None
+    for part in db.collection_group(collection).get_partitions(max(1, count), read_time=read_time):
+        end = part.end_at.path if part.end_at is not None else None
+        bounds.append((start, end))
+        start = end
+    return bounds or [(None, None)]
+
+
+def _export_partition(db, storage, tenant_id: str, backup_id: str, collection: str,
+                      index: int, bounds, read_time: datetime, shard_docs: int) -> List[Dict[str, Any]]:
+    start, end = bounds
+    q = (db.collection(collection)
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .order_by("__name__"))
+    if start:
+        q = q.start_at([db.document(start)])
+    if end:
+        q = q.end_before([db.document(end)])
+
+    shards: List[Dict[str, Any]] = []
+    lines: List[str] = []
+
+    def _flush():
+        key = f"{prefix(tenant_id, backup_id)}/{collection}/{index:04d}-{len(shards):04d}.ndjson.gz"
+        payload = ndjson.gzip_lines(lines)
+        storage.write_stream(key, io.BytesIO(payload))
+        shards.append({"key": key, "documents": len(lines), "bytes": len(payload)})
+        lines.clear()
+
+    for snap in q.stream(read_time=read_time):
+        lines.append(ndjson.dumps_doc(snap.id, snap.to_dict() or {}))
+        if len(lines) >= shard_docs:
+            _flush()
+    if lines:
+        _flush()
+    return shards
+
+
+def export_tenant(db, tenant_id: str, read_time: Optional[datetime] = None,
+                  collections=BACKUP_COLLECTIONS, partitions: int = DEFAULT_PARTITIONS,
+                  workers: int = DEFAULT_WORKERS, shard_docs: int = SHARD_DOCS,
+                  storage=None) -> Dict[str, Any]:
+    """Write a consistent snapshot of the tenant and return its manifest."""
+    storage = storage or get_storage()
+    read_time = (read_time or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    backup_id = backup_id_for(read_time)
+    record = record_ref(db, tenant_id, backup_id)
+    record.set({"tenant_id": tenant_id, "backup_id": backup_id, "read_time": read_time,
+                "status": "running", "created_at": firestore.SERVER_TIMESTAMP})
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="backup") as pool:
+            jobs = {c: [pool.submit(_export_partition, db, storage, tenant_id, backup_id, c, i, b,
+                                    read_time, shard_docs)
+                        for i, b in enumerate(_partition_bounds(db, c, partitions, read_time))]
+                    for c in collections}
+            result = {c: [s for f in futures for s in f.result()] for c, futures in jobs.items()}
+    except Exception as e:
+        record.set({"status": "failed", "error": str(e), "finished_at": firestore.SERVER_TIMESTAMP}, merge=True)
+        raise
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "tenant_id": tenant_id,
+        "backup_id": backup_id,
+        "read_time": read_time.isoformat(),
+        "collections": {c: {"documents": sum(s["documents"] for s in shards), "shards": shards}
+                        for c, shards in result.items()},
+    }
+    storage.write_stream(manifest_key(tenant_id, backup_id),
+                         io.BytesIO(json.dumps(manifest, indent=2).encode("utf-8")))
+    record.set({"status": "done", "manifest_key": manifest_key(tenant_id, backup_id),
+                "documents": {c: v["documents"] for c, v in manifest["collections"].items()},
+                "finished_at": firestore.SERVER_TIMESTAMP}, merge=True)
+    return manifest
+
+
+# ---------- restore ----------
+
+def load_manifest(tenant_id: str, backup_id: str, storage=None) -> Dict[str, Any]:
+    storage = storage or get_storage()
+    key = manifest_key(tenant_id, backup_id)
+    if not storage.exists(key):
+        raise BackupNotFound(f"backup {backup_id} not found for tenant {tenant_id}")
+    manifest = json.loads(b"".join(storage.read_range(key)).decode("utf-8"))
+    if manifest.get("tenant_id") != tenant_id:
+        raise BackupNotFound(f"backup {backup_id} belongs to another tenant")
+    return manifest
+
+
+def _restore_shard(db, storage, tenant_id: str, collection: str, key: str) -> Dict[str, int]:
+    counts = {"restored": 0, "skipped": 0, "failed": 0}
+    writer = db.bulk_writer(options=BulkWriterOptions(
+        initial_ops_per_second=bulk_service.INITIAL_OPS_PER_SECOND,
+        max_ops_per_second=bulk_service.MAX_OPS_PER_SECOND,
+    ))
+
+    def _err(failure, _bw):
+        retry = failure.attempts < bulk_service.MAX_ATTEMPTS
+        if not retry:
+            counts["failed"] += 1
+        return retry
+
+    writer.on_write_error(_err)
+    bump = collection in SYNC_COLLECTIONS
+    for line in ndjson.iter_gzip_lines(ndjson.open_chunks(storage.read_range(key))):
+        doc_id, data = ndjson.loads_doc(line, db)
+        if data.get("tenant_id") != tenant_id:
+            counts["skipped"] += 1      # never write into another tenant
+            continue
+        if bump:
+            # restored documents are changes as far as delta-sync replicas are concerned
+            data["updated_at"] = firestore.SERVER_TIMESTAMP
+        writer.set(db.collection(collection).document(doc_id), data)
+        counts["restored"] += 1
+    writer.close()
+    counts["restored"] -= counts["failed"]
+    return counts
+
+
+def rebuild_derived(db, tenant_id: str) -> Dict[str, int]:
+    """Recompute customer stats, agent loads and segment membership from the live documents."""
+    customers = customer_stats.rebuild(db, tenant_id)
+    agents = assignment_service.rebuild_loads(db, tenant_id, customer_stats.OPEN_STATUSES)
+    segment_service.invalidate(tenant_id)
+    segments = 0
+    for segment_id, rule in segment_service.segments_of(db, tenant_id).items():
+        try:
+            segment_service.build(db, tenant_id, segment_id, rule)
+            segments += 1
+        except NotFound:
+            pass                        # deleted meanwhile
+    segment_service.invalidate(tenant_id)
+    return {"customers": customers, "agents": len(agents), "segments": segments}
+
+
+def restore_tenant(db, tenant_id: str, backup_id: str, collections=None,
+                   workers: int = DEFAULT_WORKERS, storage=None, rebuild: bool = True) -> Dict[str, Dict[str, int]]:
+    """
+    Write every document of the backup back (overwriting the live version).
+    Documents created after the backup are left in place. With ``rebuild``
+    the derived counters are recomputed afterwards (``rebuild_derived``).
+    """
+    storage = storage or get_storage()
+    manifest = load_manifest(tenant_id, backup_id, storage)
+    wanted = [c for c in manifest["collections"] if collections is None or c in collections]
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="restore") as pool:
+        jobs = {c: [pool.submit(_restore_shard, db, storage, tenant_id, c, s["key"])
+                    for s in manifest["collections"][c]["shards"]]
+                for c in wanted}
+        totals = {}
+        for c, futures in jobs.items():
+            parts = [f.result() for f in futures]
+            totals[c] = {k: sum(p[k] for p in parts) for k in ("restored", "skipped", "failed")}
+    if rebuild and set(wanted) & {"customers", "logs", "complaints"}:
+        logger.info("restore %s/%s: rebuilt %s", tenant_id, backup_id, rebuild_derived(db, tenant_id))
+    return totals
+
+
+def list_backups(db, tenant_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+    q = (db.collection(BACKUPS)
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .order_by("read_time", direction=firestore.Query.DESCENDING)
+           .limit(limit))
+    out = []
+    for snap in q.stream():
+        d = snap.to_dict() or {}
+        out.append({k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in d.items()})
+    return out
@@ -0,0 +1,149 @@
+"""Complaint Kanban board: one column per status.
+
+Cards in a column are ordered by ``board_rank`` (ascending). New complaints
+get ``initial_rank()`` – the negated creation time in ms – so the newest card
+sits on top. A drag-and-drop move writes only the moved card: its new rank
+is the midpoint between the neighbours it was dropped between. Only when the
+float gap between two neighbours is used up is that one column renumbered.
+
+Each column is one indexed query (``tenant_id, status, board_rank``) plus a
+count aggregation; the board runs all of them in parallel.
+"""
+import base64
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from models.complaint import Complaint
+from services import bulk_service
+from utils import query_planner
+from utils.query_planner import QuerySpec, ASC
+
+BOARD_STATUSES = list(Complaint.STATUSES)
+DEFAULT_COLUMN_SIZE = 20
+MAX_COLUMN_SIZE = 100
+RANK_STEP = 1024.0      # spacing used when a column is renumbered
+
+
+class RankExhausted(ValueError):
+    """No float left between two neighbouring ranks; the column needs renumbering."""
+
+
+def initial_rank(now: Optional[float] = None) -> float:
+    return -float(int((time.time() if now is None else now) * 1000))
+
+
+def rank_between(before: Optional[float], after: Optional[float]) -> float:
+    """
+    Rank for a card dropped below ``before`` and above ``after`` (either may be
+    None at the ends of the column).
+    """
+    if before is None and after is None:
+        return initial_rank()
+    if before is None:
+        return after - RANK_STEP
+    if after is None:
+        return before + RANK_STEP
+    if before >= after:
+        raise ValueError("before must rank above after")
+    mid = before + (after - before) / 2
+    if not before < mid < after:
+        raise RankExhausted(f"no rank between {before!r} and {after!r}")
+    return mid
+
+
+# ---------- cursors ----------
+
+def encode_cursor(rank: float, doc_id: str) -> str:
+    raw = json.dumps([rank, doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[float, str]]:
+    """Raises ValueError on a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        rank, doc_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8"))
+        return float(rank), str(doc_id)
+    except Exception:
+        raise ValueError("invalid board cursor") from None
+
+
+# ---------- reads ----------
+
+def _column_spec(tenant_id: str, status: str) -> QuerySpec:
+    return (QuerySpec("complaints").where("tenant_id", "==", tenant_id)
+                                   .where("status", "==", status)
+                                   .order("board_rank", ASC))
+
+
+def column_cards(db, tenant_id: str, status: str, limit: int = DEFAULT_COLUMN_SIZE,
+                 cursor: Optional[str] = None) -> Dict[str, Any]:
+    """One page of a column. ``cursor`` comes from a previous page's ``nextCursor``."""
+    if status not in BOARD_STATUSES:
+        raise KeyError(status)
+    limit = max(1, min(int(limit), MAX_COLUMN_SIZE))
+    after = decode_cursor(cursor)
+    q = query_planner.plan(_column_spec(tenant_id, status)).query(db).order_by("__name__")
+    if after:
+        q = q.start_after({"board_rank": after[0], "__name__": after[1]})
+    # one extra card tells us whether there is another page
+    docs = list(q.limit(limit + 1).stream())
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    cards = [{"id": d.id, **(d.to_dict() or {})} for d in docs]
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(cards[-1].get("board_rank"), cards[-1]["id"])
+    return {"status": status, "cards": cards, "nextCursor": next_cursor, "hasMore": has_more}
+
+
+def column_count(db, tenant_id: str, status: str) -> int:
+    """Exact size of a column via a count aggregation (no documents are read)."""
+    spec = QuerySpec("complaints").where("tenant_id", "==", tenant_id).where("status", "==", status)
+    result = query_planner.plan(spec).query(db).count(alias="total").get()
+    return int(result[0][0].value) if result and result[0] else 0
+
+
+def board(db, tenant_id: str, limit: int = DEFAULT_COLUMN_SIZE) -> Dict[str, Any]:
+    """First ``limit`` cards and the exact count of every column, queried in parallel."""
+    with ThreadPoolExecutor(max_workers=2 * len(BOARD_STATUSES)) as pool:
+        pages = {s: pool.submit(column_cards, db, tenant_id, s, limit) for s in BOARD_STATUSES}
+        counts = {s: pool.submit(column_count, db, tenant_id, s) for s in BOARD_STATUSES}
+        columns = [{**pages[s].result(), "count": counts[s].result()} for s in BOARD_STATUSES]
+    return {"columns": columns, "limit": max(1, min(int(limit), MAX_COLUMN_SIZE))}
+
+
+# ---------- moves ----------
+
+def _rank_of(db, tenant_id: str, complaint_id: Optional[str]) -> Optional[float]:
+    if not complaint_id:
+        return None
+    snap = db.collection("complaints").document(complaint_id).get()
+    data = (snap.to_dict() or {}) if snap.exists else {}
+    if data.get("tenant_id") != tenant_id or data.get("board_rank") is None:
+        raise LookupError(f"unknown neighbour card {complaint_id}")
+    return float(data["board_rank"])
+
+
+def renumber_column(db, tenant_id: str, status: str) -> int:
+    """Respace one column's ranks by RANK_STEP, keeping the order. Returns cards written."""
+    q = query_planner.plan(_column_spec(tenant_id, status)).query(db).order_by("__name__")
+    refs = [d.reference for d in q.select(["board_rank"]).stream()]
+    results = bulk_service.bulk_update(db, ((ref, {"board_rank": (i + 1) * RANK_STEP}) for i, ref in enumerate(refs)))
+    return sum(1 for r in results.values() if r.get("ok"))
+
+
+def rank_for_move(db, tenant_id: str, status: str, before_id: Optional[str], after_id: Optional[str]) -> float:
+    """
+    Rank for a card dropped into ``status`` between the cards ``before_id``
+    (above) and ``after_id`` (below). Renumbers the column once if the gap is
+    used up.
+    """
+    try:
+        return rank_between(_rank_of(db, tenant_id, before_id), _rank_of(db, tenant_id, after_id))
+    except RankExhausted:
+        renumber_column(db, tenant_id, status)
+        return rank_between(_rank_of(db, tenant_id, before_id), _rank_of(db, tenant_id, after_id))
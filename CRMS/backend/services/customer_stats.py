@@ -0,0 +1,273 @@
+"""Denormalized per-customer activity stats.
+
+Log and complaint writes keep these fields on ``customers/{id}`` so the list
+endpoint can sort/filter on them through indexes instead of joining:
+
+- ``logs_count``, ``logs_this_month`` (+ ``stats_month`` = 'YYYY-MM' it refers to)
+- ``last_log_at``, ``last_contact_date``, ``last_activity_at``
+- ``complaints_count``, ``open_complaints``
+
+Complaint updates are staged on the caller's Transaction so they commit
+atomically with the source write. Log activity – the hot path, a key account
+can receive bursts of logs – goes through the write-behind buffer instead
+(``queue_log_activity``): bursts on one customer become one small
+transaction per window. ``rebuild`` repairs anything lost in a crash.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from models.complaint import Complaint
+from services import segment_service
+from utils import write_behind
+
+OPEN_STATUSES = {Complaint.STATUS_NEW, Complaint.STATUS_ACKNOWLEDGED, Complaint.STATUS_IN_PROGRESS}
+
+STAT_FIELDS = (
+    "logs_count", "logs_this_month", "stats_month",
+    "last_log_at", "last_contact_date", "last_activity_at",
+    "complaints_count", "open_complaints",
+)
+
+# Fields the list endpoint may sort on (each has a tenant_id composite index)
+SORTABLE_FIELDS = (
+    "last_contact_date", "last_activity_at", "logs_count", "logs_this_month", "open_complaints",
+)
+
+
+def month_key(dt: Optional[datetime] = None) -> str:
+    return (dt or datetime.now(timezone.utc)).strftime("%Y-%m")
+
+
+def initial_stats() -> Dict[str, Any]:
+    """Zeroed counters for new customers (documents missing a field drop out of order_by queries)."""
+    return {
+        "logs_count": 0,
+        "logs_this_month": 0,
+        "stats_month": month_key(),
+        "complaints_count": 0,
+        "open_complaints": 0,
+    }
+
+
+def is_open(status: Optional[str]) -> bool:
+    return (status or Complaint.STATUS_NEW) in OPEN_STATUSES
+
+
+def logs_this_month(data: Dict[str, Any]) -> int:
+    """Stored counter, or 0 if it still refers to an earlier month."""
+    if (data or {}).get("stats_month") != month_key():
+        return 0
+    return int((data or {}).get("logs_this_month") or 0)
+
+
+# ---------- update builders ----------
+
+def log_activity_update(existing: Dict[str, Any], count: int = 1,
+                        at: Optional[datetime] = None) -> Dict[str, Any]:
+    """Fields to write on the customer after ``count`` new logs (the latest at ``at``).
+
+    Needs the current document to roll ``logs_this_month`` over on a new month.
+    """
+    month = month_key()
+    last = at or firestore.SERVER_TIMESTAMP
+    update: Dict[str, Any] = {
+        "logs_count": firestore.Increment(count),
+        "stats_month": month,
+        "last_log_at": last,
+        "last_contact_date": last,
+        "last_activity_at": last,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+    if (existing or {}).get("stats_month") == month:
+        update["logs_this_month"] = firestore.Increment(count)
+    else:
+        update["logs_this_month"] = count
+    return update
+
+
+def _this_month(at: Any) -> bool:
+    return isinstance(at, datetime) and month_key(at) == month_key()
+
+
+def log_removed_update(customer: Dict[str, Any], log: Dict[str, Any]) -> Dict[str, Any]:
+    """Counters to take back when ``log`` is deleted or moved to another customer.
+
+    ``last_log_at``/``last_contact_date`` keep their value (the customer *was*
+    contacted then); ``scripts/rebuild_customer_stats.py`` recomputes them.
+    """
+    update: Dict[str, Any] = {
+        "logs_count": firestore.Increment(-1),
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+    if logs_this_month(customer) and _this_month(log.get("created_at")):
+        update["logs_this_month"] = firestore.Increment(-1)
+    return update
+
+
+def log_moved_in_update(customer: Dict[str, Any], log: Dict[str, Any]) -> Dict[str, Any]:
+    """Counters for the customer an existing ``log`` is moved to (dated by the log, not now)."""
+    month = month_key()
+    at = log.get("created_at")
+    update: Dict[str, Any] = {
+        "logs_count": firestore.Increment(1),
+        "stats_month": month,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+    if (customer or {}).get("stats_month") == month:
+        if _this_month(at):
+            update["logs_this_month"] = firestore.Increment(1)
+    else:
+        update["logs_this_month"] = int(_this_month(at))
+    if isinstance(at, datetime):
+        for field in ("last_log_at", "last_contact_date", "last_activity_at"):
+            current = (customer or {}).get(field)
+            if not isinstance(current, datetime) or at > current:
+                update[field] = at
+    return update
+
+
+def complaint_created_update(status: Optional[str]) -> Dict[str, Any]:
+    update: Dict[str, Any] = {
+        "complaints_count": firestore.Increment(1),
+        "last_activity_at": firestore.SERVER_TIMESTAMP,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+    if is_open(status):
+        update["open_complaints"] = firestore.Increment(1)
+    return update
+
+
+def complaint_status_update(old: Optional[str], new: str) -> Optional[Dict[str, Any]]:
+    """Open-counter delta for a status change, or None if nothing changes."""
+    delta = int(is_open(new)) - int(is_open(old))
+    if not delta:
+        return None
+    return {
+        "open_complaints": firestore.Increment(delta),
+        "last_activity_at": firestore.SERVER_TIMESTAMP,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+
+
+def read_customer(transaction, customer_ref, tenant_id: str):
+    """Transactional read; returns the customer dict only if it belongs to the tenant."""
+    snap = customer_ref.get(transaction=transaction)
+    if not snap.exists:
+        return None
+    data = snap.to_dict() or {}
+    return data if data.get("tenant_id") == tenant_id else None
+
+
+# ---------- write-behind (log activity) ----------
+
+LOG_ACTIVITY_KIND = "customer_log_activity"
+
+
+def _flush_log_activity(db, path: str, pending: Dict[str, Any]):
+    """One transaction for all logs coalesced on a customer within the window.
+
+    A new ``last_contact_date`` can move the customer in or out of
+    ``last_contact_days`` segments, so membership is re-evaluated here too.
+    """
+    ref = db.document(path)
+    tenant_id = pending["tenant_id"]
+    moved = {}
+
+    @firestore.transactional
+    def _txn(transaction):
+        moved.clear()
+        customer = read_customer(transaction, ref, tenant_id)
+        if customer is None:
+            return
+        update = log_activity_update(customer, pending["count"].value, at=pending.get("at"))
+        extra = None
+        if pending.get("at") is not None:
+            _, added, removed = segment_service.on_write(
+                db, tenant_id, customer, {**customer, "last_contact_date": pending["at"]})
+            extra = segment_service.stage(update, added, removed)
+            moved.update(segment_service.count_deltas(added, removed))
+        transaction.update(ref, update)
+        if extra:
+            transaction.update(ref, extra)
+
+    _txn(db.transaction())
+    segment_service.queue_counts(moved)
+
+
+write_behind.register(LOG_ACTIVITY_KIND, _flush_log_activity)
+
+
+def queue_log_activity(tenant_id: str, customer_id: str, at: Optional[datetime] = None):
+    """Record one new log for the customer; written (coalesced) by the write-behind buffer."""
+    write_behind.get_buffer().add(LOG_ACTIVITY_KIND, f"customers/{customer_id}", {
+        "tenant_id": tenant_id,
+        "count": firestore.Increment(1),
+        "at": at or datetime.now(timezone.utc),
+    })
+
+
+# ---------- batch rebuild ----------
+
+def rebuild(db, tenant_id: str, customer_ids: Optional[Iterable[str]] = None) -> int:
+    """Recompute stats from logs/complaints for a tenant (backfill / repair)."""
+    month = month_key()
+    stats: Dict[str, Dict[str, Any]] = {}
+
+    def _row(cid):
+        return stats.setdefault(cid, {**initial_stats(), "last_log_at": None, "last_activity_at": None})
+
+    logs_q = (db.collection("logs")
+                .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+                .select(["customer_id", "created_at"]))
+    for snap in logs_q.stream():
+        d = snap.to_dict() or {}
+        cid, at = d.get("customer_id"), d.get("created_at")
+        if not cid:
+            continue
+        row = _row(cid)
+        row["logs_count"] += 1
+        if isinstance(at, datetime):
+            if month_key(at) == month:
+                row["logs_this_month"] += 1
+            if row["last_log_at"] is None or at > row["last_log_at"]:
+                row["last_log_at"] = at
+
+    complaints_q = (db.collection("complaints")
+                      .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+                      .select(["customer_id", "status", "created_at", "updated_at"]))
+    for snap in complaints_q.stream():
+        d = snap.to_dict() or {}
+        cid = d.get("customer_id")
+        if not cid:
+            continue
+        row = _row(cid)
+        row["complaints_count"] += 1
+        if is_open(d.get("status")):
+            row["open_complaints"] += 1
+        at = d.get("updated_at") or d.get("created_at")
+        if isinstance(at, datetime) and (row["last_activity_at"] is None or at > row["last_activity_at"]):
+            row["last_activity_at"] = at
+
+    wanted = set(customer_ids) if customer_ids is not None else None
+    customers_q = db.collection("customers").where(filter=FieldFilter("tenant_id", "==", tenant_id))
+    batch, pending, written = db.batch(), 0, 0
+    for snap in customers_q.select(["tenant_id"]).stream():
+        if wanted is not None and snap.id not in wanted:
+            continue
+        row = stats.get(snap.id) or {**initial_stats(), "last_log_at": None, "last_activity_at": None}
+        if row["last_log_at"] is not None:
+            row["last_contact_date"] = row["last_log_at"]
+        if row["last_activity_at"] is None or (row["last_log_at"] and row["last_log_at"] > row["last_activity_at"]):
+            row["last_activity_at"] = row["last_log_at"]
+        batch.set(snap.reference, {k: v for k, v in row.items() if v is not None}, merge=True)
+        pending += 1
+        written += 1
+        if pending >= 450:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+    return written
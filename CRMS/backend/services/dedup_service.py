@@ -0,0 +1,222 @@
+"""Duplicate-customer detection via blocking keys.
+
+Every customer write stores a small set of *blocking keys* on the document
+(``dedup_keys``): normalized phone digits, lower-cased email and a phonetic
+key of the name. Two customers can only be duplicates if they share at least
+one key, so:
+
+- the pre-create check is a single indexed ``array_contains_any`` query, and
+- the batch job only scores pairs *inside* a block instead of N x N.
+"""
+import os
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from google.cloud.firestore_v1 import FieldFilter
+
+DEFAULT_COUNTRY_CODE = os.getenv("DEDUP_COUNTRY_CODE", "880")  # Bangladesh
+DUPLICATE_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+MAX_BLOCK_SIZE = int(os.getenv("DEDUP_MAX_BLOCK_SIZE", "200"))
+
+PHONE_FIELDS = ("phone", "secondary_phone")
+EMAIL_FIELDS = ("email", "secondary_email")
+
+# Firestore caps array_contains_any at 30 values
+_MAX_QUERY_KEYS = 30
+
+# Words that carry no identity in company / person names
+_NAME_STOPWORDS = {
+    "ltd", "limited", "pvt", "private", "inc", "llc", "co", "company", "corp",
+    "corporation", "plc", "group", "and", "the", "mr", "mrs", "ms", "md", "dr",
+}
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+# ---------- normalization ----------
+
+def normalize_phone(value: Any, country_code: str = DEFAULT_COUNTRY_CODE) -> str:
+    """Return the national significant number: '+880 1711-223344', '01711223344'
+    and '008801711223344' all become '1711223344'."""
+    digits = re.sub(r"\D", "", str(value or ""))
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if country_code and digits.startswith(country_code) and len(digits) > len(country_code) + 6:
+        digits = digits[len(country_code):]
+    digits = digits.lstrip("0")
+    return digits if len(digits) >= 6 else ""
+
+
+def normalize_email(value: Any) -> str:
+    email = str(value or "").strip().lower()
+    return email if "@" in email else ""
+
+
+def _name_tokens(value: Any) -> List[str]:
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode()
+    tokens = re.findall(r"[a-z]+", text.lower())
+    return [t for t in tokens if t not in _NAME_STOPWORDS]
+
+
+def soundex(word: str) -> str:
+    """Classic 4-character American Soundex."""
+    word = re.sub(r"[^a-z]", "", (word or "").lower())
+    if not word:
+        return ""
+    out = word[0].upper()
+    last = _SOUNDEX_CODES.get(word[0], "")
+    for ch in word[1:]:
+        code = _SOUNDEX_CODES.get(ch, "")
+        if code and code != last:
+            out += code
+            if len(out) == 4:
+                break
+        if ch not in "hw":
+            last = code
+    return out.ljust(4, "0")
+
+
+def name_key(value: Any) -> str:
+    """Order-insensitive phonetic key, e.g. 'Rahman Traders' == 'Traders Rahmaan'."""
+    codes = sorted({soundex(t) for t in _name_tokens(value)} - {""})
+    return "-".join(codes)
+
+
+def blocking_keys(data: Dict[str, Any]) -> List[str]:
+    """Compute the prefixed blocking keys stored on customers as ``dedup_keys``."""
+    keys: List[str] = []
+    for f in PHONE_FIELDS:
+        p = normalize_phone(data.get(f))
+        if p:
+            keys.append(f"p:{p}")
+    for f in EMAIL_FIELDS:
+        e = normalize_email(data.get(f))
+        if e:
+            keys.append(f"e:{e}")
+    n = name_key(data.get("name"))
+    if n:
+        keys.append(f"n:{n}")
+    # stable + unique
+    return sorted(set(keys))
+
+
+def affects_keys(delta: Dict[str, Any]) -> bool:
+    """True if an update touches any field the blocking keys derive from."""
+    return any(f in delta for f in ("name", *PHONE_FIELDS, *EMAIL_FIELDS))
+
+
+# ---------- scoring ----------
+
+def _name_ratio(a: Any, b: Any) -> float:
+    ta, tb = " ".join(sorted(_name_tokens(a))), " ".join(sorted(_name_tokens(b)))
+    if not ta or not tb:
+        return 0.0
+    return SequenceMatcher(None, ta, tb).ratio()
+
+
+def score_pair(a: Dict[str, Any], b: Dict[str, Any]) -> Tuple[float, List[str]]:
+    """Probability-style score in [0, 1] plus the list of signals that matched.
+
+    Independent signals are combined as ``1 - prod(1 - p)`` so that one strong
+    signal (same email) is enough, and agreeing signals reinforce each other.
+    """
+    phones_a = {normalize_phone(a.get(f)) for f in PHONE_FIELDS} - {""}
+    phones_b = {normalize_phone(b.get(f)) for f in PHONE_FIELDS} - {""}
+    emails_a = {normalize_email(a.get(f)) for f in EMAIL_FIELDS} - {""}
+    emails_b = {normalize_email(b.get(f)) for f in EMAIL_FIELDS} - {""}
+
+    signals: List[Tuple[str, float]] = []
+    if emails_a & emails_b:
+        signals.append(("email", 0.9))
+    if phones_a & phones_b:
+        signals.append(("phone", 0.85))
+    ratio = _name_ratio(a.get("name"), b.get("name"))
+    if ratio >= 0.75:
+        signals.append(("name", 0.6 * ratio))
+
+    miss = 1.0
+    for _, p in signals:
+        miss *= (1.0 - p)
+    return round(1.0 - miss, 4), [s for s, _ in signals]
+
+
+# ---------- Firestore helpers ----------
+
+def find_candidates(db, tenant_id: str, data: Dict[str, Any], limit: int = 10,
+                    exclude_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Pre-create check: one indexed query on ``dedup_keys`` for the tenant."""
+    keys = blocking_keys(data)
+    if not keys:
+        return []
+
+    q = (db.collection("customers")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .where(filter=FieldFilter("dedup_keys", "array_contains_any", keys[:_MAX_QUERY_KEYS]))
+           .limit(max(limit * 3, 25)))
+
+    out = []
+    for doc in q.stream():
+        if doc.id == exclude_id:
+            continue
+        other = doc.to_dict() or {}
+        score, matched = score_pair(data, other)
+        if not matched:
+            continue
+        out.append({
+            "id": doc.id,
+            "name": other.get("name"),
+            "email": other.get("email"),
+            "phone": other.get("phone"),
+            "company": other.get("company"),
+            "status": other.get("status"),
+            "score": score,
+            "matched": matched,
+        })
+    out.sort(key=lambda c: c["score"], reverse=True)
+    return out[:limit]
+
+
+def find_duplicate_pairs(customers: Iterable[Dict[str, Any]],
+                         threshold: float = DUPLICATE_THRESHOLD,
+                         max_block_size: int = MAX_BLOCK_SIZE) -> List[Dict[str, Any]]:
+    """Batch job core: group by blocking key and score pairs within each block.
+
+    ``customers`` are dicts with an ``id`` field. Oversized blocks (very common
+    names) are skipped; their members are still compared through their phone
+    and email blocks.
+    """
+    by_id: Dict[str, Dict[str, Any]] = {}
+    blocks: Dict[str, List[str]] = {}
+    for c in customers:
+        cid = c.get("id")
+        if not cid:
+            continue
+        by_id[cid] = c
+        for k in c.get("dedup_keys") or blocking_keys(c):
+            blocks.setdefault(k, []).append(cid)
+
+    seen = set()
+    pairs: List[Dict[str, Any]] = []
+    for key, ids in blocks.items():
+        if len(ids) < 2 or len(ids) > max_block_size:
+            continue
+        for a, b in combinations(sorted(ids), 2):
+            if (a, b) in seen:
+                continue
+            seen.add((a, b))
+            score, matched = score_pair(by_id[a], by_id[b])
+            if score >= threshold:
+                pairs.append({"a": a, "b": b, "score": score, "matched": matched})
+
+    pairs.sort(key=lambda p: p["score"], reverse=True)
+    return pairs
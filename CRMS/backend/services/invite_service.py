@@ -0,0 +1,196 @@
+"""Bulk user invitations.
+
+``invite_many`` does what ``POST /api/users/invite`` does for one email, for
+a whole list:
+
+1. existing Auth accounts are looked up 100 emails at a time with
+   ``auth.get_users`` instead of one ``get_user_by_email`` per row;
+2. ``create_user`` / ``set_custom_user_claims`` run in a bounded thread
+   pool, paced by a shared rate limiter and retried with exponential
+   backoff + jitter when Auth reports quota exhaustion or is unavailable;
+3. the Firestore ``users/{uid}`` documents are written in WriteBatches.
+
+Every input row gets a result; one bad row never fails the others.
+"""
+import csv
+import io
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from firebase_admin import auth as fb_auth
+from firebase_admin import exceptions as fb_exceptions
+from google.cloud import firestore
+
+from services.retention_service import RateLimiter
+
+MAX_INVITES = int(os.getenv("BULK_INVITE_MAX_ROWS", "1000"))
+AUTH_CONCURRENCY = int(os.getenv("BULK_INVITE_CONCURRENCY", "8"))
+AUTH_CALLS_PER_SECOND = float(os.getenv("BULK_INVITE_AUTH_QPS", "20"))
+LOOKUP_CHUNK = 100            # auth.get_users limit
+WRITE_BATCH_SIZE = 400
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 0.5            # seconds; doubled per attempt, capped
+BACKOFF_CAP = 16.0
+
+RETRYABLE = (
+    fb_exceptions.ResourceExhaustedError,
+    fb_exceptions.UnavailableError,
+    fb_exceptions.DeadlineExceededError,
+    fb_exceptions.InternalError,
+)
+
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+# ---------- input ----------
+
+def parse_csv(text: str) -> List[Dict[str, Any]]:
+    """CSV with an ``email[,role[,display_name]]`` header, or bare rows in that order."""
+    rows = [r for r in csv.reader(io.StringIO(text or "")) if any(c.strip() for c in r)]
+    if not rows:
+        return []
+    header = [c.strip().lower() for c in rows[0]]
+    if "email" in header:
+        cols, rows = header, rows[1:]
+    else:
+        cols = ["email", "role", "display_name"]
+    return [{cols[i]: v.strip() for i, v in enumerate(r) if i < len(cols) and v.strip()} for r in rows]
+
+
+def normalize_rows(rows: List[Dict[str, Any]], default_role: str,
+                   allowed_roles) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    -> (valid, rejected). Emails are lower-cased; later duplicates of an
+    email are rejected so one account never gets two different roles.
+    """
+    valid, rejected, seen = [], [], set()
+    for i, row in enumerate(rows):
+        row = row if isinstance(row, dict) else {"email": row}
+        email = str(row.get("email") or "").strip().lower()
+        role = str(row.get("role") or default_role or "viewer").strip().lower()
+        base = {"row": i, "email": email}
+        if not _EMAIL_RE.match(email):
+            rejected.append({**base, "ok": False, "error": "invalid email"})
+        elif role not in allowed_roles:
+            rejected.append({**base, "ok": False, "error": f"invalid role '{role}'"})
+        elif email in seen:
+            rejected.append({**base, "ok": False, "error": "duplicate email in request"})
+        else:
+            seen.add(email)
+            name = str(row.get("display_name") or row.get("displayName") or "").strip()
+            valid.append({**base, "role": role, "display_name": name or None})
+    return valid, rejected
+
+
+# ---------- Auth calls ----------
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_backoff(fn: Callable, *args, limiter: Optional[RateLimiter] = None, **kwargs):
+    for attempt in range(MAX_ATTEMPTS):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except RETRYABLE:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(backoff_delay(attempt))
+
+
+def _lookup(emails: List[str], limiter: RateLimiter, pool: ThreadPoolExecutor) -> Dict[str, Any]:
+    chunks = [emails[i:i + LOOKUP_CHUNK] for i in range(0, len(emails), LOOKUP_CHUNK)]
+    found: Dict[str, Any] = {}
+    for result in pool.map(lambda c: call_with_backoff(
+            fb_auth.get_users, [fb_auth.EmailIdentifier(e) for e in c], limiter=limiter), chunks):
+        for user in result.users:
+            if user.email:
+                found[user.email.lower()] = user
+    return found
+
+
+def _provision(row: Dict[str, Any], existing, tenant_id: str, limiter: RateLimiter) -> Dict[str, Any]:
+    """Create the account if needed and set its claims; returns the row result."""
+    try:
+        created = False
+        user = existing
+        if user is None:
+            kwargs = {"email": row["email"]}
+            if row.get("display_name"):
+                kwargs["display_name"] = row["display_name"]
+            try:
+                user = call_with_backoff(fb_auth.create_user, limiter=limiter, **kwargs)
+                created = True
+            except fb_auth.EmailAlreadyExistsError:     # created since the lookup
+                user = call_with_backoff(fb_auth.get_user_by_email, row["email"], limiter=limiter)
+        other_tenant = (user.custom_claims or {}).get("tenant_id")
+        if other_tenant and other_tenant != tenant_id:
+            return {**row, "ok": False, "uid": user.uid, "error": "user belongs to another tenant"}
+        call_with_backoff(fb_auth.set_custom_user_claims, user.uid,
+                          {"role": row["role"], "tenant_id": tenant_id}, limiter=limiter)
+        return {**row, "ok": True, "uid": user.uid, "created": created}
+    except Exception as e:
+        return {**row, "ok": False, "error": str(e)}
+
+
+# ---------- entry point ----------
+
+def invite_many(db, tenant_id: str, rows: List[Dict[str, Any]], default_role: str,
+                allowed_roles, invited_by: Optional[str] = None,
+                concurrency: int = AUTH_CONCURRENCY, qps: float = AUTH_CALLS_PER_SECOND) -> Dict[str, Any]:
+    valid, rejected = normalize_rows(rows, default_role, allowed_roles)
+    limiter = RateLimiter(qps)
+    results: List[Dict[str, Any]] = list(rejected)
+
+    if valid:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="invite") as pool:
+            try:
+                existing = _lookup([r["email"] for r in valid], limiter, pool)
+            except Exception as e:
+                existing = None
+                results.extend({**r, "ok": False, "error": f"lookup failed: {e}"} for r in valid)
+            if existing is not None:
+                provisioned = list(pool.map(
+                    lambda r: _provision(r, existing.get(r["email"]), tenant_id, limiter), valid))
+                _write_user_docs(db, tenant_id, [r for r in provisioned if r["ok"]], invited_by)
+                results.extend(provisioned)
+
+    results.sort(key=lambda r: r["row"])
+    ok = sum(1 for r in results if r["ok"])
+    return {
+        "requested": len(rows),
+        "invited": ok,
+        "created": sum(1 for r in results if r.get("created")),
+        "failed": len(results) - ok,
+        "results": results,
+    }
+
+
+def _write_user_docs(db, tenant_id: str, rows: List[Dict[str, Any]], invited_by: Optional[str]):
+    """Same document shape as the single invite; a failed batch marks its rows failed."""
+    for i in range(0, len(rows), WRITE_BATCH_SIZE):
+        chunk = rows[i:i + WRITE_BATCH_SIZE]
+        batch = db.batch()
+        for r in chunk:
+            doc = {
+                "uid": r["uid"], "email": r["email"], "email_lower": r["email"],
+                "role": r["role"], "tenant_id": tenant_id,
+                "is_active": True, "created_at": firestore.SERVER_TIMESTAMP,
+            }
+            if r.get("display_name"):
+                doc["displayName"] = r["display_name"]
+            if invited_by:
+                doc["invited_by"] = invited_by
+            batch.set(db.collection("users").document(r["uid"]), doc, merge=True)
+        try:
+            batch.commit()
+        except Exception as e:
+            for r in chunk:
+                r.update({"ok": False, "error": f"user document not written: {e}"})
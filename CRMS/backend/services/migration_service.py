@@ -0,0 +1,285 @@
+"""Resumable, partitioned document migrations (backfills and shape fixes).
+
+A migration is a named, idempotent transform ``data -> update | None`` over
+one collection. ``run()`` splits the collection with Firestore's
+``partition_query`` (``collection_group(...).get_partitions``) and walks the
+partitions in a worker pool; each worker pages through its key range in
+``__name__`` order and writes updates through its own BulkWriter.
+
+Progress is checkpointed per partition in
+``migrations/{name}/partitions/{n}`` after every flushed page, and the
+partition boundaries are stored on ``migrations/{name}`` the first time the
+migration runs, so an interrupted run resumes exactly where each partition
+stopped. A page may be replayed after a crash between flush and checkpoint,
+which is why transforms must be idempotent (return None once applied).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+
+from services import bulk_service
+from services.dedup_service import blocking_keys
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "migrations"
+DEFAULT_PARTITIONS = 32
+DEFAULT_WORKERS = 8
+PAGE_SIZE = 500
+MAX_FAILED_IDS = 100      # failed document ids kept on a partition checkpoint
+
+Transform = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+class Migration:
+    def __init__(self, name: str, collection: str, transform: Transform,
+                 fields: Optional[List[str]] = None, description: str = ""):
+        self.name = name
+        self.collection = collection
+        self.transform = transform
+        self.fields = fields          # projection; None reads whole documents
+        self.description = description
+
+
+_REGISTRY: Dict[str, Migration] = {}
+
+
+def migration(name: str, collection: str, fields: Optional[List[str]] = None):
+    """Register ``fn(data) -> update | None`` as migration ``name``."""
+    def _register(fn: Transform) -> Transform:
+        _REGISTRY[name] = Migration(name, collection, fn, fields, (fn.__doc__ or "").strip())
+        return fn
+    return _register
+
+
+def get(name: str) -> Migration:
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise KeyError(f"unknown migration {name!r}") from None
+
+
+def available() -> List[Migration]:
+    return [_REGISTRY[k] for k in sorted(_REGISTRY)]
+
+
+# ---------- migrations ----------
+
+def to_timestamp(value: Any) -> Optional[datetime]:
+    """'YYYY-MM-DD' or ISO 8601 string -> aware datetime (naive = UTC); None if not parseable."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+@migration("logs_log_date_timestamp", "logs", fields=["log_date"])
+def log_date_to_timestamp(data):
+    """Store log_date as a Timestamp instead of an ISO / YYYY-MM-DD string."""
+    dt = to_timestamp(data.get("log_date"))
+    return {"log_date": dt} if dt is not None else None
+
+
+# User.to_dict() writes camelCase, but queries and auth read snake_case
+USER_SNAKE_CASE = {
+    "tenantId": "tenant_id",
+    "displayName": "display_name",
+    "firstName": "first_name",
+    "lastName": "last_name",
+    "firebaseUid": "firebase_uid",
+    "avatarUrl": "avatar_url",
+    "isActive": "is_active",
+    "isVerified": "is_verified",
+    "lastLogin": "last_login",
+    "createdAt": "created_at",
+    "updatedAt": "updated_at",
+}
+
+
+@migration("users_snake_case", "users")
+def users_snake_case(data):
+    """Copy camelCase user fields to their snake_case names where those are missing."""
+    update = {snake: data[camel] for camel, snake in USER_SNAKE_CASE.items()
+              if data.get(camel) is not None and data.get(snake) is None}
+    return update or None
+
+
+@migration("complaints_updated_at", "complaints", fields=["created_at", "updated_at"])
+def complaints_updated_at(data):
+    """Set updated_at (from created_at) on complaints written before it was maintained."""
+    if data.get("updated_at") is not None:
+        return None
+    return {"updated_at": data.get("created_at") or firestore.SERVER_TIMESTAMP}
+
+
+@migration("customers_dedup_keys", "customers",
+           fields=["name", "email", "phone", "secondary_phone", "secondary_email", "dedup_keys"])
+def customers_dedup_keys(data):
+    """(Re)compute the normalized dedup_keys used by duplicate detection."""
+    keys = blocking_keys(data)
+    return {"dedup_keys": keys} if sorted(keys) != sorted(data.get("dedup_keys") or []) else None
+
+
+# ---------- runner ----------
+
+def _run_ref(db, name: str):
+    return db.collection(MIGRATIONS_COLLECTION).document(name)
+
+
+def _partition_ref(db, name: str, index: int):
+    return _run_ref(db, name).collection("partitions").document(f"{index:04d}")
+
+
+def plan_partitions(db, collection: str, count: int) -> List[List[Optional[str]]]:
+    """[[start_path, end_path], ...] covering the collection; None = open end."""
+    bounds, start = [], None
+    for part in db.collection_group(collection).get_partitions(max(1, count)):
+        end = part.end_at.path if part.end_at is not None else None
+        bounds.append([start, end])
+        start = end
+    return bounds or [[None, None]]
+
+
+def _load_or_plan(db, m: Migration, count: int, restart: bool) -> List[List[Optional[str]]]:
+    run_ref = _run_ref(db, m.name)
+    snap = run_ref.get()
+    if snap.exists and not restart:
+        stored = (snap.to_dict() or {}).get("partitions")
+        if stored:
+            return [[p.get("start"), p.get("end")] for p in stored]
+    if restart:
+        for p in run_ref.collection("partitions").stream():
+            p.reference.delete()
+    bounds = plan_partitions(db, m.collection, count)
+    run_ref.set({
+        "collection": m.collection,
+        # Firestore has no nested arrays
+        "partitions": [{"start": s, "end": e} for s, e in bounds],
+        "status": "running",
+        "started_at": firestore.SERVER_TIMESTAMP,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    })
+    return bounds
+
+
+def _run_partition(db, m: Migration, index: int, bounds, page_size: int, dry_run: bool,
+                   stop: threading.Event) -> Dict[str, Any]:
+    ref = _partition_ref(db, m.name, index)
+    state = {} if dry_run else (ref.get().to_dict() or {})
+    counts = {k: int(state.get(k) or 0) for k in ("scanned", "updated", "failed")}
+    if state.get("done"):
+        return {**counts, "done": True}
+
+    start, end = bounds
+    last = state.get("last")
+    failed_ids: List[str] = list(state.get("failed_ids") or [])
+    base = db.collection_group(m.collection).order_by("__name__")
+    if m.fields:
+        base = base.select(m.fields)
+    if end:
+        base = base.end_before([db.document(end)])
+
+    writer = None
+    if not dry_run:
+        writer = db.bulk_writer(options=BulkWriterOptions(
+            initial_ops_per_second=bulk_service.INITIAL_OPS_PER_SECOND,
+            max_ops_per_second=bulk_service.MAX_OPS_PER_SECOND,
+        ))
+
+        def _err(failure, _bw):
+            retry = failure.attempts < bulk_service.MAX_ATTEMPTS
+            if not retry:
+                counts["failed"] += 1
+                if len(failed_ids) < MAX_FAILED_IDS:
+                    failed_ids.append(failure.operation.reference.path)
+            return retry
+
+        writer.on_write_error(_err)
+
+    try:
+        while not stop.is_set():
+            q = base
+            if last:
+                q = q.start_after([db.document(last)])
+            elif start:
+                q = q.start_at([db.document(start)])
+            docs = list(q.limit(page_size).stream())
+            for snap in docs:
+                counts["scanned"] += 1
+                update = m.transform(snap.to_dict() or {})
+                if update:
+                    counts["updated"] += 1
+                    if writer is not None:
+                        writer.update(snap.reference, update)
+            if docs:
+                last = docs[-1].reference.path
+            finished = len(docs) < page_size
+            if writer is not None:
+                writer.flush()      # the checkpoint never runs ahead of the writes
+                ref.set({**counts, "last": last, "done": finished, "failed_ids": failed_ids,
+                         "updated_at": firestore.SERVER_TIMESTAMP})
+            if finished:
+                return {**counts, "done": True}
+        return {**counts, "done": False}
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def run(db, name: str, partitions: int = DEFAULT_PARTITIONS, workers: int = DEFAULT_WORKERS,
+        page_size: int = PAGE_SIZE, dry_run: bool = False, restart: bool = False,
+        stop: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Run (or resume) migration ``name``. Set ``stop`` to make workers finish
+    their current page, checkpoint and return; re-running continues from there.
+    Dry runs scan everything and count would-be updates without writing.
+    """
+    m = get(name)
+    stop = stop or threading.Event()
+    bounds = plan_partitions(db, m.collection, partitions) if dry_run else _load_or_plan(db, m, partitions, restart)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"migrate-{name}") as pool:
+        futures = [pool.submit(_run_partition, db, m, i, b, page_size, dry_run, stop)
+                   for i, b in enumerate(bounds)]
+        try:
+            results = [f.result() for f in futures]
+        except BaseException:
+            stop.set()      # e.g. Ctrl-C: let running pages checkpoint, skip the rest
+            raise
+
+    totals = {k: sum(r[k] for r in results) for k in ("scanned", "updated", "failed")}
+    done = all(r["done"] for r in results)
+    if not dry_run:
+        _run_ref(db, m.name).set({
+            **totals,
+            "status": "done" if done else "interrupted",
+            "updated_at": firestore.SERVER_TIMESTAMP,
+            **({"finished_at": firestore.SERVER_TIMESTAMP} if done else {}),
+        }, merge=True)
+    return {"migration": name, "partitions": len(bounds), **totals, "done": done}
+
+
+def status(db, name: str) -> Dict[str, Any]:
+    """Checkpointed progress of a migration (run doc + per-partition counters)."""
+    snap = _run_ref(db, name).get()
+    if not snap.exists:
+        return {"migration": name, "status": "not_started"}
+    parts = [p.to_dict() or {} for p in _run_ref(db, name).collection("partitions").stream()]
+    data = snap.to_dict() or {}
+    return {
+        "migration": name,
+        "status": data.get("status"),
+        "partitions": len(data.get("partitions") or []),
+        "partitions_done": sum(1 for p in parts if p.get("done")),
+        "scanned": sum(int(p.get("scanned") or 0) for p in parts),
+        "updated": sum(int(p.get("updated") or 0) for p in parts),
+        "failed": sum(int(p.get("failed") or 0) for p in parts),
+    }
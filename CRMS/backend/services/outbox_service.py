@@ -0,0 +1,432 @@
+"""Transactional outbox for complaint events.
+
+Handlers that change a complaint call ``enqueue(writer, ...)`` with the same
+transaction / WriteBatch as the complaint write, so an event exists if and
+only if the change was committed. Nothing is delivered on the request path.
+
+The ``Dispatcher`` drains due events in batches:
+
+1. each event is *leased* in a small transaction (``next_attempt_at`` is
+   pushed ``LEASE_SECONDS`` ahead), so concurrent dispatchers never work on
+   the same event and a dispatcher that dies simply lets the lease lapse;
+2. every sink the event still owes a delivery runs in that sink's own
+   thread pool (``concurrency`` per sink);
+3. per-sink results are written back on the event. Sinks that succeeded are
+   never retried; the others are retried with exponential backoff until
+   ``MAX_ATTEMPTS``, then the event is marked ``failed``.
+
+Delivery is at-least-once: a crash between a delivery and its write-back
+repeats that delivery. Every sink therefore sends a stable id (notification
+document id, ``X-CRMS-Delivery`` header, email ``Message-ID``) receivers can
+deduplicate on.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import smtplib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, Iterable, Optional, Type
+
+import requests
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+logger = logging.getLogger(__name__)
+
+OUTBOX = "outbox"
+NOTIFICATIONS = "notifications"
+
+STATUS_CHANGED = "complaint.status_changed"
+COMMENT_ADDED = "complaint.comment_added"
+CUSTOMER_UPDATE = "complaint.customer_update"
+
+PENDING, DONE, FAILED, SKIPPED = "pending", "done", "failed", "skipped"
+
+ENABLED_SINKS = [s.strip() for s in os.getenv("OUTBOX_SINKS", "in_app").split(",") if s.strip()]
+DISPATCH_IN_PROCESS = os.getenv("OUTBOX_DISPATCH_IN_PROCESS", "true").lower() == "true"
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+RETRY_BASE = 5.0              # seconds; doubled per attempt, capped
+RETRY_CAP = 3600.0
+
+
+def retry_delay(attempts: int, base: float = RETRY_BASE, cap: float = RETRY_CAP) -> float:
+    """Equal jitter: half the exponential delay fixed, half random."""
+    d = min(cap, base * (2 ** max(0, attempts - 1)))
+    return d / 2 + random.uniform(0, d / 2)
+
+
+# ---------- sinks ----------
+
+class PermanentDeliveryError(Exception):
+    """The sink can never deliver this event (bad address, 4xx): do not retry."""
+
+
+class Sink:
+    name = ""
+    events: frozenset = frozenset()     # event types handled; empty = all
+    concurrency = 4
+
+    @classmethod
+    def wants(cls, event_type: str) -> bool:
+        return not cls.events or event_type in cls.events
+
+    def deliver(self, db, event: Dict[str, Any]) -> Optional[str]:
+        """Deliver or raise; may return SKIPPED when there is nothing to send."""
+        raise NotImplementedError
+
+
+class InAppSink(Sink):
+    """One ``notifications`` document per recipient, id ``{event}_{uid}`` (idempotent)."""
+    name = "in_app"
+    concurrency = int(os.getenv("OUTBOX_IN_APP_CONCURRENCY", "8"))
+
+    def deliver(self, db, event):
+        recipients = [u for u in event.get("recipients") or [] if u and u != event.get("actor")]
+        if not recipients:
+            return SKIPPED
+        batch = db.batch()
+        for uid in recipients:
+            batch.set(db.collection(NOTIFICATIONS).document(f"{event['id']}_{uid}"), {
+                "tenant_id": event["tenant_id"],
+                "user_id": uid,
+                "event_id": event["id"],
+                "type": event["type"],
+                "complaint_id": event.get("complaint_id"),
+                "data": event.get("data") or {},
+                "read": False,
+                "created_at": firestore.SERVER_TIMESTAMP,
+            })
+        batch.commit()
+
+
+class WebhookSink(Sink):
+    """POST the event as JSON, signed with HMAC-SHA256 when a secret is set."""
+    name = "webhook"
+    concurrency = int(os.getenv("OUTBOX_WEBHOOK_CONCURRENCY", "4"))
+    TIMEOUT = 10
+
+    def __init__(self, url: Optional[str] = None, secret: Optional[str] = None):
+        self.url = url or os.getenv("OUTBOX_WEBHOOK_URL")
+        self.secret = secret if secret is not None else os.getenv("OUTBOX_WEBHOOK_SECRET", "")
+
+    def deliver(self, db, event):
+        if not self.url:
+            raise PermanentDeliveryError("OUTBOX_WEBHOOK_URL is not set")
+        body = json.dumps(event, default=str, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json",
+                   "X-CRMS-Event": event["type"],
+                   "X-CRMS-Delivery": event["id"]}
+        if self.secret:
+            headers["X-CRMS-Signature"] = "sha256=" + hmac.new(
+                self.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        resp = requests.post(self.url, data=body, headers=headers, timeout=self.TIMEOUT)
+        if 400 <= resp.status_code < 500 and resp.status_code not in (408, 429):
+            raise PermanentDeliveryError(f"webhook answered {resp.status_code}")
+        resp.raise_for_status()
+
+
+class EmailSink(Sink):
+    """Mail the customer about updates and status changes (SMTP_* settings)."""
+    name = "email"
+    events = frozenset({CUSTOMER_UPDATE, STATUS_CHANGED})
+    concurrency = int(os.getenv("OUTBOX_EMAIL_CONCURRENCY", "2"))
+
+    def deliver(self, db, event):
+        data = event.get("data") or {}
+        snap = db.collection("customers").document(data.get("customer_id") or "-").get()
+        customer = (snap.to_dict() or {}) if snap.exists else {}
+        if customer.get("tenant_id") != event["tenant_id"] or not customer.get("email"):
+            return SKIPPED
+        ticket = data.get("ticket_number") or event.get("complaint_id")
+        msg = EmailMessage()
+        msg["From"] = os.getenv("SMTP_FROM", "no-reply@crms.local")
+        msg["To"] = customer["email"]
+        msg["Message-ID"] = f"<{event['id']}@crms>"
+        if event["type"] == CUSTOMER_UPDATE:
+            msg["Subject"] = f"Update on your complaint {ticket}"
+            msg.set_content(data.get("message") or "")
+        else:
+            msg["Subject"] = f"Your complaint {ticket} is now {str(data.get('to', '')).replace('_', ' ')}"
+            msg.set_content(f"The status of complaint {ticket} changed to {data.get('to')}.")
+        with smtplib.SMTP(os.getenv("SMTP_HOST", "localhost"), int(os.getenv("SMTP_PORT", "587")),
+                          timeout=30) as smtp:
+            if os.getenv("SMTP_STARTTLS", "true").lower() == "true":
+                smtp.starttls()
+            if os.getenv("SMTP_USER"):
+                smtp.login(os.getenv("SMTP_USER"), os.getenv("SMTP_PASSWORD", ""))
+            smtp.send_message(msg)
+
+
+_SINKS: Dict[str, Type[Sink]] = {
+    "in_app": InAppSink,
+    "webhook": WebhookSink,
+    "email": EmailSink,
+}
+
+
+def register_sink(name: str, sink: Type[Sink]):
+    _SINKS[name] = sink
+
+
+def build_sinks(names: Iterable[str] = None) -> Dict[str, Sink]:
+    names = ENABLED_SINKS if names is None else names
+    unknown = [n for n in names if n not in _SINKS]
+    if unknown:
+        raise KeyError(f"unknown outbox sink(s): {', '.join(unknown)}")
+    return {n: _SINKS[n]() for n in names}
+
+
+# ---------- producers ----------
+
+def enqueue(writer, db, tenant_id: str, event_type: str, complaint_id: str, actor: Optional[str],
+            data: Dict[str, Any], recipients: Iterable[Optional[str]] = (),
+            sinks: Iterable[str] = None) -> Optional[str]:
+    """
+    Add the event to ``writer`` (a Transaction or WriteBatch that also holds
+    the complaint write). Returns the event id, or None when no enabled sink
+    wants this event type.
+    """
+    names = [n for n in (ENABLED_SINKS if sinks is None else sinks)
+             if n in _SINKS and _SINKS[n].wants(event_type)]
+    if not names:
+        return None
+    ref = db.collection(OUTBOX).document()
+    writer.set(ref, {
+        "tenant_id": tenant_id,
+        "type": event_type,
+        "complaint_id": complaint_id,
+        "actor": actor,
+        "data": data,
+        "recipients": sorted({r for r in recipients if r}),
+        "deliveries": {n: {"status": PENDING, "attempts": 0} for n in names},
+        "status": PENDING,
+        "attempts": 0,
+        "next_attempt_at": datetime.now(timezone.utc),
+        "created_at": firestore.SERVER_TIMESTAMP,
+    })
+    return ref.id
+
+
+def notify():
+    """Wake the in-process dispatcher after a commit that enqueued events."""
+    if not DISPATCH_IN_PROCESS:
+        return
+    try:
+        get_dispatcher().wake()
+    except Exception:
+        # the events are committed; a dedicated dispatcher (or the next wake) delivers them
+        logger.exception("outbox: could not wake the dispatcher")
+
+
+# ---------- dispatcher ----------
+
+def settle(deliveries: Dict[str, Dict[str, Any]], results: Dict[str, Any], attempts: int,
+           max_attempts: int = MAX_ATTEMPTS) -> str:
+    """
+    Fold one round of sink ``results`` (status string or exception) into
+    ``deliveries`` in place; returns the event's new status.
+    """
+    for name, result in results.items():
+        d = deliveries[name]
+        d["attempts"] = int(d.get("attempts") or 0) + 1
+        if isinstance(result, PermanentDeliveryError):
+            d.update(status=FAILED, error=str(result))
+        elif isinstance(result, Exception):
+            d.update(status=PENDING, error=str(result))
+        else:
+            d.update(status=result or DONE)
+            d.pop("error", None)
+    if any(d["status"] == PENDING for d in deliveries.values()):
+        if attempts < max_attempts:
+            return PENDING
+        for d in deliveries.values():
+            if d["status"] == PENDING:
+                d["status"] = FAILED
+    return FAILED if any(d["status"] == FAILED for d in deliveries.values()) else DONE
+
+
+class Dispatcher:
+    def __init__(self, sinks: Optional[Dict[str, Sink]] = None, db_factory: Optional[Callable[[], Any]] = None,
+                 batch_size: int = BATCH_SIZE, poll_seconds: float = POLL_SECONDS,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.sinks = build_sinks() if sinks is None else sinks
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._db_factory = db_factory
+        self._pools = {n: ThreadPoolExecutor(max_workers=max(1, s.concurrency), thread_name_prefix=f"outbox-{n}")
+                       for n, s in self.sinks.items()}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"claimed": 0, "delivered": 0, "retried": 0, "failed": 0, "sink_errors": 0, "lease_lost": 0}
+
+    def _db(self):
+        if self._db_factory is None:
+            from utils.firebase import get_db
+            return get_db()
+        return self._db_factory()
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    # ---------- one round ----------
+
+    def _claim(self, db, ref, now: datetime) -> Optional[Dict[str, Any]]:
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+
+        @firestore.transactional
+        def _txn(transaction):
+            snap = ref.get(transaction=transaction)
+            data = snap.to_dict() or {}
+            due = data.get("next_attempt_at")
+            if data.get("status") != PENDING or (due is not None and due > now):
+                return None
+            transaction.update(ref, {"next_attempt_at": lease_until, "leased_by": self.worker_id})
+            return data
+
+        data = _txn(db.transaction())
+        if data is None:
+            self._count("lease_lost")
+            return None
+        return {"id": ref.id, **data}
+
+    def _deliver(self, db, sink: Sink, event: Dict[str, Any]):
+        try:
+            return sink.deliver(db, event)
+        except Exception as e:
+            self._count("sink_errors")
+            logger.warning("outbox: %s delivery of %s failed: %s", sink.name, event["id"], e)
+            return e
+
+    def run_once(self) -> int:
+        """Claim and deliver one batch of due events; returns how many were claimed."""
+        db = self._db()
+        now = datetime.now(timezone.utc)
+        q = (db.collection(OUTBOX)
+               .where(filter=FieldFilter("status", "==", PENDING))
+               .where(filter=FieldFilter("next_attempt_at", "<=", now))
+               .order_by("next_attempt_at")
+               .limit(self.batch_size))
+        events = [e for e in (self._claim(db, snap.reference, now) for snap in q.stream()) if e]
+        self._count("claimed", len(events))
+
+        jobs = []
+        for event in events:
+            public = {k: event.get(k) for k in ("id", "tenant_id", "type", "complaint_id", "actor",
+                                                 "data", "recipients", "created_at")}
+            for name, d in (event.get("deliveries") or {}).items():
+                if d.get("status") != PENDING:
+                    continue
+                sink = self.sinks.get(name)
+                if sink is None:
+                    continue    # not configured in this process; another dispatcher may have it
+                jobs.append((event, name, self._pools[name].submit(self._deliver, db, sink, public)))
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for event, name, future in jobs:
+            results.setdefault(event["id"], {})[name] = future.result()
+
+        for event in events:
+            self._finish(db, event, results.get(event["id"], {}))
+        return len(events)
+
+    def _finish(self, db, event: Dict[str, Any], results: Dict[str, Any]):
+        if not results:
+            return      # nothing this process can deliver; the lease lapses for another dispatcher
+        deliveries = event.get("deliveries") or {}
+        attempts = int(event.get("attempts") or 0) + 1
+        status = settle(deliveries, results, attempts)
+        update = {"deliveries": deliveries, "attempts": attempts, "status": status,
+                  "updated_at": firestore.SERVER_TIMESTAMP}
+        if status == PENDING:
+            update["next_attempt_at"] = datetime.now(timezone.utc) + timedelta(seconds=retry_delay(attempts))
+            self._count("retried")
+        else:
+            update["finished_at"] = firestore.SERVER_TIMESTAMP
+            self._count("delivered" if status == DONE else "failed")
+        try:
+            db.collection(OUTBOX).document(event["id"]).update(update)
+        except Exception:
+            # the lease lapses and the event is delivered again (at-least-once)
+            logger.exception("outbox: could not record delivery of %s", event["id"])
+
+    # ---------- background loop ----------
+
+    def wake(self):
+        self._ensure_thread()
+        self._wake.set()
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self.run_forever, name="outbox-dispatcher", daemon=True)
+                self._thread.start()
+
+    def run_forever(self):
+        """Drain continuously; sleeps ``poll_seconds`` (or until woken) once the outbox is empty."""
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception:
+                logger.exception("outbox: dispatch round failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {**stats, "sinks": {n: s.concurrency for n, s in self.sinks.items()},
+                "running": bool(self._thread and self._thread.is_alive())}
+
+
+_dispatcher: Optional[Dispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> Dispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = Dispatcher()
+    return _dispatcher
+
+
+def set_dispatcher(dispatcher: Optional[Dispatcher]):
+    """Override the process-wide dispatcher (tests)."""
+    global _dispatcher
+    _dispatcher = dispatcher
+
+
+def backlog(db, tenant_id: str) -> Dict[str, int]:
+    """Pending / failed event counts of a tenant (count aggregations, no documents read)."""
+    out = {}
+    for status in (PENDING, FAILED):
+        q = (db.collection(OUTBOX)
+               .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+               .where(filter=FieldFilter("status", "==", status)))
+        result = q.count(alias="total").get()
+        out[status] = int(result[0][0].value) if result and result[0] else 0
+    return out
@@ -0,0 +1,270 @@
+"""Retention policies and archival tiering.
+
+Per-tenant policy lives in ``retention_policies/{tenant_id}``:
+
+    {"enabled": true, "logs_months": 24, "archived_customers_months": 6, "mode": "collection"}
+
+The job moves logs older than ``logs_months`` (by ``created_at``) and
+customers archived for longer than ``archived_customers_months`` (by
+``updated_at``) out of the hot collections, either
+
+- ``collection``: into cold ``logs_archive`` / ``customers_archive`` (same ids), or
+- ``ndjson``: into gzip NDJSON shards per month in the storage backend, with
+  an ``archive_shards`` manifest doc per shard (ids are indexed for lookups).
+
+Each batch copies and deletes in one atomic WriteBatch, so re-running after
+an interrupt resumes where it stopped without duplicating data. Progress is
+checkpointed in ``retention_runs/{tenant}_{collection}``.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from services import sync_service
+from utils import ndjson
+from utils.storage import get_storage
+
+MODE_COLLECTION = "collection"
+MODE_NDJSON = "ndjson"
+MODES = {MODE_COLLECTION, MODE_NDJSON}
+
+ARCHIVE_SUFFIX = "_archive"
+DEFAULT_BATCH_SIZE = 150          # copy + delete + tombstone per doc -> stays under 500 writes
+DOCS_PER_SECOND = float(os.getenv("RETENTION_DOCS_PER_SECOND", "200"))
+
+DEFAULT_POLICY: Dict[str, Any] = {
+    "enabled": False,
+    "logs_months": None,
+    "archived_customers_months": None,
+    "mode": MODE_COLLECTION,
+}
+
+
+def archive_collection(name: str) -> str:
+    return f"{name}{ARCHIVE_SUFFIX}"
+
+
+# ---------- policy ----------
+
+def get_policy(db, tenant_id: str) -> Dict[str, Any]:
+    snap = db.collection("retention_policies").document(tenant_id).get()
+    return {**DEFAULT_POLICY, **((snap.to_dict() or {}) if snap.exists else {})}
+
+
+def validate_policy(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the cleaned policy fields or raise ValueError."""
+    out: Dict[str, Any] = {}
+    if "enabled" in data:
+        out["enabled"] = bool(data["enabled"])
+    for key in ("logs_months", "archived_customers_months"):
+        if key in data:
+            v = data[key]
+            if v is not None:
+                v = int(v)
+                if v < 1:
+                    raise ValueError(f"{key} must be >= 1 or null")
+            out[key] = v
+    if "mode" in data:
+        if data["mode"] not in MODES:
+            raise ValueError(f"mode must be one of {sorted(MODES)}")
+        out["mode"] = data["mode"]
+    return out
+
+
+def set_policy(db, tenant_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    fields = validate_policy(data)
+    db.collection("retention_policies").document(tenant_id).set({
+        **fields, "tenant_id": tenant_id, "updated_at": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+    return {**get_policy(db, tenant_id)}
+
+
+# ---------- job ----------
+
+class RateLimiter:
+    """Blocking limiter: at most ``rate`` units per second on average."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: int = 1):
+        """Thread-safe: concurrent callers are spaced out, each sleeping for its own slot."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + n * self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _cutoff(months: int, now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.now(timezone.utc)) - timedelta(days=30 * months)
+
+
+def _targets(db, tenant_id: str, policy: Dict[str, Any], now: Optional[datetime] = None):
+    """(collection, query, time_field) for every rule enabled in the policy."""
+    out = []
+    if policy.get("logs_months"):
+        q = (db.collection("logs")
+               .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+               .where(filter=FieldFilter("created_at", "<", _cutoff(policy["logs_months"], now)))
+               .order_by("created_at"))
+        out.append(("logs", q, "created_at"))
+    if policy.get("archived_customers_months"):
+        q = (db.collection("customers")
+               .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+               .where(filter=FieldFilter("status", "==", "archived"))
+               .where(filter=FieldFilter("updated_at", "<", _cutoff(policy["archived_customers_months"], now)))
+               .order_by("updated_at"))
+        out.append(("customers", q, "updated_at"))
+    return out
+
+
+def _month_of(v: Any) -> str:
+    return v.strftime("%Y-%m") if isinstance(v, datetime) else "unknown"
+
+
+def _move_batch_to_collection(db, tenant_id: str, collection: str, docs) -> None:
+    cold = db.collection(archive_collection(collection))
+    batch = db.batch()
+    for d in docs:
+        batch.set(cold.document(d.id), {**(d.to_dict() or {}), "archived_at": firestore.SERVER_TIMESTAMP})
+        batch.delete(d.reference)
+        sync_service.stage_tombstone(batch, db, tenant_id, collection, d.id, reason="archived")
+    batch.commit()
+
+
+def _move_batch_to_ndjson(db, tenant_id: str, collection: str, docs, time_field: str) -> None:
+    storage = get_storage()
+    groups: Dict[str, List[Any]] = {}
+    for d in docs:
+        groups.setdefault(_month_of((d.to_dict() or {}).get(time_field)), []).append(d)
+
+    batch = db.batch()
+    for month, group in groups.items():
+        # Key derives from the first id: a re-run of an interrupted batch rewrites the same shard.
+        key = f"archives/{tenant_id}/{collection}/{month}/{group[0].id}.ndjson.gz"
+        payload = ndjson.gzip_lines(ndjson.dumps_doc(d.id, d.to_dict() or {}) for d in group)
+        storage.write_stream(key, io.BytesIO(payload))
+        shard_id = hashlib.sha1(key.encode()).hexdigest()
+        batch.set(db.collection("archive_shards").document(shard_id), {
+            "tenant_id": tenant_id,
+            "collection": collection,
+            "month": month,
+            "key": key,
+            "ids": [d.id for d in group],
+            "count": len(group),
+            "created_at": firestore.SERVER_TIMESTAMP,
+        })
+    for d in docs:
+        batch.delete(d.reference)
+        sync_service.stage_tombstone(batch, db, tenant_id, collection, d.id, reason="archived")
+    batch.commit()
+
+
+def archive_target(db, tenant_id: str, collection: str, query, time_field: str, mode: str,
+                   limiter: RateLimiter, batch_size: int = DEFAULT_BATCH_SIZE,
+                   max_docs: Optional[int] = None) -> int:
+    run_ref = db.collection("retention_runs").document(f"{tenant_id}_{collection}")
+    run_ref.set({"tenant_id": tenant_id, "collection": collection, "mode": mode, "status": "running",
+                 "started_at": firestore.SERVER_TIMESTAMP}, merge=True)
+    moved = 0
+    while max_docs is None or moved < max_docs:
+        n = batch_size if max_docs is None else min(batch_size, max_docs - moved)
+        docs = list(query.limit(n).stream())
+        if not docs:
+            break
+        limiter.acquire(len(docs))
+        if mode == MODE_NDJSON:
+            _move_batch_to_ndjson(db, tenant_id, collection, docs, time_field)
+        else:
+            _move_batch_to_collection(db, tenant_id, collection, docs)
+        moved += len(docs)
+        last = docs[-1]
+        run_ref.set({
+            "moved_total": firestore.Increment(len(docs)),
+            "last_id": last.id,
+            "last_time": (last.to_dict() or {}).get(time_field),
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+    run_ref.set({"status": "done" if max_docs is None or moved < max_docs else "paused",
+                 "finished_at": firestore.SERVER_TIMESTAMP, "last_run_moved": moved}, merge=True)
+    return moved
+
+
+def run(db, tenant_id: str, policy: Optional[Dict[str, Any]] = None, dry_run: bool = False,
+        docs_per_second: float = DOCS_PER_SECOND, batch_size: int = DEFAULT_BATCH_SIZE,
+        max_docs: Optional[int] = None) -> Dict[str, int]:
+    """Apply the tenant's retention policy; returns docs moved (or eligible, for dry runs) per collection."""
+    policy = policy or get_policy(db, tenant_id)
+    if not policy.get("enabled"):
+        return {}
+    limiter = RateLimiter(docs_per_second)
+    mode = policy.get("mode") or MODE_COLLECTION
+    out: Dict[str, int] = {}
+    for collection, query, time_field in _targets(db, tenant_id, policy):
+        if dry_run:
+            out[collection] = int(query.count().get()[0][0].value)
+            continue
+        out[collection] = archive_target(db, tenant_id, collection, query, time_field, mode,
+                                         limiter, batch_size=batch_size, max_docs=max_docs)
+    return out
+
+
+def enabled_tenants(db) -> List[str]:
+    q = db.collection("retention_policies").where(filter=FieldFilter("enabled", "==", True))
+    return [snap.id for snap in q.stream()]
+
+
+# ---------- retrieval (include=archived) ----------
+
+def get_archived(db, collection: str, doc_id: str, tenant_id: str) -> Optional[Dict[str, Any]]:
+    """Find an archived document in the cold collection or, failing that, in an NDJSON shard."""
+    snap = db.collection(archive_collection(collection)).document(doc_id).get()
+    if snap.exists:
+        data = snap.to_dict() or {}
+        return data if data.get("tenant_id") == tenant_id else None
+
+    q = (db.collection("archive_shards")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .where(filter=FieldFilter("collection", "==", collection))
+           .where(filter=FieldFilter("ids", "array_contains", doc_id))
+           .limit(1))
+    for shard in q.stream():
+        key = (shard.to_dict() or {}).get("key")
+        stream = ndjson.open_chunks(get_storage().read_range(key))
+        for line in ndjson.iter_gzip_lines(stream):
+            row_id, data = ndjson.loads_doc(line, db)
+            if row_id == doc_id:
+                return {**data, "archived": True}
+    return None
+
+
+def _sort_key(v: Any):
+    if isinstance(v, datetime):
+        return (1, v.astimezone(timezone.utc).isoformat() if v.tzinfo else v.isoformat())
+    return (0, "") if v is None else (1, str(v))
+
+
+def merged_page(hot_query, archive_query, order_field: str, descending: bool,
+                offset: int, limit: int) -> List[Any]:
+    """One page over hot + cold collections with the same filters/order.
+
+    Reads ``offset + limit`` docs from each side, so it is meant for the
+    explicit ``include=archived`` path rather than the default listing.
+    """
+    window = offset + limit
+    docs = list(hot_query.limit(window).stream()) + list(archive_query.limit(window).stream())
+    docs.sort(key=lambda d: _sort_key((d.to_dict() or {}).get(order_field)), reverse=descending)
+    return docs[offset:offset + limit]
@@ -0,0 +1,257 @@
+"""Pre-aggregated daily rollups for reporting.
+
+One document per tenant per UTC day at ``rollups/{tenant_id}/days/{yyyy-mm-dd}``
+(Firestore needs an even number of path segments, hence the ``days`` level):
+
+    {
+      "tenant_id": "...", "date": "2025-11-09",
+      "logs":       {"total": 12, "by_type": {"call": 5}, "by_user": {"<uid>": 7}},
+      "complaints": {"created": 3, "by_category": {...}, "by_severity": {...},
+                     "by_user": {...}, "transitions": {"new->resolved": 1}},
+    }
+
+Every tenant's writes of a day land on the same document, which Firestore
+sustains at about one write per second. So new logs, new complaints and
+status transitions ``queue`` their ``Increment`` transforms on the
+write-behind buffer after the source write commits; a burst costs one merge
+write per window. Corrections that must agree with the source document
+(deleting or retyping a log) ``apply`` them inside its transaction instead.
+A report over N days reads exactly N documents. A crash can lose one
+window of queued increments; ``recompute`` rebuilds past days from the
+source collections.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from utils import write_behind
+
+MAX_RANGE_DAYS = 366
+
+
+# ---------- keys & refs ----------
+
+def day_key(dt: Optional[datetime] = None) -> str:
+    dt = dt or datetime.now(timezone.utc)
+    if isinstance(dt, datetime) and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%d")
+
+
+def day_ref(db, tenant_id: str, day: str):
+    return db.collection("rollups").document(tenant_id).collection("days").document(day)
+
+
+def day_range(start: date, end: date) -> List[str]:
+    if end < start:
+        start, end = end, start
+    n = min((end - start).days, MAX_RANGE_DAYS - 1)
+    return [(start + timedelta(days=i)).isoformat() for i in range(n + 1)]
+
+
+def transition_key(old: Optional[str], new: str) -> str:
+    return f"{old or 'none'}->{new}"
+
+
+# ---------- increments for write paths ----------
+
+def _inc(n: int = 1):
+    return firestore.Increment(n)
+
+
+def log_increments(payload: Dict[str, Any], n: int = 1) -> Dict[str, Any]:
+    """A created log (``n=-1``: a deleted one, taken back from the day it was counted on)."""
+    logs: Dict[str, Any] = {"total": _inc(n)}
+    if payload.get("type"):
+        logs["by_type"] = {str(payload["type"]): _inc(n)}
+    if payload.get("created_by"):
+        logs["by_user"] = {str(payload["created_by"]): _inc(n)}
+    return {"logs": logs}
+
+
+def log_type_change_increments(old: Optional[str], new: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Move one log between ``by_type`` buckets, or None if the type did not change."""
+    if (old or None) == (new or None):
+        return None
+    by_type: Dict[str, Any] = {}
+    if old:
+        by_type[str(old)] = _inc(-1)
+    if new:
+        by_type[str(new)] = _inc(1)
+    return {"logs": {"by_type": by_type}}
+
+
+def log_day(log: Dict[str, Any]) -> str:
+    """The rollup day a stored log was counted on (its created_at)."""
+    created = log.get("created_at")
+    return day_key(created if isinstance(created, datetime) else None)
+
+
+def complaint_created_increments(payload: Dict[str, Any]) -> Dict[str, Any]:
+    c: Dict[str, Any] = {"created": _inc()}
+    if payload.get("category"):
+        c["by_category"] = {str(payload["category"]): _inc()}
+    if payload.get("severity"):
+        c["by_severity"] = {str(payload["severity"]): _inc()}
+    if payload.get("created_by"):
+        c["by_user"] = {str(payload["created_by"]): _inc()}
+    return {"complaints": c}
+
+
+def status_transition_increments(old: Optional[str], new: str, n: int = 1) -> Dict[str, Any]:
+    return {"complaints": {"transitions": {transition_key(old, new): _inc(n)}}}
+
+
+def apply(writer, db, tenant_id: str, increments: Dict[str, Any], day: Optional[str] = None):
+    """Stage rollup increments on a WriteBatch / Transaction (``writer``)."""
+    day = day or day_key()
+    writer.set(day_ref(db, tenant_id, day), {
+        **increments,
+        "tenant_id": tenant_id,
+        "date": day,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+
+
+ROLLUP_KIND = "rollup_day"
+write_behind.register(ROLLUP_KIND)
+
+
+def queue(tenant_id: str, increments: Dict[str, Any], day: Optional[str] = None):
+    """Like ``apply`` but coalesced through the write-behind buffer (one merge write per window)."""
+    day = day or day_key()
+    write_behind.get_buffer().add(ROLLUP_KIND, f"rollups/{tenant_id}/days/{day}", {
+        **increments,
+        "tenant_id": tenant_id,
+        "date": day,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    })
+
+
+# ---------- reads ----------
+
+def read_days(db, tenant_id: str, days: List[str]) -> List[Dict[str, Any]]:
+    """One document read per day (missing days come back zero-filled)."""
+    refs = [day_ref(db, tenant_id, d) for d in days]
+    found = {snap.id: (snap.to_dict() or {}) for snap in db.get_all(refs) if snap.exists}
+    out = []
+    for d in days:
+        doc = found.get(d, {})
+        out.append({
+            "date": d,
+            "logs": doc.get("logs") or {"total": 0},
+            "complaints": doc.get("complaints") or {"created": 0},
+        })
+    return out
+
+
+def _add_into(acc: Dict[str, Any], src: Dict[str, Any]):
+    for k, v in (src or {}).items():
+        if isinstance(v, dict):
+            _add_into(acc.setdefault(k, {}), v)
+        elif isinstance(v, (int, float)):
+            acc[k] = acc.get(k, 0) + v
+
+
+def totals(days: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    acc: Dict[str, Any] = {}
+    for d in days:
+        _add_into(acc, {"logs": d.get("logs"), "complaints": d.get("complaints")})
+    return acc
+
+
+def pick(doc: Dict[str, Any], path: str) -> Any:
+    """Resolve a dotted metric path such as 'logs.by_type.call' (0 if absent)."""
+    cur: Any = doc
+    for part in path.split("."):
+        if not isinstance(cur, dict):
+            return 0
+        cur = cur.get(part)
+    return cur if cur is not None else 0
+
+
+# ---------- batch recompute ----------
+
+def _as_dt(v) -> Optional[datetime]:
+    if isinstance(v, datetime):
+        return v if v.tzinfo else v.replace(tzinfo=timezone.utc)
+    if isinstance(v, str):
+        try:
+            dt = datetime.fromisoformat(v.replace("Z", "+00:00"))
+            return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+    return None
+
+
+def _bump(bucket: Dict[str, Any], *path: str):
+    for p in path[:-1]:
+        bucket = bucket.setdefault(p, {})
+    bucket[path[-1]] = bucket.get(path[-1], 0) + 1
+
+
+def recompute(db, tenant_id: str, start: date, end: date) -> int:
+    """Rebuild rollups for [start, end] from source collections (overwrites days)."""
+    days = day_range(start, end)
+    lo = datetime.combine(date.fromisoformat(days[0]), datetime.min.time(), tzinfo=timezone.utc)
+    hi = datetime.combine(date.fromisoformat(days[-1]), datetime.min.time(), tzinfo=timezone.utc) + timedelta(days=1)
+    buckets: Dict[str, Dict[str, Any]] = {d: {"logs": {"total": 0}, "complaints": {"created": 0}} for d in days}
+
+    logs_q = (db.collection("logs")
+                .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+                .where(filter=FieldFilter("created_at", ">=", lo))
+                .where(filter=FieldFilter("created_at", "<", hi))
+                .select(["type", "created_by", "created_at"]))
+    for snap in logs_q.stream():
+        d = snap.to_dict() or {}
+        b = buckets.get(day_key(_as_dt(d.get("created_at")) or lo))
+        if b is None:
+            continue
+        _bump(b, "logs", "total")
+        if d.get("type"):
+            _bump(b, "logs", "by_type", str(d["type"]))
+        if d.get("created_by"):
+            _bump(b, "logs", "by_user", str(d["created_by"]))
+
+    # Transitions can happen long after creation, so scan every complaint that
+    # existed before the range ended and bucket its timeline entries.
+    complaints_q = (db.collection("complaints")
+                      .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+                      .where(filter=FieldFilter("created_at", "<", hi))
+                      .select(["category", "severity", "created_by", "created_at", "timeline"]))
+    for snap in complaints_q.stream():
+        d = snap.to_dict() or {}
+        created = _as_dt(d.get("created_at"))
+        if created and created >= lo:
+            b = buckets[day_key(created)]
+            _bump(b, "complaints", "created")
+            for field, key in (("category", "by_category"), ("severity", "by_severity"), ("created_by", "by_user")):
+                if d.get(field):
+                    _bump(b, "complaints", key, str(d[field]))
+        for entry in d.get("timeline") or []:
+            if (entry or {}).get("action") != "status_change":
+                continue
+            at = _as_dt(entry.get("timestamp"))
+            if at is None or not (lo <= at < hi):
+                continue
+            _bump(buckets[day_key(at)], "complaints", "transitions",
+                  transition_key(entry.get("from"), entry.get("to")))
+
+    batch, pending = db.batch(), 0
+    for d, doc in buckets.items():
+        batch.set(day_ref(db, tenant_id, d), {
+            **doc,
+            "tenant_id": tenant_id,
+            "date": d,
+            "recomputed_at": firestore.SERVER_TIMESTAMP,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        })
+        pending += 1
+        if pending >= 450:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+    return len(days)
@@ -0,0 +1,421 @@
+"""Saved customer segments with incrementally maintained membership.
+
+A segment is a boolean rule over a customer's tags, industry, city, type,
+status and days since last contact, e.g.::
+
+    {"all": [{"field": "tags", "op": "contains", "value": "vip"},
+             {"any": [{"field": "city", "op": "in", "value": ["Dhaka", "Chattogram"]},
+                      {"not": {"field": "industry", "op": "eq", "value": "retail"}}]},
+             {"field": "last_contact_days", "op": ">", "value": 30}]}
+
+Membership is stored on the customer as ``segment_ids`` (an array, indexed
+with ``tenant_id``), so ``GET /api/customers?segment=<id>`` is one
+``array_contains`` query. It is maintained incrementally:
+
+- customer creates/updates/bulk operations recompute the customer's ids
+  against the tenant's segments (cached per process) and write the
+  difference as ``ArrayUnion``/``ArrayRemove`` in the same commit (never the
+  whole array from a possibly stale read); the segment ``count`` moves by
+  the difference through the write-behind buffer;
+- new log activity moves ``last_contact_date``, and the flush re-evaluates
+  the customer the same way;
+- time alone also moves customers in and out of ``last_contact_days``
+  segments; ``refresh_tenant`` re-evaluates only the customers whose last
+  contact crossed a rule's day boundary since the previous refresh (one
+  range query per boundary) and re-counts every segment with a count
+  aggregation.
+
+Defining or changing a rule rebuilds that segment once with a scan of the
+tenant's customers; deleting one removes its id from the members. Other
+processes may still apply the old rules for up to ``CACHE_SECONDS``, so
+``CACHE_SECONDS`` after the scan started a catch-up pass re-evaluates the
+segment for every customer written since then (``updated_at``).
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+
+from services import bulk_service
+from utils import write_behind
+
+logger = logging.getLogger(__name__)
+
+SEGMENTS = "segments"
+MAX_SEGMENTS = int(os.getenv("SEGMENTS_MAX_PER_TENANT", "100"))
+CACHE_SECONDS = float(os.getenv("SEGMENTS_CACHE_SECONDS", "30"))
+MAX_RULE_DEPTH = 6
+MAX_RULE_LEAVES = 30
+
+STATUS_BUILDING, STATUS_READY, STATUS_FAILED = "building", "ready", "failed"
+
+# customer fields a rule can read (selected when scanning)
+RULE_FIELDS = ["tags", "industry", "city", "type", "status", "last_contact_date", "segment_ids"]
+SCALAR_FIELDS = {"industry", "city", "type", "status"}
+LEAF_OPS = {
+    "tags": {"contains", "contains_any", "contains_all"},
+    "last_contact_days": {"<=", ">"},
+    **{f: {"eq", "ne", "in"} for f in SCALAR_FIELDS},
+}
+
+
+# ---------- rules ----------
+
+def _norm(v: Any) -> str:
+    return str(v).strip().lower() if v is not None else ""
+
+
+def validate_rule(rule: Any, depth: int = 0) -> int:
+    """Raises ValueError if ``rule`` is malformed; returns its number of leaves."""
+    if depth > MAX_RULE_DEPTH:
+        raise ValueError(f"rule is nested deeper than {MAX_RULE_DEPTH} levels")
+    if not isinstance(rule, dict) or ("field" not in rule and len(rule) != 1):
+        raise ValueError("each rule node is {all: [...]}, {any: [...]}, {not: rule} or {field, op, value}")
+    if "all" in rule or "any" in rule:
+        children = rule.get("all", rule.get("any"))
+        if not isinstance(children, list) or not children:
+            raise ValueError("all/any need a non-empty list")
+        leaves = sum(validate_rule(c, depth + 1) for c in children)
+    elif "not" in rule:
+        leaves = validate_rule(rule["not"], depth + 1)
+    else:
+        field, op, value = rule.get("field"), rule.get("op"), rule.get("value")
+        if field not in LEAF_OPS:
+            raise ValueError(f"field must be one of {sorted(LEAF_OPS)}")
+        if op not in LEAF_OPS[field]:
+            raise ValueError(f"op for {field} must be one of {sorted(LEAF_OPS[field])}")
+        if field == "last_contact_days":
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError("last_contact_days needs a number of days >= 0")
+        elif op in ("in", "contains_any", "contains_all"):
+            if not isinstance(value, list) or not value:
+                raise ValueError(f"{field} {op} needs a non-empty list")
+        elif value is None or isinstance(value, (list, dict)):
+            raise ValueError(f"{field} {op} needs a single value")
+        leaves = 1
+    if depth == 0 and leaves > MAX_RULE_LEAVES:
+        raise ValueError(f"rule has more than {MAX_RULE_LEAVES} conditions")
+    return leaves
+
+
+def day_boundaries(rule: Dict[str, Any]) -> Set[float]:
+    """The ``last_contact_days`` values a rule uses (empty = not time-dependent)."""
+    if "all" in rule or "any" in rule:
+        return set().union(*(day_boundaries(c) for c in rule.get("all", rule.get("any"))))
+    if "not" in rule:
+        return day_boundaries(rule["not"])
+    return {float(rule["value"])} if rule.get("field") == "last_contact_days" else set()
+
+
+def _as_datetime(v: Any) -> Optional[datetime]:
+    if isinstance(v, datetime):
+        return v if v.tzinfo else v.replace(tzinfo=timezone.utc)
+    if isinstance(v, str) and v.strip():
+        try:
+            dt = datetime.fromisoformat(v.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+    return None
+
+
+def evaluate(rule: Dict[str, Any], customer: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    if "all" in rule:
+        return all(evaluate(c, customer, now) for c in rule["all"])
+    if "any" in rule:
+        return any(evaluate(c, customer, now) for c in rule["any"])
+    if "not" in rule:
+        return not evaluate(rule["not"], customer, now)
+
+    field, op, value = rule["field"], rule["op"], rule["value"]
+    if field == "tags":
+        tags = {_norm(t) for t in (customer.get("tags") or []) if _norm(t)}
+        wanted = {_norm(v) for v in (value if isinstance(value, list) else [value])}
+        if op == "contains_all":
+            return wanted <= tags
+        return bool(wanted & tags)
+    if field == "last_contact_days":
+        last = _as_datetime(customer.get("last_contact_date"))
+        if last is None:
+            return op == ">"          # never contacted: older than any age
+        age = ((now or datetime.now(timezone.utc)) - last).total_seconds() / 86400
+        return age <= value if op == "<=" else age > value
+    actual = _norm(customer.get(field))
+    if op == "in":
+        return actual in {_norm(v) for v in value}
+    return (actual == _norm(value)) == (op == "eq")
+
+
+# ---------- per-process segment cache ----------
+
+class _Cache:
+    def __init__(self, ttl: float = CACHE_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_tenant: Dict[str, Tuple[float, Dict[str, Dict[str, Any]]]] = {}
+
+    def get(self, db, tenant_id: str) -> Dict[str, Dict[str, Any]]:
+        """{segment_id: rule} of the tenant's segments."""
+        with self._lock:
+            hit = self._by_tenant.get(tenant_id)
+        if hit and time.monotonic() - hit[0] < self.ttl:
+            return hit[1]
+        rules = {}
+        for snap in db.collection(SEGMENTS).where(filter=FieldFilter("tenant_id", "==", tenant_id)).stream():
+            rule = (snap.to_dict() or {}).get("rule")
+            if rule:
+                rules[snap.id] = rule
+        with self._lock:
+            self._by_tenant[tenant_id] = (time.monotonic(), rules)
+        return rules
+
+    def invalidate(self, tenant_id: str):
+        with self._lock:
+            self._by_tenant.pop(tenant_id, None)
+
+
+_cache = _Cache()
+
+
+def segments_of(db, tenant_id: str) -> Dict[str, Dict[str, Any]]:
+    return _cache.get(db, tenant_id)
+
+
+def invalidate(tenant_id: str):
+    _cache.invalidate(tenant_id)
+
+
+# ---------- membership ----------
+
+def membership(rules: Dict[str, Dict[str, Any]], before: Dict[str, Any], after: Dict[str, Any],
+               now: Optional[datetime] = None) -> Tuple[List[str], Set[str], Set[str]]:
+    """
+    -> (segment_ids for ``after``, added, removed). Ids of segments not in
+    ``rules`` (created by another process since our cache was filled) are
+    kept as they are; their own build keeps them right.
+    """
+    current = set((before or {}).get("segment_ids") or [])
+    matched = {sid for sid, rule in rules.items() if evaluate(rule, after, now)}
+    known = set(rules)
+    new = (current - known) | matched
+    return sorted(new), matched - current, (current & known) - matched
+
+
+COUNT_KIND = "segment_count"
+
+
+def _flush_count(db, path: str, update: Dict[str, Any]):
+    try:
+        db.document(path).update(update)
+    except NotFound:
+        pass            # segment deleted meanwhile; a merge set would resurrect it as a stub
+
+
+write_behind.register(COUNT_KIND, _flush_count)
+
+
+def count_deltas(added: Iterable[str], removed: Iterable[str], into: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    into = into if into is not None else {}
+    for sid in added:
+        into[sid] = into.get(sid, 0) + 1
+    for sid in removed:
+        into[sid] = into.get(sid, 0) - 1
+    return into
+
+
+def queue_counts(deltas: Dict[str, int]):
+    """Segment count changes; coalesced per segment by the write-behind buffer."""
+    buf = write_behind.get_buffer()
+    for sid, d in deltas.items():
+        if d:
+            buf.add(COUNT_KIND, f"{SEGMENTS}/{sid}", {"count": firestore.Increment(d)})
+
+
+def on_write(db, tenant_id: str, before: Dict[str, Any],
+             after: Dict[str, Any]) -> Tuple[List[str], Set[str], Set[str]]:
+    """``membership`` against the tenant's cached segments; (ids, added, removed)."""
+    rules = segments_of(db, tenant_id)
+    if not rules:
+        return sorted((before or {}).get("segment_ids") or []), set(), set()
+    return membership(rules, before, after)
+
+
+def stage(update: Dict[str, Any], added: Iterable[str], removed: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """
+    Put a membership change into ``update`` (the customer write). A field
+    takes one transform per write, so when segments are both joined and left
+    the removal is returned as a second update for the caller to add to the
+    same batch/transaction; None otherwise.
+    """
+    added, removed = sorted(added), sorted(removed)
+    if added:
+        update["segment_ids"] = firestore.ArrayUnion(added)
+    if removed:
+        if not added:
+            update["segment_ids"] = firestore.ArrayRemove(removed)
+        else:
+            return {"segment_ids": firestore.ArrayRemove(removed)}
+    return None
+
+
+# ---------- segment definitions ----------
+
+def segment_ref(db, segment_id: str):
+    return db.collection(SEGMENTS).document(segment_id)
+
+
+def _writer(db):
+    return db.bulk_writer(options=BulkWriterOptions(
+        initial_ops_per_second=bulk_service.INITIAL_OPS_PER_SECOND,
+        max_ops_per_second=bulk_service.MAX_OPS_PER_SECOND,
+    ))
+
+
+def _reconcile(db, snaps, segment_id: str, rule: Optional[Dict[str, Any]], now: datetime) -> int:
+    """Make ``segment_id`` membership match ``rule`` for the given customer snapshots; -> members seen."""
+    members = 0
+    writer = _writer(db)
+    for snap in snaps:
+        data = snap.to_dict() or {}
+        has = segment_id in (data.get("segment_ids") or [])
+        wants = rule is not None and evaluate(rule, data, now)
+        members += wants
+        if wants and not has:
+            writer.update(snap.reference, {"segment_ids": firestore.ArrayUnion([segment_id])})
+        elif has and not wants:
+            writer.update(snap.reference, {"segment_ids": firestore.ArrayRemove([segment_id])})
+    writer.close()
+    return members
+
+
+def build(db, tenant_id: str, segment_id: str, rule: Optional[Dict[str, Any]]) -> int:
+    """
+    (Re)compute one segment over all of the tenant's customers; ``rule=None``
+    removes it everywhere (segment deleted). Returns the member count.
+    """
+    now = datetime.now(timezone.utc)
+    q = (db.collection("customers")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .select(RULE_FIELDS))
+    members = _reconcile(db, q.stream(), segment_id, rule, now)
+    if rule is not None:
+        # update, not set: a segment deleted meanwhile must stay deleted (NotFound)
+        segment_ref(db, segment_id).update({
+            "count": members, "status": STATUS_READY,
+            "built_at": firestore.SERVER_TIMESTAMP, "refreshed_at": now,
+        })
+    return members
+
+
+def catch_up(db, tenant_id: str, segment_id: str, rule: Optional[Dict[str, Any]], since: datetime) -> int:
+    """
+    Re-evaluate ``segment_id`` for the customers written since ``since`` -
+    by processes whose cache still held the old rules, or concurrently with
+    the build scan - then re-count it. Returns the number of customers read.
+    """
+    if rule is not None and (segment_ref(db, segment_id).get().to_dict() or {}).get("rule") != rule:
+        return 0            # deleted or changed again; that change runs its own build
+    q = (db.collection("customers")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .where(filter=FieldFilter("updated_at", ">=", since))
+           .order_by("updated_at")
+           .select(RULE_FIELDS))
+    snaps = list(q.stream())
+    _reconcile(db, snaps, segment_id, rule, datetime.now(timezone.utc))
+    if rule is not None:
+        segment_ref(db, segment_id).update({"count": count_members(db, tenant_id, segment_id)})
+    return len(snaps)
+
+
+def build_in_background(db, tenant_id: str, segment_id: str, rule: Optional[Dict[str, Any]]):
+    def _run():
+        try:
+            started = datetime.now(timezone.utc)
+            build(db, tenant_id, segment_id, rule)
+            # every process has dropped the old rules once its cache expires
+            wait = CACHE_SECONDS - (datetime.now(timezone.utc) - started).total_seconds()
+            if wait > 0:
+                time.sleep(wait)
+            catch_up(db, tenant_id, segment_id, rule, started)
+        except NotFound:
+            logger.info("segment %s deleted while building", segment_id)
+        except Exception as e:
+            logger.exception("segment %s build failed", segment_id)
+            if rule is not None:
+                try:
+                    segment_ref(db, segment_id).update({"status": STATUS_FAILED, "error": str(e)})
+                except NotFound:
+                    pass
+
+    threading.Thread(target=_run, name=f"segment-{segment_id}", daemon=True).start()
+
+
+def count_members(db, tenant_id: str, segment_id: str) -> int:
+    q = (db.collection("customers")
+           .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+           .where(filter=FieldFilter("segment_ids", "array_contains", segment_id)))
+    result = q.count(alias="total").get()
+    return int(result[0][0].value) if result and result[0] else 0
+
+
+def refresh_tenant(db, tenant_id: str, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Catch up ``last_contact_days`` segments with the passage of time and
+    re-count every segment. Only customers whose last contact crossed a day
+    boundary since the last refresh are read.
+    """
+    now = now or datetime.now(timezone.utc)
+    snaps = list(db.collection(SEGMENTS).where(filter=FieldFilter("tenant_id", "==", tenant_id)).stream())
+    rules = {s.id: (s.to_dict() or {}).get("rule") for s in snaps if (s.to_dict() or {}).get("rule")}
+    since = min([_as_datetime((s.to_dict() or {}).get("refreshed_at")) or now for s in snaps] or [now])
+
+    windows = {days for rule in rules.values() for days in day_boundaries(rule)}
+    seen, changed = set(), 0
+    writer = _writer(db)
+    for days in sorted(windows):
+        # contact crossed "days ago" between the last refresh and now
+        lo, hi = since - timedelta(days=days), now - timedelta(days=days)
+        if hi <= lo:
+            continue
+        q = (db.collection("customers")
+               .where(filter=FieldFilter("tenant_id", "==", tenant_id))
+               .where(filter=FieldFilter("last_contact_date", ">", lo))
+               .where(filter=FieldFilter("last_contact_date", "<=", hi))
+               .order_by("last_contact_date", direction=firestore.Query.DESCENDING)
+               .select(RULE_FIELDS))
+        for snap in q.stream():
+            if snap.id in seen:
+                continue
+            seen.add(snap.id)
+            data = snap.to_dict() or {}
+            _, added, removed = membership(rules, data, data, now)
+            if added or removed:
+                update = {}
+                extra = stage(update, added, removed)
+                writer.update(snap.reference, update)
+                if extra:
+                    writer.update(snap.reference, extra)
+                changed += 1
+    writer.close()
+
+    counts = {}
+    for sid in rules:
+        counts[sid] = count_members(db, tenant_id, sid)
+        try:
+            segment_ref(db, sid).update({"count": counts[sid], "refreshed_at": now})
+        except NotFound:
+            counts.pop(sid)         # deleted while refreshing
+    invalidate(tenant_id)
+    return {"customers_checked": len(seen), "customers_changed": changed, "segments": len(counts)}
+
+
+def tenants_with_segments(db) -> List[str]:
+    return sorted({(s.to_dict() or {}).get("tenant_id") for s in db.collection(SEGMENTS).select(["tenant_id"]).stream()}
+                  - {None})
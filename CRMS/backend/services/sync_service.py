@@ -0,0 +1,150 @@
+"""Delta sync for client-side replicas.
+
+Every write path on a synced collection sets ``updated_at`` to the server
+commit time, so "what changed since X" is one indexed range scan over
+``tenant_id == T order by updated_at, __name__``. Hard deletes (and
+retention moving documents out of the hot collection) leave a tombstone in
+``tombstones/{collection}_{doc_id}`` written in the same batch as the delete.
+
+Tokens are opaque to clients: base64 of the last (updated_at, id) cursor seen
+in the documents and in the tombstones. A page without tombstones moves the
+tombstone cursor up to ``now - INITIAL_TOMBSTONE_MARGIN``, so it tracks when
+the replica last synced even if the collection never sees a delete.
+Tombstones expire after ``TOMBSTONE_TTL_DAYS``; a replica that has not synced
+for that long can no longer be served and must resync from scratch.
+Documents never expire, so the document cursor is not checked.
+"""
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from google.cloud import firestore
+
+from utils import query_planner
+from utils.query_planner import QuerySpec, ASC
+
+SYNC_COLLECTIONS = ("customers", "logs", "complaints")
+TOMBSTONES = "tombstones"
+TOMBSTONE_TTL_DAYS = int(os.getenv("TOMBSTONE_TTL_DAYS", "90"))
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+INITIAL_TOMBSTONE_MARGIN = timedelta(minutes=5)   # clock skew between app servers and commit times
+
+Cursor = Optional[Tuple[datetime, Optional[str]]]
+
+
+class TokenExpired(ValueError):
+    """The token predates the oldest tombstone we still keep."""
+
+
+# ---------- tombstones ----------
+
+def tombstone_ref(db, collection: str, doc_id: str):
+    return db.collection(TOMBSTONES).document(f"{collection}_{doc_id}")
+
+
+def stage_tombstone(writer, db, tenant_id: str, collection: str, doc_id: str, reason: str = "deleted"):
+    """Add the tombstone to the caller's WriteBatch / Transaction (same commit as the delete)."""
+    writer.set(tombstone_ref(db, collection, doc_id), {
+        "tenant_id": tenant_id,
+        "collection": collection,
+        "doc_id": doc_id,
+        "reason": reason,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=TOMBSTONE_TTL_DAYS),
+    })
+
+
+# ---------- tokens ----------
+
+def _dump_cursor(c: Cursor):
+    return [c[0].isoformat(), c[1]] if c else None
+
+
+def _load_cursor(raw) -> Cursor:
+    if not raw:
+        return None
+    return datetime.fromisoformat(raw[0]), (str(raw[1]) if raw[1] is not None else None)
+
+
+def encode_token(docs: Cursor, tombstones: Cursor) -> str:
+    raw = json.dumps({"v": 1, "d": _dump_cursor(docs), "x": _dump_cursor(tombstones)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token: Optional[str]) -> Tuple[Cursor, Cursor]:
+    """Raises ValueError on a malformed token."""
+    if not token:
+        return None, None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8"))
+        return _load_cursor(raw.get("d")), _load_cursor(raw.get("x"))
+    except Exception:
+        raise ValueError("invalid sync token") from None
+
+
+# ---------- reads ----------
+
+def _json_safe(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, dict):
+        return {k: _json_safe(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_json_safe(x) for x in v]
+    if hasattr(v, "path") and hasattr(v, "id"):       # DocumentReference
+        return v.path
+    return v
+
+
+def _page(db, spec: QuerySpec, cursor: Cursor, limit: int):
+    q = query_planner.plan(spec).query(db).order_by("__name__")
+    if cursor:
+        q = q.start_after({"updated_at": cursor[0], "__name__": cursor[1]} if cursor[1]
+                          else {"updated_at": cursor[0]})
+    docs = list(q.limit(limit).stream())
+    last = cursor
+    if docs:
+        tail = docs[-1]
+        last = ((tail.to_dict() or {}).get("updated_at"), tail.id)
+    return docs, last
+
+
+def changes(db, tenant_id: str, collection: str, token: Optional[str] = None,
+            limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    if collection not in SYNC_COLLECTIONS:
+        raise KeyError(collection)
+    doc_cursor, tomb_cursor = decode_token(token)
+    now = datetime.now(timezone.utc)
+    if not token:
+        # a fresh replica only needs deletions that happen while/after it loads
+        tomb_cursor = (now - INITIAL_TOMBSTONE_MARGIN, None)
+    if tomb_cursor is None or tomb_cursor[0] < now - timedelta(days=TOMBSTONE_TTL_DAYS):
+        raise TokenExpired("sync token expired; resync from scratch")
+
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    docs, doc_cursor = _page(
+        db, QuerySpec(collection).where("tenant_id", "==", tenant_id).order("updated_at", ASC),
+        doc_cursor, limit)
+    tombs, tomb_cursor = _page(
+        db, QuerySpec(TOMBSTONES).where("tenant_id", "==", tenant_id)
+                                 .where("collection", "==", collection).order("updated_at", ASC),
+        tomb_cursor, limit)
+    if not tombs:
+        # nothing deleted up to now: later tombstones are newer than the margin
+        floor = now - INITIAL_TOMBSTONE_MARGIN
+        if tomb_cursor[0] < floor:
+            tomb_cursor = (floor, None)
+
+    return {
+        "collection": collection,
+        "changes": [{"id": d.id, **_json_safe(d.to_dict() or {})} for d in docs],
+        "tombstones": [{"id": (t.to_dict() or {}).get("doc_id"),
+                        "reason": (t.to_dict() or {}).get("reason"),
+                        "deleted_at": _json_safe((t.to_dict() or {}).get("updated_at"))} for t in tombs],
+        "token": encode_token(doc_cursor, tomb_cursor),
+        "hasMore": len(docs) == limit or len(tombs) == limit,
+    }
@@ -0,0 +1,87 @@
+import threading
+
+from services.assignment_service import AgentPool, AssignmentEngine, load_deltas, merge_deltas
+
+
+def test_load_deltas_follow_assignee_and_open_status():
+    assert load_deltas(None, None, "a", "new") == {"a": 1}
+    assert load_deltas("a", "new", "b", "in_progress") == {"a": -1, "b": 1}
+    assert load_deltas("a", "in_progress", "a", "resolved") == {"a": -1}
+    assert load_deltas("a", "closed", "a", "acknowledged") == {"a": 1}
+    assert load_deltas("a", "new", "a", "in_progress") == {}
+    assert load_deltas("a", "closed", "b", "closed") == {}
+    assert merge_deltas({"a": 1}, {"a": -1, "b": 2}) == {"a": 0, "b": 2}
+
+def test_pick_prefers_least_loaded_eligible_agent_and_reserves():
+    pool = AgentPool({"ann": [], "bob": ["billing"], "cat": ["delivery"]}, {"ann": 3, "bob": 1, "cat": 0})
+    assert pool.pick("billing") == "bob"          # ann is a generalist but busier
+    assert pool.pick("billing") == "bob"          # 2 < 3
+    assert pool.pick("billing") == "ann"          # tie at 3, broken by uid
+    assert pool.pick("delivery") == "cat"
+    assert pool.pick(None) == "cat"               # any category: everyone is eligible
+    assert pool.loads == {"ann": 4, "bob": 3, "cat": 2}
+
+def test_load_changes_reorder_heaps_and_cap_applies():
+    pool = AgentPool({"ann": [], "bob": []}, {"ann": 0, "bob": 1}, max_open=2)
+    assert pool.pick() == "ann"
+    pool.adjust("bob", -1)                        # bob closed a ticket
+    assert pool.pick() == "bob"
+    assert pool.pick() in {"ann", "bob"}
+    assert pool.pick() in {"ann", "bob"}
+    assert pool.pick() is None                    # everyone at the cap
+    assert len(pool._heaps["*"]) <= 2 * len(pool.loads) + 16
+
+def test_engine_observes_and_releases_without_refetching():
+    fetches = []
+
+    def fetch(db, tenant_id):
+        fetches.append(tenant_id)
+        return AgentPool({"ann": [], "bob": []}, {"ann": 0, "bob": 0})
+
+    engine = AssignmentEngine(refresh_seconds=60, fetch=fetch)
+    first = engine.pick(None, "t1")
+    engine.release("t1", first)
+    assert engine.pick(None, "t1") == first
+    engine.observe("t1", {first: 5})
+    assert engine.pick(None, "t1") != first
+    assert fetches == ["t1"]
+
+def test_refresh_fetches_outside_the_lock_and_keeps_serving_the_old_pool():
+    started, release = threading.Event(), threading.Event()
+    fetches = []
+
+    def fetch(db, tenant_id):
+        fetches.append(tenant_id)
+        if fetches.count("t1") == 2 and tenant_id == "t1":
+            started.set()
+            release.wait(5)
+        return AgentPool({"ann": [], "bob": []}, {"ann": 1 if len(fetches) == 1 else 7, "bob": 0})
+
+    engine = AssignmentEngine(refresh_seconds=60, fetch=fetch)
+    assert engine.pick(None, "t1") == "bob"
+    engine._pools["t1"].built_at -= 120                # expire it
+    refresher = threading.Thread(target=engine.pick, args=(None, "t1"))
+    refresher.start()
+    assert started.wait(5)
+    # while t1 is being rebuilt: other tenants build, t1 picks from the old pool, and nobody refetches t1
+    assert engine.pick(None, "t2") == "bob"
+    assert engine.pick(None, "t1") == "ann"           # old pool: ann 1, bob 1 -> uid order
+    release.set()
+    refresher.join(5)
+    assert fetches == ["t1", "t1", "t2"]
+    assert engine._pools["t1"].loads["ann"] == 7       # swapped in
+
+def test_a_build_overlapping_invalidate_is_not_kept():
+    calls = []
+
+    def fetch(db, tenant_id):
+        calls.append(tenant_id)
+        if len(calls) == 1:
+            engine.invalidate(tenant_id)                # e.g. rebuild_loads finished mid-fetch
+        return AgentPool({"ann": []}, {})
+
+    engine = AssignmentEngine(refresh_seconds=60, fetch=fetch)
+    assert engine.pick(None, "t1") == "ann"
+    assert "t1" not in engine._pools
+    engine.pick(None, "t1")
+    assert "t1" in engine._pools and len(calls) == 2
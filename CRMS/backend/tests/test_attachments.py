@@ -0,0 +1,128 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from google.cloud import firestore
+
+from services import attachment_service
+from services.attachment_service import BlobBusy, collectable, reference_update, release_update
+from utils.storage import LocalStorageBackend, content_key
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+SHA = "ab" * 32
+
+
+class _Snap:
+    def __init__(self, db, doc_id, data):
+        self.id, self._data, self._db = doc_id, data, db
+        self.reference = self
+
+    def to_dict(self):
+        return dict(self._data)
+
+    def update(self, data):
+        self._db.updates.append((self.id, data))
+
+    def delete(self):
+        self._db.deleted.append(self.id)
+
+
+class _Db:
+    """Just enough for ``sweep_uploads``: one collection query and document updates."""
+
+    def __init__(self, uploads):
+        self.uploads, self.updates, self.deleted = uploads, [], []
+
+    def collection(self, name):
+        db = self
+
+        class _Query:
+            def where(self_, filter):
+                return self_
+
+            def stream(self_):
+                return [_Snap(db, i, d) for i, d in db.uploads.items()]
+
+            def document(self_, doc_id):
+                return _Snap(db, doc_id, db.uploads[doc_id])
+        return _Query()
+
+
+def test_references_revive_orphans_but_never_a_blob_being_swept():
+    assert reference_update(None)["ref_count"] == 1
+    revived = reference_update({"ref_count": 0, "orphaned_at": NOW})
+    assert revived["ref_count"] == 1 and revived["orphaned_at"] is firestore.DELETE_FIELD
+    with pytest.raises(BlobBusy):
+        reference_update({"ref_count": 0, "orphaned_at": NOW, "deleting": True})
+
+def test_the_last_release_only_marks_the_blob_orphaned():
+    assert "orphaned_at" not in release_update({"ref_count": 2})
+    last = release_update({"ref_count": 1})
+    assert last["ref_count"] == 0 and last["orphaned_at"] is firestore.SERVER_TIMESTAMP
+
+    cutoff = NOW - attachment_service.ORPHAN_GRACE
+    assert collectable({"ref_count": 0, "orphaned_at": cutoff - timedelta(minutes=1)}, cutoff)
+    assert not collectable({"ref_count": 0, "orphaned_at": cutoff + timedelta(minutes=1)}, cutoff)
+    assert not collectable({"ref_count": 1, "orphaned_at": cutoff - timedelta(days=1)}, cutoff)
+    assert collectable({"ref_count": 0, "deleting": True}, cutoff)   # resume an interrupted sweep
+    assert not collectable(None, cutoff)
+
+def test_expired_uploads_drop_staging_but_finish_committing_ones(tmp_path):
+    store = LocalStorageBackend(str(tmp_path))
+    store.append_staging("u1", 0, io.BytesIO(b"abandoned"))
+    store.append_staging("u2", 0, io.BytesIO(b"referenced"))
+    db = _Db({
+        "u1": {"tenant_id": "t1", "status": "pending"},
+        "u2": {"tenant_id": "t1", "status": "committing", "sha256": SHA, "attachment_id": "a1"},
+    })
+    assert attachment_service.sweep_uploads(db, store, NOW) == 2
+    assert store.staging_size("u1") == 0 and store.staging_size("u2") == 0
+    assert store.exists(content_key("t1", SHA))
+    assert sorted(db.deleted) == ["u1", "u2"]
+
+def test_a_second_final_chunk_gets_the_first_attachment(monkeypatch):
+    docs = {"uploads/u1": {"tenant_id": "t1", "status": "pending"}}
+
+    class _Ref:
+        def __init__(self, path):
+            self.path, self.id = path, path.rsplit("/", 1)[-1]
+
+        def get(self, transaction=None):
+            data = docs.get(self.path)
+            return type("S", (), {"exists": data is not None, "to_dict": lambda s: dict(data or {})})()
+
+    class _Txn:
+        def set(self, ref, data):
+            docs[ref.path] = dict(data)
+
+        def update(self, ref, data):
+            docs[ref.path] = {**docs[ref.path], **data}
+
+    class _FakeDb:
+        n = 0
+
+        def collection(self, name):
+            db = self
+
+            class _Col:
+                def document(self_, doc_id=None):
+                    if doc_id is None:
+                        db.n += 1
+                        doc_id = f"a{db.n}"
+                    return _Ref(f"{name}/{doc_id}")
+            return _Col()
+
+        def transaction(self):
+            return _Txn()
+
+    monkeypatch.setattr(firestore, "transactional", lambda fn: fn)
+    db = _FakeDb()
+    first, _ = attachment_service.add_reference(db, "t1", "u", SHA, 3, "f", "text/plain", upload_id="u1")
+    again, data = attachment_service.add_reference(db, "t1", "u", SHA, 3, "f", "text/plain", upload_id="u1")
+    assert again == first and data["sha256"] == SHA
+    assert docs[f"blobs/t1_{SHA}"]["ref_count"] == 1
+    assert [p for p in docs if p.startswith("attachments/")] == [f"attachments/{first}"]
+
+    docs["uploads/u2"] = {"tenant_id": "t1", "status": "failed"}
+    with pytest.raises(attachment_service.UploadClosed):
+        attachment_service.add_reference(db, "t1", "u", SHA, 3, "f", "text/plain", upload_id="u2")
@@ -0,0 +1,41 @@
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from services import backup_service
+from services.backup_service import BackupNotFound, backup_id_for, load_manifest, manifest_key
+from utils.storage import LocalStorageBackend
+
+
+def test_backup_ids_sort_by_read_time():
+    a = backup_id_for(datetime(2026, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc))
+    b = backup_id_for(datetime(2026, 1, 2, 3, 4, 5, 7, tzinfo=timezone.utc))
+    assert a == "20260102T030405000006Z" and a < b
+
+def test_manifest_is_scoped_to_its_tenant(tmp_path):
+    store = LocalStorageBackend(str(tmp_path))
+    manifest = {"version": backup_service.MANIFEST_VERSION, "tenant_id": "t1", "backup_id": "b1",
+                "collections": {"customers": {"documents": 0, "shards": []}}}
+    store.write_stream(manifest_key("t1", "b1"), io.BytesIO(json.dumps(manifest).encode("utf-8")))
+    assert load_manifest("t1", "b1", store)["collections"]["customers"]["documents"] == 0
+    with pytest.raises(BackupNotFound):
+        load_manifest("t2", "b1", store)
+    store.write_stream(manifest_key("t2", "b1"), io.BytesIO(json.dumps(manifest).encode("utf-8")))
+    with pytest.raises(BackupNotFound):
+        load_manifest("t2", "b1", store)
+
+def test_restore_ends_by_rebuilding_derived_counters(tmp_path, monkeypatch):
+    store = LocalStorageBackend(str(tmp_path))
+    manifest = {"version": backup_service.MANIFEST_VERSION, "tenant_id": "t1", "backup_id": "b1",
+                "collections": {c: {"documents": 0, "shards": []} for c in ("customers", "users")}}
+    store.write_stream(manifest_key("t1", "b1"), io.BytesIO(json.dumps(manifest).encode("utf-8")))
+    rebuilt = []
+    monkeypatch.setattr(backup_service, "rebuild_derived", lambda db, tenant_id: rebuilt.append(tenant_id) or {})
+
+    backup_service.restore_tenant(None, "t1", "b1", storage=store)
+    assert rebuilt == ["t1"]
+    backup_service.restore_tenant(None, "t1", "b1", collections=["users"], storage=store)
+    backup_service.restore_tenant(None, "t1", "b1", storage=store, rebuild=False)
+    assert rebuilt == ["t1"]
@@ -0,0 +1,28 @@
+import pytest
+
+from services.board_service import (
+    RankExhausted, decode_cursor, encode_cursor, initial_rank, rank_between,
+)
+
+
+def test_newer_complaints_rank_above_older_ones():
+    assert initial_rank(2_000) < initial_rank(1_000)
+
+def test_rank_between_neighbours_and_column_ends():
+    assert rank_between(1.0, 2.0) == 1.5
+    assert rank_between(None, 5.0) < 5.0
+    assert rank_between(5.0, None) > 5.0
+    with pytest.raises(ValueError):
+        rank_between(2.0, 1.0)
+
+def test_repeated_drops_into_one_gap_eventually_need_renumbering():
+    before, after = 0.0, 1.0
+    with pytest.raises(RankExhausted):
+        for _ in range(2000):
+            after = rank_between(before, after)
+
+def test_cursor_round_trip_and_garbage():
+    assert decode_cursor(encode_cursor(-1700000000000.0, "abc")) == (-1700000000000.0, "abc")
+    assert decode_cursor(None) is None
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
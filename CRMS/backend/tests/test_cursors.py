@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.cursors import decode_cursor, encode_cursor, iter_pages
+
+
+class _Snap:
+    def __init__(self, i):
+        self.id = f"d{i:03d}"
+
+
+class _Query:
+    """Just enough of a Firestore query over ``n`` ordered documents."""
+
+    def __init__(self, n, after=None, limit=None, reads=None):
+        self.n, self.after, self._limit = n, after, limit
+        self.reads = reads if reads is not None else []
+
+    def order_by(self, field, direction=None):
+        return self
+
+    def start_after(self, snap):
+        return _Query(self.n, int(snap.id[1:]), self._limit, self.reads)
+
+    def limit(self, n):
+        return _Query(self.n, self.after, n, self.reads)
+
+    def stream(self):
+        start = 0 if self.after is None else self.after + 1
+        docs = [_Snap(i) for i in range(start, min(self.n, start + self._limit))]
+        self.reads.append(len(docs))
+        return iter(docs)
+
+
+def test_cursor_round_trips_timestamps():
+    ts = datetime(2024, 5, 1, 9, 30, 15, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor("created_at", ts, "abc"), "created_at") == (ts, "abc")
+    assert decode_cursor(None, "created_at") is None
+
+def test_cursor_rejects_garbage_and_other_orderings():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "created_at")
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("log_date", "2024-05-01", "abc"), "created_at")
+
+def test_iter_pages_reads_in_bounded_pages():
+    q = _Query(1001)
+    pages = list(iter_pages(q, "DESCENDING", 500))
+    assert [len(p) for p in pages] == [500, 500, 1]
+    assert [d.id for p in pages for d in p] == [f"d{i:03d}" for i in range(1001)]
+    assert q.reads == [500, 500, 1]
+
+    q = _Query(1000)
+    assert [len(p) for p in iter_pages(q, "DESCENDING", 500)] == [500, 500]
+    assert q.reads == [500, 500, 0]
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+
+from google.cloud.firestore_v1.transforms import Increment
+
+from services.customer_stats import log_moved_in_update, log_removed_update, month_key
+
+NOW = datetime.now(timezone.utc)
+LAST_YEAR = NOW - timedelta(days=400)
+
+
+def _value(v):
+    return v.value if isinstance(v, Increment) else v
+
+
+def test_removing_a_log_takes_back_its_counters():
+    customer = {"stats_month": month_key(), "logs_this_month": 3, "logs_count": 9}
+    update = log_removed_update(customer, {"created_at": NOW})
+    assert _value(update["logs_count"]) == -1
+    assert _value(update["logs_this_month"]) == -1
+    assert "last_contact_date" not in update
+
+    # an older log, or a counter that belongs to an earlier month, leaves logs_this_month alone
+    assert "logs_this_month" not in log_removed_update(customer, {"created_at": LAST_YEAR})
+    assert "logs_this_month" not in log_removed_update({**customer, "stats_month": "2001-01"},
+                                                       {"created_at": NOW})
+
+def test_moving_a_log_in_counts_it_by_its_own_date():
+    current = {"stats_month": month_key(), "last_log_at": NOW - timedelta(days=1),
+               "last_contact_date": NOW - timedelta(days=1), "last_activity_at": NOW + timedelta(hours=1)}
+    update = log_moved_in_update(current, {"created_at": NOW})
+    assert _value(update["logs_count"]) == 1 and _value(update["logs_this_month"]) == 1
+    assert update["last_contact_date"] == NOW
+    assert "last_activity_at" not in update          # a later complaint is still the latest activity
+
+    old = log_moved_in_update(current, {"created_at": LAST_YEAR})
+    assert "logs_this_month" not in old and "last_contact_date" not in old
+
+    # stale month: the counter is reset rather than incremented
+    rolled = log_moved_in_update({"stats_month": "2001-01"}, {"created_at": NOW})
+    assert rolled["logs_this_month"] == 1 and rolled["stats_month"] == month_key()
@@ -0,0 +1,36 @@
+from services.dedup_service import (
+    blocking_keys, find_duplicate_pairs, name_key, normalize_email, normalize_phone, score_pair, soundex,
+)
+
+def test_phone_formats_share_key():
+    assert normalize_phone("+880 1711-223344") == "1711223344"
+    assert normalize_phone("01711223344") == "1711223344"
+    assert normalize_phone("008801711223344") == "1711223344"
+    assert normalize_phone("12") == ""
+
+def test_email_and_name_keys():
+    assert normalize_email("  Foo@Example.COM ") == "foo@example.com"
+    assert soundex("Robert") == soundex("Rupert") == "R163"
+    assert name_key("Rahman Traders Ltd") == name_key("traders rahmaan")
+
+def test_blocking_keys_are_prefixed_and_unique():
+    keys = blocking_keys({"name": "Acme", "phone": "01711223344", "secondary_phone": "+8801711223344",
+                          "email": "A@acme.com"})
+    assert keys == sorted({"p:1711223344", "e:a@acme.com", f"n:{soundex('acme')}"})
+
+def test_score_pair_signals():
+    a = {"name": "Karim Enterprise", "phone": "+880 1711 223344", "email": "karim@x.com"}
+    b = {"name": "Karim Enterprises", "phone": "01711223344", "email": "KARIM@x.com"}
+    score, matched = score_pair(a, b)
+    assert set(matched) == {"email", "phone", "name"}
+    assert score > 0.95
+    assert score_pair(a, {"name": "Someone Else"}) == (0.0, [])
+
+def test_pairs_only_within_blocks():
+    rows = [
+        {"id": "1", "name": "Alpha Foods", "phone": "01711000001"},
+        {"id": "2", "name": "Alpha Food", "phone": "+8801711000001"},
+        {"id": "3", "name": "Zeta Motors", "email": "z@m.com"},
+    ]
+    pairs = find_duplicate_pairs(rows)
+    assert [(p["a"], p["b"]) for p in pairs] == [("1", "2")]
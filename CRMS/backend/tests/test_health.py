@@ -0,0 +1,22 @@
+import app as app_module
+from utils import firebase
+
+
+def test_liveness_does_no_io():
+    client = app_module.create_app().test_client()
+    res = client.get("/api/health")
+    assert res.status_code == 200
+    assert res.get_json()["status"] == "healthy"
+    assert not firebase.is_initialized()
+
+
+def test_readiness_is_cached(monkeypatch):
+    calls = []
+    def fake_check():
+        calls.append(1)
+        return {"ready": True, "database": "connected"}
+    monkeypatch.setattr(app_module._ReadinessCache, "_check", staticmethod(fake_check))
+    client = app_module.create_app().test_client()
+    for _ in range(5):
+        assert client.get("/api/ready").status_code == 200
+    assert len(calls) == 1
@@ -0,0 +1,20 @@
+from services.invite_service import backoff_delay, normalize_rows, parse_csv
+
+ROLES = {"admin", "manager", "sales_rep", "support", "viewer"}
+
+
+def test_parse_csv_with_and_without_header():
+    assert parse_csv("email,role\nA@x.com,manager\n\nb@x.com,\n") == [
+        {"email": "A@x.com", "role": "manager"}, {"email": "b@x.com"}]
+    assert parse_csv("c@x.com,support,Cee") == [{"email": "c@x.com", "role": "support", "display_name": "Cee"}]
+
+def test_normalize_rows_reports_every_bad_row():
+    valid, rejected = normalize_rows(
+        ["A@x.com", {"email": "a@x.com", "role": "admin"}, {"email": "nope"}, {"email": "b@x.com", "role": "boss"}],
+        "viewer", ROLES)
+    assert [(r["row"], r["email"], r["role"]) for r in valid] == [(0, "a@x.com", "viewer")]
+    assert [(r["row"], r["error"]) for r in rejected] == [
+        (1, "duplicate email in request"), (2, "invalid email"), (3, "invalid role 'boss'")]
+
+def test_backoff_is_capped():
+    assert all(0 <= backoff_delay(a, base=0.5, cap=4) <= 4 for a in range(10))
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from services import migration_service
+from services.migration_service import (
+    customers_dedup_keys, log_date_to_timestamp, to_timestamp, users_snake_case,
+)
+
+
+def test_registry_lists_builtin_migrations():
+    names = [m.name for m in migration_service.available()]
+    assert {"logs_log_date_timestamp", "users_snake_case", "complaints_updated_at", "customers_dedup_keys"} <= set(names)
+    with pytest.raises(KeyError):
+        migration_service.get("nope")
+
+def test_log_date_strings_become_utc_timestamps_once():
+    assert to_timestamp("2025-11-09") == datetime(2025, 11, 9, tzinfo=timezone.utc)
+    assert to_timestamp("2025-11-09T10:30:00Z") == datetime(2025, 11, 9, 10, 30, tzinfo=timezone.utc)
+    update = log_date_to_timestamp({"log_date": "2025-11-09"})
+    assert update == {"log_date": datetime(2025, 11, 9, tzinfo=timezone.utc)}
+    assert log_date_to_timestamp(update) is None            # already migrated
+    assert log_date_to_timestamp({"log_date": "soon"}) is None
+
+def test_users_snake_case_only_fills_missing_fields():
+    update = users_snake_case({"tenantId": "t1", "tenant_id": None, "displayName": "Ann", "display_name": "A"})
+    assert update == {"tenant_id": "t1"}
+    assert users_snake_case({**update, "tenantId": "t1", "displayName": "Ann", "display_name": "A"}) is None
+
+def test_dedup_keys_transform_is_idempotent():
+    data = {"name": "Jane Doe", "email": "Jane@Example.com", "phone": "+1 555 0100"}
+    update = customers_dedup_keys(data)
+    assert update and update["dedup_keys"]
+    assert customers_dedup_keys({**data, **update}) is None
@@ -0,0 +1,142 @@
+import hashlib
+import hmac
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore
+
+from api import complaints
+from services import outbox_service
+from services.outbox_service import (
+    DONE, FAILED, PENDING, SKIPPED, PermanentDeliveryError, WebhookSink, enqueue, retry_delay, settle,
+)
+
+
+class _Ref:
+    def __init__(self, path):
+        self.id = path.rsplit("/", 1)[-1]
+        self.path = path
+
+
+class _Db:
+    def __init__(self):
+        self.n = 0
+
+    def collection(self, name):
+        db = self
+
+        class _Col:
+            def document(self_):
+                db.n += 1
+                return _Ref(f"{name}/e{db.n}")
+        return _Col()
+
+
+class _Writer:
+    def __init__(self):
+        self.sets = []
+
+    def set(self, ref, data):
+        self.sets.append((ref.path, data))
+
+
+def test_enqueue_writes_into_the_callers_batch_for_interested_sinks_only():
+    w = _Writer()
+    event_id = enqueue(w, _Db(), "t1", outbox_service.COMMENT_ADDED, "c1", "u1", {"comment": "hi"},
+                       recipients=["u2", None, "u2", "u1"], sinks=["in_app", "email", "webhook"])
+    (path, data), = w.sets
+    assert path == f"outbox/{event_id}"
+    # email only cares about customer-facing events
+    assert set(data["deliveries"]) == {"in_app", "webhook"}
+    assert data["status"] == PENDING and data["recipients"] == ["u1", "u2"]
+
+    w = _Writer()
+    assert enqueue(w, _Db(), "t1", outbox_service.COMMENT_ADDED, "c1", "u1", {}, sinks=["email"]) is None
+    assert w.sets == []
+
+def test_settle_keeps_successes_and_retries_only_failed_sinks():
+    deliveries = {"in_app": {"status": PENDING}, "webhook": {"status": PENDING}, "email": {"status": PENDING}}
+    status = settle(deliveries, {"in_app": None, "webhook": RuntimeError("503"), "email": SKIPPED}, attempts=1)
+    assert status == PENDING
+    assert [deliveries[k]["status"] for k in ("in_app", "webhook", "email")] == [DONE, PENDING, SKIPPED]
+
+    # the next round only carries the sink that is still pending
+    assert settle(deliveries, {"webhook": None}, attempts=2) == DONE
+    assert deliveries["webhook"] == {"status": DONE, "attempts": 2}
+
+def test_settle_gives_up_on_permanent_errors_and_after_max_attempts():
+    deliveries = {"webhook": {"status": PENDING}}
+    assert settle(deliveries, {"webhook": PermanentDeliveryError("404")}, attempts=1) == FAILED
+
+    deliveries = {"webhook": {"status": PENDING}}
+    assert settle(deliveries, {"webhook": TimeoutError()}, attempts=3, max_attempts=3) == FAILED
+    assert deliveries["webhook"]["status"] == FAILED
+
+def test_retry_delay_grows_and_is_capped():
+    for attempts in range(1, 20):
+        d = min(outbox_service.RETRY_CAP, outbox_service.RETRY_BASE * 2 ** (attempts - 1))
+        assert d / 2 <= retry_delay(attempts) <= d
+
+def test_webhook_is_signed_and_4xx_is_permanent(monkeypatch):
+    sent = {}
+
+    class _Resp:
+        def __init__(self, code):
+            self.status_code = code
+
+        def raise_for_status(self):
+            if self.status_code >= 400:
+                raise RuntimeError(self.status_code)
+
+    def post(url, data, headers, timeout):
+        sent.update(data=data, headers=headers)
+        return _Resp(sent.get("code", 200))
+
+    monkeypatch.setattr(outbox_service.requests, "post", post)
+    sink = WebhookSink(url="https://hooks.example/crm", secret="s3cret")
+    event = {"id": "e1", "type": outbox_service.STATUS_CHANGED, "tenant_id": "t1"}
+    sink.deliver(None, event)
+    expected = hmac.new(b"s3cret", sent["data"], hashlib.sha256).hexdigest()
+    assert sent["headers"]["X-CRMS-Signature"] == f"sha256={expected}"
+    assert sent["headers"]["X-CRMS-Delivery"] == "e1"
+
+    sent["code"] = 410
+    with pytest.raises(PermanentDeliveryError):
+        sink.deliver(None, event)
+    sent["code"] = 503
+    with pytest.raises(RuntimeError):
+        sink.deliver(None, event)
+
+def test_bulk_status_change_enqueues_one_event_per_changed_complaint(monkeypatch):
+    from api import complaints
+
+    commits = []
+
+    class _Batch(_Writer):
+        def commit(self):
+            commits.append(self.sets)
+
+    db = _Db()
+    db.batch = _Batch
+    woken = []
+    monkeypatch.setattr(outbox_service, "notify", lambda: woken.append(1))
+    monkeypatch.setattr(outbox_service, "ENABLED_SINKS", ["in_app"])
+    changed = [(f"c{i}", {"status": "new", "assigned_to": "a1", "created_by": "u9"}) for i in range(401)]
+    complaints._enqueue_status_events(db, "t1", "u1", "closed", iter(changed))
+
+    events = [data for batch in commits for _, data in batch]
+    assert [len(b) for b in commits] == [400, 1]
+    assert {e["complaint_id"] for e in events} == {c for c, _ in changed}
+    assert events[0]["type"] == outbox_service.STATUS_CHANGED
+    assert events[0]["data"]["to"] == "closed" and events[0]["recipients"] == ["a1", "u9"]
+    assert woken == [1]
+
+def test_comment_and_its_event_build_into_one_real_batch():
+    # a real (offline) client: building the write rejects sentinels inside array elements
+    db = firestore.Client(project="test", credentials=AnonymousCredentials())
+    batch = db.batch()
+    batch.update(db.collection("complaints").document("c1"), complaints._append_note(
+        "internal_comments", {"userId": "u1", "comment": "hi"}, "internal_comment", "u1", "hi"))
+    enqueue(batch, db, "t1", outbox_service.COMMENT_ADDED, "c1", "u1", {"comment": "hi"},
+            recipients=["u2"], sinks=["in_app"])
+    assert len(batch._write_pbs) == 2
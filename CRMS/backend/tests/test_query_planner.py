@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from utils import query_planner
+from utils.query_planner import QueryPlanner, QuerySpec, QueryNotIndexed, ASC, DESC
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "firestore.indexes.json")
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    monkeypatch.setattr(query_planner, "RECORD_MISSES", False)
+    return QueryPlanner.from_file(INDEX_FILE)
+
+def test_declared_and_merged_indexes_plan(planner):
+    plan = planner.plan(QuerySpec("customers").where("tenant_id", "==", "t").order("open_complaints", DESC))
+    assert len(plan.indexes) == 1
+    # status + type are served by merging two tenant_id/created_at composites
+    merged = planner.plan(QuerySpec("customers").where("tenant_id", "==", "t").where("status", "==", "active")
+                          .where("type", "==", "b2b").order("created_at", DESC))
+    assert len(merged.indexes) == 2
+    assert planner.plan(QuerySpec("customers").where("tenant_id", "==", "t")).automatic
+
+def test_unknown_order_is_rejected_and_recorded(planner):
+    with pytest.raises(QueryNotIndexed) as exc:
+        planner.plan(QuerySpec("customers").where("tenant_id", "==", "t").order("nickname", ASC))
+    assert exc.value.suggested[-1] == {"fieldPath": "nickname", "order": ASC}
+    assert planner.miss_report()[0]["count"] == 1
+
+def test_range_must_lead_the_order(planner):
+    spec = QuerySpec("logs").where("tenant_id", "==", "t").where("created_at", ">=", 1).order("type", ASC)
+    with pytest.raises(QueryNotIndexed):
+        planner.plan(spec)
+
+def test_every_endpoint_default_spec_is_indexed(planner):
+    from api import complaints, customers, logs
+    from services import board_service, sync_service
+
+    specs = [
+        complaints._list_spec("t"),
+        complaints._list_spec("t", customer_id="c"),
+        complaints._list_spec("t", status="new"),
+        complaints._list_spec("t", customer_id="c", status="new"),
+        customers._list_spec("t", status="active"),
+        customers._list_spec("t", type_filter="b2b"),
+        customers._list_spec("t", owner_id="u"),
+        customers._list_spec("t", segment="s"),
+        customers._list_spec("t", "open_complaints", has_open=True),
+        customers._list_spec("t", "logs_this_month"),
+        logs._list_spec("t", customer_id="c"),
+        logs._list_spec("t", log_type="call"),
+        logs._list_spec("t", from_dt=1, to_dt=2),
+        board_service._column_spec("t", "new"),
+    ]
+    for direction in (DESC, ASC):
+        specs += [customers._list_spec("t", direction=direction),
+                  customers._logs_spec("t", "c", direction=direction),
+                  logs._list_spec("t", direction=direction)]
+    for collection in sync_service.SYNC_COLLECTIONS:
+        specs.append(QuerySpec(collection).where("tenant_id", "==", "t").order("updated_at", ASC))
+
+    for spec in specs:
+        planner.plan(spec)          # raises QueryNotIndexed when the index file lacks it
+    assert planner.miss_report() == []
+
+def test_sortable_fields_are_indexed_and_others_rejected_before_planning(planner):
+    from api import customers
+
+    for field in customers.SORT_FIELDS:
+        planner.plan(customers._list_spec("t", field, DESC))
+    assert query_planner.check_order("customers", None, customers.SORT_FIELDS) == "created_at"
+    with pytest.raises(QueryNotIndexed):
+        query_planner.check_order("customers", "nickname", customers.SORT_FIELDS)
+
+def test_miss_table_is_capped(planner, monkeypatch):
+    monkeypatch.setattr(query_planner, "MAX_TRACKED_MISSES", 2)
+    for field in ("a", "b", "c", "a"):
+        with pytest.raises(QueryNotIndexed):
+            planner.plan(QuerySpec("customers").where("tenant_id", "==", "t").order(field, ASC))
+    assert sorted(r["count"] for r in planner.miss_report()) == [1, 2]
+    assert planner.untracked == 1
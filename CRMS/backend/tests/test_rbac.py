@@ -0,0 +1,20 @@
+import pytest
+
+from models.user import User
+from utils import rbac
+
+
+def test_aliases_and_super_admin():
+    assert rbac.allowed("admin", "complaints", "assign") and rbac.allowed("tenant_admin", "complaints", "assign")
+    assert rbac.allowed("support", "complaints", "update") and not rbac.allowed("support", "customers", "delete")
+    assert rbac.allowed("super_admin", "users", "create")
+    assert not rbac.allowed("intern", "customers", "read")
+    assert rbac.allowed(None, "customers", "read") and not rbac.allowed(None, "customers", "update")
+
+def test_user_model_uses_compiled_policy():
+    assert User(role=User.ROLE_SALES_REP).has_permission("customers", "create")
+    assert not User(role=User.ROLE_VIEWER).has_permission("logs", "create")
+
+def test_unknown_permission_fails_at_decoration_time():
+    with pytest.raises(rbac.UnknownPermission):
+        rbac.permission_bit("complaints", "frobnicate")
@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+
+from services import rollup_service
+from utils.write_behind import merge_update
+
+
+def _plain(d):
+    return {k: _plain(v) if isinstance(v, dict) else v.value for k, v in d.items()}
+
+
+def test_deleting_a_log_cancels_its_creation_on_the_day_it_was_counted():
+    log = {"type": "call", "created_by": "u1", "created_at": datetime(2025, 3, 9, 23, 30, tzinfo=timezone.utc)}
+    day = merge_update(rollup_service.log_increments(log), rollup_service.log_increments(log, -1))
+    assert _plain(day) == {"logs": {"total": 0, "by_type": {"call": 0}, "by_user": {"u1": 0}}}
+    assert rollup_service.log_day(log) == "2025-03-09"
+
+def test_type_change_moves_the_log_between_buckets():
+    assert _plain(rollup_service.log_type_change_increments("call", "email")) == {
+        "logs": {"by_type": {"call": -1, "email": 1}}}
+    assert _plain(rollup_service.log_type_change_increments(None, "note")) == {"logs": {"by_type": {"note": 1}}}
+    assert rollup_service.log_type_change_increments("call", "call") is None
@@ -0,0 +1,59 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask, jsonify, request
+from google.cloud import firestore
+
+from schemas import validate_body
+from schemas.base import dump_json
+from schemas.complaints import StatusUpdate
+from schemas.customers import CustomerCreate
+from schemas.logs import LogOut
+
+
+@pytest.fixture()
+def app():
+    app = Flask(__name__)
+
+    @app.route("/customers", methods=["POST"])
+    @validate_body(CustomerCreate)
+    def create():
+        return jsonify(request.validated.model_dump(exclude_unset=True)), 201
+
+    return app
+
+
+def test_camel_case_aliases_and_unknown_customer_fields_are_accepted():
+    body = CustomerCreate.model_validate_json(b'{"name": " Acme ", "ownerId": "u1", "tier": "gold"}')
+    assert body.model_dump(exclude_unset=True) == {"name": "Acme", "owner_id": "u1", "tier": "gold"}
+    assert StatusUpdate.model_validate({"status": " Resolved ", "beforeId": "a"}).before_id == "a"
+
+
+def test_invalid_body_returns_400_with_field_details(app):
+    res = app.test_client().post("/customers", data=b'{"name": ""}', content_type="application/json")
+    assert res.status_code == 400
+    payload = res.get_json()
+    assert payload["error"] == "Invalid request body"
+    assert payload["details"][0]["field"] == "name"
+
+    res = app.test_client().post("/customers", data=b"{not json", content_type="application/json")
+    assert res.status_code == 400
+
+    res = app.test_client().post("/customers", data=b'{"name": "Acme"}', content_type="application/json")
+    assert res.status_code == 201 and res.get_json() == {"name": "Acme"}
+
+
+def test_responses_serialize_datetimes_and_firestore_sentinels():
+    out = json.loads(dump_json(LogOut, {
+        "id": "l1",
+        "log_date": datetime(2024, 5, 1, 9, 30, tzinfo=timezone.utc),
+        "created_at": firestore.SERVER_TIMESTAMP,
+    }))
+    assert out["log_date"] == "2024-05-01T09:30:00Z"
+    assert out["created_at"] is None
+
+
+def test_documents_that_do_not_match_are_sent_unvalidated():
+    out = json.loads(dump_json(LogOut, {"log_date": "2024-05-01", "legacy": True}))
+    assert out == {"log_date": "2024-05-01", "legacy": True}
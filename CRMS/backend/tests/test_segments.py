@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from google.cloud.firestore_v1.transforms import ArrayRemove, ArrayUnion
+
+from services.segment_service import count_deltas, day_boundaries, evaluate, membership, stage, validate_rule
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+VIP_DHAKA = {"all": [
+    {"field": "tags", "op": "contains", "value": "VIP"},
+    {"field": "city", "op": "in", "value": ["Dhaka", "Chattogram"]},
+    {"not": {"field": "industry", "op": "eq", "value": "retail"}},
+]}
+STALE = {"field": "last_contact_days", "op": ">", "value": 30}
+
+
+def _customer(**kw):
+    return {"tags": ["vip", "wholesale"], "city": " dhaka", "industry": "Textiles", "status": "active", **kw}
+
+
+def test_rules_combine_tags_scalars_and_negation_case_insensitively():
+    assert evaluate(VIP_DHAKA, _customer(), NOW)
+    assert not evaluate(VIP_DHAKA, _customer(industry="RETAIL"), NOW)
+    assert not evaluate(VIP_DHAKA, _customer(tags=["wholesale"]), NOW)
+    assert not evaluate(VIP_DHAKA, _customer(city=None), NOW)
+
+    any_tag = {"field": "tags", "op": "contains_any", "value": ["x", "wholesale"]}
+    all_tags = {"field": "tags", "op": "contains_all", "value": ["vip", "x"]}
+    assert evaluate({"any": [all_tags, any_tag]}, _customer(), NOW)
+    assert not evaluate(all_tags, _customer(), NOW)
+
+def test_last_contact_age_treats_never_contacted_as_stale():
+    recent = _customer(last_contact_date=NOW - timedelta(days=3))
+    old = _customer(last_contact_date=(NOW - timedelta(days=45)).isoformat())
+    assert not evaluate(STALE, recent, NOW)
+    assert evaluate(STALE, old, NOW)
+    assert evaluate(STALE, _customer(), NOW)
+    assert not evaluate({**STALE, "op": "<="}, _customer(), NOW)
+    assert day_boundaries({"any": [VIP_DHAKA, {"not": STALE}]}) == {30.0}
+
+@pytest.mark.parametrize("rule", [
+    {},
+    {"all": []},
+    {"field": "email", "op": "eq", "value": "x"},
+    {"field": "tags", "op": "eq", "value": "vip"},
+    {"field": "city", "op": "in", "value": "Dhaka"},
+    {"field": "last_contact_days", "op": ">", "value": -1},
+    {"all": [STALE], "any": [STALE]},
+])
+def test_validate_rule_rejects_malformed_rules(rule):
+    with pytest.raises(ValueError):
+        validate_rule(rule)
+
+def test_validate_rule_limits_depth_and_size():
+    assert validate_rule(VIP_DHAKA) == 3
+    deep = STALE
+    for _ in range(10):
+        deep = {"not": deep}
+    with pytest.raises(ValueError):
+        validate_rule(deep)
+    with pytest.raises(ValueError):
+        validate_rule({"any": [STALE] * 31})
+
+def test_membership_diff_keeps_segments_this_process_does_not_know_yet():
+    rules = {"vip": VIP_DHAKA, "stale": STALE}
+    before = {**_customer(last_contact_date=NOW), "segment_ids": ["vip", "other-process"]}
+    after = {**before, "tags": [], "last_contact_date": NOW - timedelta(days=90)}
+    ids, added, removed = membership(rules, before, after, NOW)
+    assert ids == ["other-process", "stale"]
+    assert (added, removed) == ({"stale"}, {"vip"})
+    assert count_deltas(added, removed, {"stale": 2}) == {"stale": 3, "vip": -1}
+
+def test_membership_is_written_as_transforms_not_as_the_whole_array():
+    update = {}
+    assert stage(update, {"b", "a"}, set()) is None
+    assert update["segment_ids"] == ArrayUnion(["a", "b"])
+
+    update = {}
+    assert stage(update, set(), {"c"}) is None
+    assert update["segment_ids"] == ArrayRemove(["c"])
+
+    # one transform per field per write: the removal becomes a second write
+    update = {}
+    assert stage(update, {"a"}, {"c"}) == {"segment_ids": ArrayRemove(["c"])}
+    assert update["segment_ids"] == ArrayUnion(["a"])
+
+    update = {}
+    assert stage(update, set(), set()) is None and update == {}
@@ -0,0 +1,38 @@
+import threading
+
+from services.sequence_allocator import SequenceAllocator, format_ticket, MIN_BLOCK_SIZE
+
+
+def _counter():
+    state = {"next": 1, "calls": 0}
+    lock = threading.Lock()
+
+    def reserve(tenant_id, name, size):
+        with lock:
+            start = state["next"]
+            state["next"] += size
+            state["calls"] += 1
+            return start, "ACME"
+    return state, reserve
+
+def test_numbers_are_unique_under_concurrency_with_few_reservations():
+    state, reserve = _counter()
+    alloc = SequenceAllocator(reserve)
+    out = []
+
+    def worker():
+        for _ in range(250):
+            out.append(alloc.next("t1", "complaints")[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(out) == len(set(out)) == 2000
+    # blocks grow while demand is high, so the counter document is written rarely
+    assert state["calls"] < 2000 / MIN_BLOCK_SIZE
+
+def test_ticket_format():
+    assert format_ticket("ACME", 42) == "ACME-000042"
+    assert format_ticket(None, 1).endswith("-000001")
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from utils.singleflight import SingleFlight, make_key
+
+
+def test_make_key_ignores_param_order_and_empty_values():
+    assert make_key("t1", "customers.list", {"status": "active", "type": "", "limit": 20}) == \
+        make_key("t1", "customers.list", {"limit": "20", "status": " active", "owner_id": None})
+    assert make_key("t1", "x") != make_key("t2", "x")
+
+def test_concurrent_identical_calls_share_one_execution():
+    group = SingleFlight(stale_seconds=0)
+    gate = threading.Event()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        gate.wait(2)
+        return {"total": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("k", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(runs) == 1
+    assert results == [{"total": 42}] * 5
+    stats = group.snapshot()
+    assert (stats["calls"], stats["executions"], stats["coalesced"], stats["in_flight"]) == (5, 1, 4, 0)
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    group = SingleFlight(stale_seconds=30)
+
+    def boom():
+        raise RuntimeError("firestore down")
+
+    with pytest.raises(RuntimeError):
+        group.do("k", boom)
+    assert group.do("k", lambda: 1) == 1
+    assert group.snapshot()["errors"] == 1
+
+def test_stale_result_is_served_while_refreshing():
+    group = SingleFlight(stale_seconds=30, fresh_seconds=0)
+    assert group.do("k", lambda: "v1") == "v1"
+    assert group.do("k", lambda: "v2") == "v1"          # stale hit, refresh starts
+    deadline = time.time() + 2
+    while group.snapshot()["in_flight"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert group.do("k", lambda: "v3") == "v2"
+    assert group.snapshot()["refreshes"] == 2
+
+def test_sequential_hits_inside_the_fresh_window_do_not_refetch():
+    group = SingleFlight(stale_seconds=30)              # fresh for the first 15s
+    runs = []
+
+    def fetch():
+        runs.append(1)
+        return len(runs)
+
+    assert [group.do("k", fetch) for _ in range(20)] == [1] * 20
+    assert runs == [1]
+    stats = group.snapshot()
+    assert (stats["fresh_hits"], stats["stale_hits"], stats["refreshes"]) == (19, 0, 0)
+
+    group._cache["k"] = (time.monotonic() - 20, 1)     # past the fresh window, still inside the stale one
+    assert group.do("k", fetch) == 1
+    assert group.snapshot()["refreshes"] == 1
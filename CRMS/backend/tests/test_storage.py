@@ -0,0 +1,39 @@
+import hashlib
+import io
+
+import pytest
+
+from utils.storage import LocalStorageBackend, OffsetMismatch, StorageError, content_key
+
+
+def test_resumable_upload_and_dedup(tmp_path):
+    store = LocalStorageBackend(str(tmp_path))
+    data = b"x" * 100_000
+    assert store.append_staging("u1", 0, io.BytesIO(data[:40_000]), max_bytes=len(data)) == 40_000
+    with pytest.raises(OffsetMismatch) as exc:
+        store.append_staging("u1", 0, io.BytesIO(data[40_000:]))
+    assert exc.value.expected == 40_000
+    assert store.append_staging("u1", 40_000, io.BytesIO(data[40_000:]), max_bytes=len(data)) == len(data)
+
+    sha, size = store.hash_staging("u1")
+    assert (sha, size) == (hashlib.sha256(data).hexdigest(), len(data))
+    key = content_key("t1", sha)
+    assert store.commit_staging("u1", key) is True
+
+    store.append_staging("u2", 0, io.BytesIO(data))
+    assert store.commit_staging("u2", key) is False  # same bytes stored once
+    assert store.staging_size("u2") == 0
+
+
+def test_range_reads_and_limits(tmp_path):
+    store = LocalStorageBackend(str(tmp_path))
+    store.append_staging("u", 0, io.BytesIO(bytes(range(256))))
+    store.commit_staging("u", "t/k")
+    assert b"".join(store.read_range("t/k", 10, 20, chunk_size=3)) == bytes(range(10, 20))
+    assert store.size("t/k") == 256
+
+    with pytest.raises(StorageError):
+        store.append_staging("v", 0, io.BytesIO(b"abc"), max_bytes=2)
+    assert store.staging_size("v") == 0
+    with pytest.raises(StorageError):
+        store.read_range("../escape", 0).__next__()
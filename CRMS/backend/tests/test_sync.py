@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services import sync_service
+from services.sync_service import TokenExpired, decode_token, encode_token
+
+
+def test_token_round_trip():
+    at = datetime(2025, 11, 9, 10, 30, 0, 123456, tzinfo=timezone.utc)
+    token = encode_token((at, "abc"), (at, None))
+    assert "=" not in token
+    assert decode_token(token) == ((at, "abc"), (at, None))
+    assert decode_token(None) == (None, None)
+
+def test_bad_token_is_value_error():
+    with pytest.raises(ValueError):
+        decode_token("not-a-token")
+
+def test_quiet_collections_do_not_expire_tokens_of_replicas_that_keep_syncing(monkeypatch):
+    monkeypatch.setattr(sync_service, "_page", lambda db, spec, cursor, limit: ([], cursor))
+    now = datetime.now(timezone.utc)
+    # no deletes for months, no document changes for a year: the replica synced a minute ago
+    token = encode_token((now - timedelta(days=365), "c1"), (now - timedelta(minutes=6), None))
+    result = sync_service.changes(None, "t1", "complaints", token)
+    docs, tombs = decode_token(result["token"])
+    assert docs == (now - timedelta(days=365), "c1")
+    assert tombs[0] >= now - sync_service.INITIAL_TOMBSTONE_MARGIN   # moved up on an empty page
+
+    # a replica that really was away for longer than tombstones are kept must resync
+    stale = encode_token((now - timedelta(hours=1), "c1"),
+                         (now - timedelta(days=sync_service.TOMBSTONE_TTL_DAYS + 1), None))
+    with pytest.raises(TokenExpired):
+        sync_service.changes(None, "t1", "complaints", stale)
@@ -0,0 +1,34 @@
+import pytest
+
+from utils import tenant_limits
+from utils.tenant_limits import MemoryBackend, RateLimited, TokenBucket, request_class
+
+
+def test_token_bucket_refills_at_rate_up_to_burst():
+    b = TokenBucket(rate=2, burst=4, now=0)
+    assert [b.take(1, now=0) for _ in range(4)] == [0, 0, 0, 0]
+    assert b.take(1, now=0) == pytest.approx(0.5)
+    assert b.take(1, now=0.5) == 0
+    assert b.take(3, now=100) == 0 and b.tokens == 1     # refill capped at burst
+
+def test_reads_and_writes_use_separate_buckets():
+    assert request_class("GET") == "read" and request_class("post") == "write"
+
+def test_concurrency_gate_and_retry_after(monkeypatch):
+    tenant_limits.set_backend(MemoryBackend())
+    monkeypatch.setattr(tenant_limits, "ENABLED", True)
+    monkeypatch.setattr(tenant_limits, "MAX_CONCURRENT", 2)
+    try:
+        r1 = tenant_limits.admit("t1", "GET")
+        r2 = tenant_limits.admit("t1", "GET")
+        with pytest.raises(RateLimited) as exc:
+            tenant_limits.admit("t1", "GET")
+        assert exc.value.retry_after_header == "1"
+        tenant_limits.admit("t2", "GET")()                  # other tenants are unaffected
+        r1()
+        r1()                                                # releasing twice is harmless
+        tenant_limits.admit("t1", "GET")()
+        r2()
+        assert tenant_limits.get_backend().active() == {}
+    finally:
+        tenant_limits.set_backend(None)
@@ -0,0 +1,24 @@
+from google.cloud.firestore_v1.transforms import Increment
+
+from utils import write_behind
+from utils.write_behind import WriteBehindBuffer, merge_update
+
+
+def test_merge_update_sums_increments_and_merges_maps():
+    acc = merge_update({}, {"count": Increment(1), "by_type": {"call": Increment(1)}, "at": 1})
+    merge_update(acc, {"count": Increment(2), "by_type": {"call": Increment(1), "email": Increment(1)}, "at": 2})
+    assert acc["count"].value == 3
+    assert acc["by_type"]["call"].value == 2 and acc["by_type"]["email"].value == 1
+    assert acc["at"] == 2
+
+def test_updates_to_one_key_coalesce_into_one_write():
+    writes = []
+    write_behind.register("test_kind", lambda db, key, update: writes.append((key, update["n"].value)))
+    buf = WriteBehindBuffer(window=60, db_factory=lambda: None)
+    for _ in range(5):
+        buf.add("test_kind", "customers/a", {"n": Increment(1)})
+    buf.add("test_kind", "customers/b", {"n": Increment(1)})
+    buf.flush()
+    assert sorted(writes) == [("customers/a", 5), ("customers/b", 1)]
+    stats = buf.snapshot()
+    assert (stats["updates"], stats["coalesced"], stats["writes"], stats["pending"]) == (6, 4, 2, 0)
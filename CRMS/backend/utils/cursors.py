@@ -0,0 +1,62 @@
+"""
+Opaque keyset cursors for ``order_by(field) + __name__`` queries.
+
+A cursor carries the ordered field's value of the last row plus its document
+id, so the next page starts with ``start_after`` instead of an offset (which
+Firestore bills and scans row by row). Values go through the lossless
+``utils/ndjson`` encoding, so timestamp cursors round-trip exactly.
+"""
+import base64
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils import ndjson
+
+
+def encode_cursor(field: str, value: Any, doc_id: str) -> str:
+    raw = json.dumps([field, ndjson.encode_value(value), doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], field: str) -> Optional[Tuple[Any, str]]:
+    """-> (value, doc_id); raises ValueError when malformed or made for another ordering."""
+    if not cursor:
+        return None
+    try:
+        f, value, doc_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8"))
+    except Exception:
+        raise ValueError("invalid cursor") from None
+    if f != field:
+        raise ValueError(f"cursor was issued for orderBy={f}")
+    return ndjson.decode_value(value), str(doc_id)
+
+
+def page(query, field: str, direction: str, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of ``query`` (already ordered by ``field`` in ``direction``).
+    Returns ``{"rows": [{"id", ...}], "nextCursor", "hasMore"}``.
+    """
+    after = decode_cursor(cursor, field)
+    # same direction as the index's implicit __name__, so no extra index is needed
+    q = query.order_by("__name__", direction=direction)
+    if after:
+        q = q.start_after({field: after[0], "__name__": after[1]})
+    # one extra row tells us whether there is another page
+    docs = list(q.limit(limit + 1).stream())
+    has_more = len(docs) > limit
+    rows = [{"id": d.id, **(d.to_dict() or {})} for d in docs[:limit]]
+    next_cursor = encode_cursor(field, rows[-1].get(field), rows[-1]["id"]) if has_more else None
+    return {"rows": rows, "nextCursor": next_cursor, "hasMore": has_more}
+
+
+def iter_pages(query, direction: str, page_size: int) -> Iterator[List[Any]]:
+    """Yield snapshots of ``query`` ``page_size`` at a time; only one page is held in memory."""
+    q = query.order_by("__name__", direction=direction)
+    last = None
+    while True:
+        docs = list((q.start_after(last) if last is not None else q).limit(page_size).stream())
+        if docs:
+            yield docs
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
@@ -3,11 +3,13 @@ Firebase initialization and utility functions
 Compatible with frontend + auth.py authentication logic
 """
 import os
+import threading
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
 from typing import Optional, Dict
 
 _db = None  # Global Firestore instance
+_init_lock = threading.Lock()
 
 
 def initialize_firebase():
@@ -67,15 +69,28 @@ def initialize_firebase():
         raise
 
 
-def get_db():
-    """Return Firestore instance (requires initialize_firebase() first)"""
+def ensure_initialized():
+    """Initialize Firebase on first use (thread-safe); cheap no-op afterwards."""
     if _db is None:
-        raise RuntimeError("Firebase not initialized. Call initialize_firebase() before database access.")
+        with _init_lock:
+            if _db is None:
+                initialize_firebase()
+
+
+def get_db():
+    """Return the Firestore client, initializing Firebase lazily on first use."""
+    ensure_initialized()
     return _db
 
 
+def is_initialized() -> bool:
+    """True once a Firestore client exists (never triggers initialization)."""
+    return _db is not None
+
+
 def verify_token(id_token: str) -> Optional[Dict]:
     """Verify a Firebase ID token and return decoded claims"""
+    ensure_initialized()
     try:
         decoded_token = auth.verify_id_token(id_token)
         return decoded_token
@@ -86,6 +101,7 @@ def verify_token(id_token: str) -> Optional[Dict]:
 
 def get_user_by_email(email: str):
     """Fetch Firebase user by email"""
+    ensure_initialized()
     try:
         return auth.get_user_by_email(email)
     except Exception as e:
@@ -95,6 +111,7 @@ def get_user_by_email(email: str):
 
 def create_user(email: str, password: str, display_name: str = None):
     """Create Firebase Auth user"""
+    ensure_initialized()
     try:
         user = auth.create_user(
             email=email,
@@ -109,6 +126,7 @@ def create_user(email: str, password: str, display_name: str = None):
 
 def delete_user(uid: str) -> bool:
     """Delete Firebase Auth user by UID"""
+    ensure_initialized()
     try:
         auth.delete_user(uid)
         return True
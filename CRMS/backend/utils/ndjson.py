@@ -0,0 +1,108 @@
+"""
+Lossless NDJSON encoding for Firestore documents.
+
+Firestore values that JSON cannot represent are wrapped in single-key
+objects so they round-trip: timestamps ``{"__ts": iso}``, bytes
+``{"__bytes": b64}``, geo points ``{"__geo": [lat, lng]}`` and document
+references ``{"__ref": "col/doc"}``.
+"""
+import base64
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+from google.cloud.firestore_v1 import GeoPoint
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+
+
+def encode_value(v: Any) -> Any:
+    if isinstance(v, datetime):
+        if v.tzinfo is None:
+            v = v.replace(tzinfo=timezone.utc)
+        return {"__ts": v.isoformat()}
+    if isinstance(v, bytes):
+        return {"__bytes": base64.b64encode(v).decode("ascii")}
+    if isinstance(v, GeoPoint):
+        return {"__geo": [v.latitude, v.longitude]}
+    if isinstance(v, BaseDocumentReference):
+        return {"__ref": v.path}
+    if isinstance(v, dict):
+        return {k: encode_value(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [encode_value(x) for x in v]
+    return v
+
+
+def decode_value(v: Any, db=None) -> Any:
+    if isinstance(v, dict):
+        if len(v) == 1:
+            (k, x), = v.items()
+            if k == "__ts":
+                return datetime.fromisoformat(x)
+            if k == "__bytes":
+                return base64.b64decode(x)
+            if k == "__geo":
+                return GeoPoint(x[0], x[1])
+            if k == "__ref":
+                return db.document(x) if db is not None else x
+        return {k: decode_value(x, db) for k, x in v.items()}
+    if isinstance(v, list):
+        return [decode_value(x, db) for x in v]
+    return v
+
+
+def dumps_doc(doc_id: str, data: Dict[str, Any]) -> str:
+    """One NDJSON line: {"id": ..., "data": {...}}."""
+    return json.dumps({"id": doc_id, "data": encode_value(data)}, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads_doc(line: str, db=None):
+    row = json.loads(line)
+    return row["id"], decode_value(row.get("data") or {}, db)
+
+
+def gzip_lines(lines: Iterable[str]) -> bytes:
+    """Compress lines into one gzip member (callers keep batches bounded)."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as gz:
+        for line in lines:
+            gz.write(line.encode("utf-8"))
+            gz.write(b"\n")
+    return buf.getvalue()
+
+
+def iter_gzip_lines(stream: BinaryIO) -> Iterator[str]:
+    """Stream-decompress NDJSON lines without loading the whole file."""
+    with gzip.GzipFile(fileobj=stream, mode="rb") as gz:
+        for raw in gz:
+            line = raw.decode("utf-8").strip()
+            if line:
+                yield line
+
+
+class ChunkStream(io.RawIOBase):
+    """File-like adapter over an iterator of byte chunks (e.g. StorageBackend.read_range)."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._it = iter(chunks)
+        self._buf = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            try:
+                self._buf = next(self._it)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def open_chunks(chunks: Iterable[bytes], buffer_size: Optional[int] = None) -> BinaryIO:
+    return io.BufferedReader(ChunkStream(chunks), buffer_size or io.DEFAULT_BUFFER_SIZE)
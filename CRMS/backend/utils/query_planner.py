@@ -0,0 +1,297 @@
+"""
+Query planner: validate filter/orderBy combinations against firestore.indexes.json.
+
+List endpoints describe their query as a ``QuerySpec``; the planner checks it
+against the composite indexes declared in ``firestore.indexes.json`` *before*
+anything is sent to Firestore, so an unsupported ``orderBy`` or a missing
+index is a single 400 instead of several failed round trips and a silently
+unordered page.
+
+Matching follows Firestore's rules:
+
+- equality-only queries, and queries touching a single field, are served by
+  the automatic single-field indexes;
+- otherwise the query needs composite indexes whose fields are
+  ``<some equality fields> + <the orderBy fields, same directions>``; several
+  such indexes may be merged as long as together they cover every equality
+  filter (Firestore's index merging);
+- a range filter must be on the first orderBy field.
+
+Endpoints check a client-supplied ``orderBy`` against their own sortable
+fields (``check_order``) before planning, so only combinations the API means
+to offer ever reach the planner. Unmet ones are counted in memory (at most
+``MAX_TRACKED_MISSES`` distinct shapes) and in ``query_index_misses`` through
+the write-behind buffer, so ``scripts/generate_indexes.py`` can add them to
+the index file from real traffic.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from utils import write_behind
+
+logger = logging.getLogger(__name__)
+
+ASC = "ASCENDING"
+DESC = "DESCENDING"
+CONTAINS = "CONTAINS"
+
+EQUALITY_OPS = {"==", "in"}
+CONTAINS_OPS = {"array_contains", "array_contains_any"}
+RANGE_OPS = {"<", "<=", ">", ">=", "!=", "not-in"}
+
+INDEXES_FILE = os.getenv("FIRESTORE_INDEXES_FILE") or os.path.join(
+    os.path.dirname(__file__), "..", "..", "firestore.indexes.json")
+RECORD_MISSES = os.getenv("QUERY_PLANNER_RECORD_MISSES", "true").lower() == "true"
+MISSES_COLLECTION = "query_index_misses"
+MAX_TRACKED_MISSES = int(os.getenv("QUERY_PLANNER_MAX_MISSES", "200"))
+MISS_KIND = "query_index_miss"
+write_behind.register(MISS_KIND)
+
+
+def direction_of(value: Optional[str]) -> str:
+    """'asc'/'desc' (any case) -> ASCENDING/DESCENDING; default DESCENDING."""
+    return ASC if (value or "").strip().lower() in {"asc", "ascending"} else DESC
+
+
+class QueryNotIndexed(ValueError):
+    """The requested filter/order combination has no index; maps to HTTP 400."""
+
+    def __init__(self, message: str, collection: str, suggested: Optional[List[Dict[str, str]]] = None):
+        super().__init__(message)
+        self.collection = collection
+        self.suggested = suggested
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"error": str(self), "collection": self.collection}
+        if self.suggested:
+            out["missingIndex"] = self.suggested
+        return out
+
+
+def check_order(collection: str, value: Optional[str], allowed: Iterable[str],
+                default: str = "created_at") -> str:
+    """The client's orderBy if the endpoint offers it; QueryNotIndexed (400) otherwise."""
+    field = (value or "").strip() or default
+    if field not in allowed:
+        raise QueryNotIndexed(f"orderBy must be one of {sorted(allowed)}", collection)
+    return field
+
+
+class QuerySpec:
+    """Declarative description of a query: filters + orderings, buildable against any collection."""
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.filters: List[Tuple[str, str, Any]] = []
+        self.orders: List[Tuple[str, str]] = []
+
+    def where(self, field: str, op: str, value: Any) -> "QuerySpec":
+        if op not in EQUALITY_OPS | CONTAINS_OPS | RANGE_OPS:
+            raise ValueError(f"unsupported operator '{op}'")
+        self.filters.append((field, op, value))
+        return self
+
+    def order(self, field: str, direction: str = DESC) -> "QuerySpec":
+        self.orders.append((field, direction))
+        return self
+
+    def on(self, collection: str) -> "QuerySpec":
+        """Same filters/orders against another collection (e.g. the archive tier)."""
+        spec = QuerySpec(collection)
+        spec.filters, spec.orders = list(self.filters), list(self.orders)
+        return spec
+
+    def fields(self, ops) -> List[str]:
+        return sorted({f for f, op, _ in self.filters if op in ops})
+
+    def build(self, db):
+        q = db.collection(self.collection)
+        for field, op, value in self.filters:
+            q = q.where(filter=FieldFilter(field, op, value))
+        for field, direction in self.orders:
+            q = q.order_by(field, direction=firestore.Query.ASCENDING if direction == ASC
+                           else firestore.Query.DESCENDING)
+        return q
+
+
+class QueryPlan:
+    def __init__(self, spec: QuerySpec, indexes: List[List[Dict[str, str]]], automatic: bool = False):
+        self.spec = spec
+        self.indexes = indexes
+        self.automatic = automatic
+
+    def query(self, db):
+        return self.spec.build(db)
+
+
+def _index_key(fields: List[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple((f["fieldPath"], f.get("order") or f.get("arrayConfig")) for f in fields)
+
+
+class QueryPlanner:
+    def __init__(self, indexes: Optional[List[Dict[str, Any]]] = None, source: Optional[str] = None):
+        self.source = source
+        self.enabled = indexes is not None
+        self._by_collection: Dict[str, List[List[Dict[str, str]]]] = {}
+        for idx in indexes or []:
+            if idx.get("queryScope", "COLLECTION") != "COLLECTION":
+                continue
+            self._by_collection.setdefault(idx["collectionGroup"], []).append(
+                [f for f in idx.get("fields", []) if f.get("fieldPath") != "__name__"])
+        self._lock = threading.Lock()
+        self.misses: Counter = Counter()
+        self._suggestions: Dict[str, Dict[str, Any]] = {}
+        self.untracked = 0
+
+    @classmethod
+    def from_file(cls, path: str = INDEXES_FILE) -> "QueryPlanner":
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError) as e:
+            # without an index file we cannot validate; let Firestore decide
+            logger.warning("query planner disabled: cannot load %s (%s)", path, e)
+            return cls(None, source=path)
+        return cls(data.get("indexes", []), source=os.path.abspath(path))
+
+    # ---------- planning ----------
+
+    def plan(self, spec: QuerySpec) -> QueryPlan:
+        if not self.enabled:
+            return QueryPlan(spec, [], automatic=True)
+
+        equals = set(spec.fields(EQUALITY_OPS))
+        contains = set(spec.fields(CONTAINS_OPS))
+        ranges = spec.fields(RANGE_OPS)
+        orders = list(spec.orders)
+
+        if len(ranges) > 1:
+            raise QueryNotIndexed(f"only one range filter is supported (got {', '.join(ranges)})",
+                                  spec.collection)
+        if len(contains) > 1:
+            raise QueryNotIndexed("only one array-contains filter is supported", spec.collection)
+        if ranges:
+            if not orders:
+                orders = [(ranges[0], ASC)]
+            elif orders[0][0] != ranges[0]:
+                raise QueryNotIndexed(
+                    f"orderBy must start with '{ranges[0]}' when filtering on a range of it",
+                    spec.collection)
+        equals -= {f for f, _ in orders}
+
+        # automatic single-field indexes
+        if not orders and not (contains and equals):
+            return QueryPlan(spec, [], automatic=True)
+        if not equals and not contains and len({f for f, _ in orders}) == 1 and len(orders) == 1:
+            return QueryPlan(spec, [], automatic=True)
+
+        chosen = self._cover(spec.collection, equals, contains, orders)
+        if chosen is not None:
+            return QueryPlan(spec, chosen)
+
+        suggested = ([{"fieldPath": f, "order": ASC} for f in sorted(equals)]
+                     + [{"fieldPath": f, "arrayConfig": CONTAINS} for f in sorted(contains)]
+                     + [{"fieldPath": f, "order": d} for f, d in orders])
+        self.record_miss(spec.collection, suggested)
+        desc = ", ".join(f"{f} {d.lower()}" for f, d in orders) or "no order"
+        filters = ", ".join(sorted(equals | contains | set(ranges))) or "no filters"
+        raise QueryNotIndexed(f"no index on {spec.collection} for filters [{filters}] ordered by [{desc}]",
+                              spec.collection, suggested)
+
+    def _cover(self, collection, equals, contains, orders):
+        """Pick composite indexes whose union covers all equality/contains filters, or None."""
+        suffix = [(f, d) for f, d in orders]
+        needed = equals | contains
+        candidates = []
+        for fields in self._by_collection.get(collection, []):
+            if len(fields) < len(suffix):
+                continue
+            head, tail = fields[:len(fields) - len(suffix)], fields[len(fields) - len(suffix):]
+            if [(f["fieldPath"], f.get("order")) for f in tail] != suffix:
+                continue
+            ok = True
+            for f in head:
+                name = f["fieldPath"]
+                if name in contains:
+                    ok = f.get("arrayConfig") == CONTAINS
+                elif name in equals:
+                    ok = f.get("order") in (ASC, DESC)
+                else:
+                    ok = False
+                if not ok:
+                    break
+            if ok:
+                candidates.append((fields, {f["fieldPath"] for f in head}))
+
+        if not needed:
+            exact = [fields for fields, head in candidates if not head]
+            return exact[:1] or None
+
+        chosen, covered = [], set()
+        for fields, head in sorted(candidates, key=lambda c: -len(c[1])):
+            if head - covered:
+                chosen.append(fields)
+                covered |= head
+            if covered >= needed:
+                return chosen
+        return None
+
+    # ---------- misses ----------
+
+    def record_miss(self, collection: str, fields: List[Dict[str, str]]):
+        key = json.dumps([collection, fields], sort_keys=True)
+        with self._lock:
+            if key not in self.misses and len(self.misses) >= MAX_TRACKED_MISSES:
+                self.untracked += 1
+                return
+            self.misses[key] += 1
+            self._suggestions[key] = {"collectionGroup": collection, "queryScope": "COLLECTION", "fields": fields}
+        logger.warning("query planner: no index for %s %s", collection, _index_key(fields))
+        if not RECORD_MISSES:
+            return
+        try:
+            # coalesced per shape and written off the request path
+            doc_id = hashlib.sha1(key.encode("utf-8")).hexdigest()
+            write_behind.get_buffer().add(MISS_KIND, f"{MISSES_COLLECTION}/{doc_id}", {
+                "collectionGroup": collection,
+                "fields": fields,
+                "count": firestore.Increment(1),
+                "last_seen": firestore.SERVER_TIMESTAMP,
+            })
+        except Exception:
+            logger.debug("query planner: could not queue miss", exc_info=True)
+
+    def miss_report(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{**self._suggestions[k], "count": n} for k, n in self.misses.most_common()]
+
+
+_planner: Optional[QueryPlanner] = None
+_planner_lock = threading.Lock()
+
+
+def get_planner() -> QueryPlanner:
+    global _planner
+    if _planner is None:
+        with _planner_lock:
+            if _planner is None:
+                _planner = QueryPlanner.from_file()
+    return _planner
+
+
+def set_planner(planner: Optional[QueryPlanner]):
+    """Override the process-wide planner (tests)."""
+    global _planner
+    _planner = planner
+
+
+def plan(spec: QuerySpec) -> QueryPlan:
+    return get_planner().plan(spec)
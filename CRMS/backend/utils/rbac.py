@@ -0,0 +1,129 @@
+"""
+Role-based access control compiled to bitsets.
+
+``POLICY`` is the single source of truth for what each role may do. At import
+it is compiled once: every (resource, action) pair gets a bit index and every
+role an int mask, so a check is one dict lookup and one AND.
+
+Role names from both vocabularies resolve to the same role: the short names
+used in custom claims / ``api/roles.py`` (``admin``, ``support``) are aliases
+of the model roles (``tenant_admin``, ``support_agent``). ``super_admin`` is
+allowed everything. A principal without a role is a viewer (the default
+``models.user.User`` role); unknown roles get no permissions.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+SUPER_ADMIN = "super_admin"
+TENANT_ADMIN = "tenant_admin"
+MANAGER = "manager"
+SALES_REP = "sales_rep"
+SUPPORT_AGENT = "support_agent"
+VIEWER = "viewer"
+
+ALIASES: Dict[str, str] = {
+    "admin": TENANT_ADMIN,
+    "support": SUPPORT_AGENT,
+}
+
+CRUD = ("create", "read", "update", "delete")
+
+POLICY: Dict[str, Dict[str, Iterable[str]]] = {
+    TENANT_ADMIN: {
+        "customers": CRUD,
+        "logs": CRUD,
+        "complaints": (*CRUD, "assign"),
+        "attachments": CRUD,
+        "users": ("create", "read", "update"),
+        "reports": ("read",),
+        "settings": ("read", "update"),
+    },
+    MANAGER: {
+        "customers": ("create", "read", "update"),
+        "logs": CRUD,
+        "complaints": ("create", "read", "update", "assign"),
+        "attachments": CRUD,
+        "users": ("read",),
+        "reports": ("read",),
+    },
+    SALES_REP: {
+        "customers": ("create", "read", "update"),
+        "logs": ("create", "read", "update"),
+        "complaints": ("create", "read"),
+        "attachments": ("create", "read"),
+        "reports": ("read",),
+    },
+    SUPPORT_AGENT: {
+        "customers": ("read", "update"),
+        "logs": ("create", "read", "update"),
+        "complaints": ("create", "read", "update"),
+        "attachments": ("create", "read"),
+    },
+    VIEWER: {
+        "customers": ("read",),
+        "logs": ("read",),
+        "complaints": ("read",),
+        "attachments": ("read",),
+    },
+}
+
+
+class UnknownPermission(KeyError):
+    """A (resource, action) pair that no role mentions – almost certainly a typo at the call site."""
+
+
+def _compile(policy):
+    bits: Dict[Tuple[str, str], int] = {}
+    for grants in policy.values():
+        for resource, actions in grants.items():
+            for action in actions:
+                bits.setdefault((resource, action), len(bits))
+    masks: Dict[str, int] = {}
+    for role, grants in policy.items():
+        mask = 0
+        for resource, actions in grants.items():
+            for action in actions:
+                mask |= 1 << bits[(resource, action)]
+        masks[role] = mask
+    masks[SUPER_ADMIN] = (1 << len(bits)) - 1
+    for alias, role in ALIASES.items():
+        masks[alias] = masks[role]
+    return bits, masks
+
+
+_BITS, _MASKS = _compile(POLICY)
+
+
+def canonical_role(role: Optional[str]) -> str:
+    role = (role or "").strip().lower()
+    return ALIASES.get(role, role)
+
+
+def permission_bit(resource: str, action: str) -> int:
+    """Bit for (resource, action); resolve once (e.g. at decoration time) and reuse."""
+    try:
+        return 1 << _BITS[(resource, action)]
+    except KeyError:
+        raise UnknownPermission(f"{resource}:{action}") from None
+
+
+def role_mask(role: Optional[str]) -> int:
+    return _MASKS.get((role or VIEWER).lower(), 0)
+
+
+def has_bit(role: Optional[str], bit: int) -> bool:
+    return bool(_MASKS.get((role or VIEWER).lower(), 0) & bit)
+
+
+def allowed(role: Optional[str], resource: str, action: str) -> bool:
+    bit = _BITS.get((resource, action))
+    return bit is not None and bool(role_mask(role) >> bit & 1)
+
+
+def permissions_of(role: Optional[str]) -> Dict[str, list]:
+    """Expanded view of a role's grants (for /auth/me style responses and docs)."""
+    mask = role_mask(role)
+    out: Dict[str, list] = {}
+    for (resource, action), bit in _BITS.items():
+        if mask >> bit & 1:
+            out.setdefault(resource, []).append(action)
+    return out
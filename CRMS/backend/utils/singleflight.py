@@ -0,0 +1,150 @@
+"""
+In-process singleflight for identical concurrent reads.
+
+``group.do(key, fn)`` runs ``fn`` once per key at a time: callers arriving
+while a call is in flight wait for it and share its result (or exception).
+With ``stale_seconds > 0`` a finished result is also kept that long: for its
+first ``fresh_seconds`` (default half the stale window) it is simply served,
+after that it is still served immediately while one background call
+refreshes it (stale-while-revalidate). So sequential requests cost at most
+one ``fn`` per fresh window, not one each.
+
+Results are shared between requests, so ``fn`` must return plain data that
+callers treat as read-only – never a Flask response or anything bound to a
+request context.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STALE_SECONDS = float(os.getenv("SINGLEFLIGHT_STALE_SECONDS", "0"))
+FRESH_FRACTION = 0.5      # default fresh window, as a share of the stale window
+MAX_CACHED = 1024
+
+
+def make_key(tenant_id: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Tuple:
+    """(tenant, endpoint, normalized params): empty values dropped, order-independent."""
+    norm = tuple(sorted((str(k), str(v).strip()) for k, v in (params or {}).items()
+                        if v is not None and str(v).strip() != ""))
+    return tenant_id, endpoint, norm
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, stale_seconds: float = STALE_SECONDS, fresh_seconds: Optional[float] = None):
+        self.stale_seconds = stale_seconds
+        self.fresh_seconds = fresh_seconds
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._cache: Dict[Hashable, Tuple[float, Any]] = {}   # key -> (fetched_at, result)
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0, "fresh_hits": 0, "stale_hits": 0,
+                      "refreshes": 0, "errors": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], stale_seconds: Optional[float] = None,
+           fresh_seconds: Optional[float] = None) -> Any:
+        stale = self.stale_seconds if stale_seconds is None else stale_seconds
+        fresh = self.fresh_seconds if fresh_seconds is None else fresh_seconds
+        if fresh is None:
+            fresh = stale * FRESH_FRACTION
+        with self._lock:
+            self.stats["calls"] += 1
+            if stale > 0:
+                cached = self._cache.get(key)
+                age = time.monotonic() - cached[0] if cached is not None else None
+                if age is not None and age < min(fresh, stale):
+                    self.stats["fresh_hits"] += 1
+                    return cached[1]
+                if age is not None and age < stale:
+                    self.stats["stale_hits"] += 1
+                    if key not in self._calls:
+                        self._start_refresh(key, fn, stale)
+                    return cached[1]
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self._run(key, fn, call, keep=stale)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _run(self, key, fn, call: _Call, keep: float):
+        try:
+            call.result = fn()
+        except BaseException as e:          # shared with every waiter, re-raised by each
+            call.error = e
+        with self._lock:
+            self.stats["executions"] += 1
+            if call.error is not None:
+                self.stats["errors"] += 1
+            elif keep > 0:
+                now = time.monotonic()
+                if len(self._cache) >= MAX_CACHED:
+                    self._cache = {k: v for k, v in self._cache.items() if now - v[0] < keep}
+                self._cache[key] = (now, call.result)
+            self._calls.pop(key, None)
+        call.done.set()
+
+    def _start_refresh(self, key, fn, stale: float):
+        """Called with the lock held: register the in-flight call, run it off-thread."""
+        call = self._calls[key] = _Call()
+        self.stats["refreshes"] += 1
+
+        def _refresh():
+            self._run(key, fn, call, keep=stale)
+            if call.error is not None:
+                logger.warning("singleflight refresh of %r failed: %s", key, call.error)
+
+        threading.Thread(target=_refresh, name="singleflight-refresh", daemon=True).start()
+
+    def forget(self, key: Hashable):
+        """Drop a cached result (e.g. after a write the caller must see)."""
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "in_flight": len(self._calls), "cached": len(self._cache),
+                    "stale_seconds": self.stale_seconds, "fresh_seconds": self.fresh_seconds}
+
+
+_group: Optional[SingleFlight] = None
+_group_lock = threading.Lock()
+
+
+def get_group() -> SingleFlight:
+    global _group
+    if _group is None:
+        with _group_lock:
+            if _group is None:
+                _group = SingleFlight()
+    return _group
+
+
+def do(key: Hashable, fn: Callable[[], Any], stale_seconds: Optional[float] = None,
+       fresh_seconds: Optional[float] = None) -> Any:
+    return get_group().do(key, fn, stale_seconds, fresh_seconds)
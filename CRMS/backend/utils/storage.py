@@ -0,0 +1,223 @@
+"""
+Pluggable blob storage for attachments.
+
+Uploads are written to a per-upload *staging* object in chunks (resumable by
+offset) and, once complete, committed under a content-addressed key derived
+from the SHA-256 of the bytes. Identical files therefore share one stored
+object. Nothing here buffers a whole file in memory.
+
+Backends register under a name; ``get_storage()`` picks one from
+``STORAGE_BACKEND`` (default: ``local``).
+"""
+import hashlib
+import os
+import shutil
+import threading
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StorageError(Exception):
+    """Base error for storage backends."""
+
+
+class OffsetMismatch(StorageError):
+    """A resumable chunk did not start at the current end of the staged upload."""
+
+    def __init__(self, expected: int):
+        super().__init__(f"upload offset mismatch; expected {expected}")
+        self.expected = expected
+
+
+def content_key(tenant_id: str, sha256: str) -> str:
+    """Content-addressed object key (scoped per tenant so dedup never leaks across tenants)."""
+    return f"{tenant_id}/sha256/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+class StorageBackend:
+    """Interface every backend implements."""
+
+    # ---- resumable staging ----
+    def staging_size(self, upload_id: str) -> int:
+        raise NotImplementedError
+
+    def append_staging(self, upload_id: str, offset: int, stream: BinaryIO,
+                       max_bytes: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> int:
+        """Append ``stream`` at ``offset``; returns the new staged size."""
+        raise NotImplementedError
+
+    def hash_staging(self, upload_id: str) -> Tuple[str, int]:
+        """Stream the staged bytes through SHA-256; returns (hexdigest, size)."""
+        raise NotImplementedError
+
+    def commit_staging(self, upload_id: str, key: str) -> bool:
+        """Move staged bytes to ``key``. Returns False if ``key`` already existed (deduplicated)."""
+        raise NotImplementedError
+
+    def discard_staging(self, upload_id: str) -> None:
+        raise NotImplementedError
+
+    # ---- committed objects ----
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def read_range(self, key: str, start: int = 0, stop: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield bytes [start, stop) in chunks."""
+        raise NotImplementedError
+
+    def write_stream(self, key: str, stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> int:
+        """Write a whole object from a stream (used for archives/backups)."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LocalStorageBackend(StorageBackend):
+    """Filesystem backend for development and tests."""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._staging = os.path.join(self.root, "_staging")
+        os.makedirs(self._staging, exist_ok=True)
+        self._lock = threading.Lock()
+
+    # ---- paths ----
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise StorageError("invalid key")
+        return path
+
+    def _staging_path(self, upload_id: str) -> str:
+        if not upload_id or not upload_id.replace("-", "").replace("_", "").isalnum():
+            raise StorageError("invalid upload id")
+        return os.path.join(self._staging, upload_id)
+
+    # ---- staging ----
+    def staging_size(self, upload_id: str) -> int:
+        try:
+            return os.path.getsize(self._staging_path(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    def append_staging(self, upload_id, offset, stream, max_bytes=None, chunk_size=CHUNK_SIZE):
+        path = self._staging_path(upload_id)
+        with self._lock:
+            current = self.staging_size(upload_id)
+            if offset != current:
+                raise OffsetMismatch(current)
+            written = 0
+            with open(path, "ab") as fh:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if max_bytes is not None and current + written > max_bytes:
+                        # reject the whole request; the upload resumes from `current`
+                        fh.flush()
+                        fh.truncate(current)
+                        raise StorageError("upload exceeds declared size")
+                    fh.write(chunk)
+            return current + written
+
+    def hash_staging(self, upload_id):
+        h, size = hashlib.sha256(), 0
+        with open(self._staging_path(upload_id), "rb") as fh:
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+                size += len(chunk)
+        return h.hexdigest(), size
+
+    def commit_staging(self, upload_id, key):
+        src, dst = self._staging_path(upload_id), self._path(key)
+        if os.path.exists(dst):
+            os.remove(src)
+            return False
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        os.replace(src, dst)
+        return True
+
+    def discard_staging(self, upload_id):
+        try:
+            os.remove(self._staging_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    # ---- objects ----
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def read_range(self, key, start=0, stop=None, chunk_size=CHUNK_SIZE):
+        with open(self._path(key), "rb") as fh:
+            fh.seek(start)
+            remaining = None if stop is None else max(stop - start, 0)
+            while remaining is None or remaining > 0:
+                n = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = fh.read(n)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def write_stream(self, key, stream, chunk_size=CHUNK_SIZE):
+        dst = self._path(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.part"
+        with open(tmp, "wb") as fh:
+            shutil.copyfileobj(stream, fh, chunk_size)
+        os.replace(tmp, dst)
+        return os.path.getsize(dst)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+# ---------- registry ----------
+
+_BACKENDS: Dict[str, Callable[[], StorageBackend]] = {
+    "local": lambda: LocalStorageBackend(
+        os.getenv("STORAGE_LOCAL_DIR") or os.path.join(os.path.dirname(__file__), "..", "storage")
+    ),
+}
+_instance: Optional[StorageBackend] = None
+_instance_lock = threading.Lock()
+
+
+def register_backend(name: str, factory: Callable[[], StorageBackend]):
+    """Register a backend factory (e.g. a Firebase Storage / GCS implementation)."""
+    _BACKENDS[name] = factory
+
+
+def get_storage() -> StorageBackend:
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                name = os.getenv("STORAGE_BACKEND", "local")
+                if name not in _BACKENDS:
+                    raise StorageError(f"unknown storage backend '{name}'")
+                _instance = _BACKENDS[name]()
+    return _instance
+
+
+def set_storage(backend: Optional[StorageBackend]):
+    """Override the process-wide backend (tests)."""
+    global _instance
+    _instance = backend
@@ -0,0 +1,236 @@
+"""
+Per-tenant fairness: token-bucket rate limits plus a concurrency gate.
+
+``require_auth`` calls ``admit(tenant_id, method, cost)`` once the tenant is
+known. Each tenant has two buckets – ``read`` (GET/HEAD) and ``write``
+(everything else) – refilled at ``rate`` tokens/s up to ``burst``; a request
+takes ``cost`` tokens (``@rate_cost(n)`` marks expensive routes such as
+search or exports). Independently, at most ``TENANT_MAX_CONCURRENT``
+requests of one tenant run at once, so one tenant cannot occupy every
+worker. A rejected request raises ``RateLimited`` with the number of seconds
+after which a retry can succeed (sent as ``Retry-After`` on the 429).
+
+State is per process (``memory``) by default. ``TENANT_LIMITS_BACKEND=redis``
+shares it across workers/instances through ``REDIS_URL`` (needs the
+optional ``redis`` package).
+"""
+import math
+import os
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+ENABLED = os.getenv("TENANT_LIMITS_ENABLED", "true").lower() == "true"
+READ, WRITE = "read", "write"
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+LIMITS: Dict[str, Tuple[float, float]] = {       # class -> (tokens per second, burst)
+    READ: (float(os.getenv("TENANT_READ_RATE", "50")), float(os.getenv("TENANT_READ_BURST", "100"))),
+    WRITE: (float(os.getenv("TENANT_WRITE_RATE", "10")), float(os.getenv("TENANT_WRITE_BURST", "30"))),
+}
+MAX_CONCURRENT = int(os.getenv("TENANT_MAX_CONCURRENT", "8"))
+CONCURRENCY_RETRY_AFTER = 1.0     # seconds suggested when only the gate is full
+
+
+class RateLimited(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def request_class(method: str) -> str:
+    return READ if (method or "").upper() in READ_METHODS else WRITE
+
+
+def rate_cost(cost: int):
+    """Mark a route as costing ``cost`` tokens (put it *below* ``@require_auth``)."""
+    def decorator(fn):
+        fn.rate_cost = cost
+        return fn
+    return decorator
+
+
+# ---------- backends ----------
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None):
+        self.rate, self.burst = rate, burst
+        self.tokens = burst
+        self.stamp = time.monotonic() if now is None else now
+
+    def take(self, cost: float, now: Optional[float] = None) -> float:
+        """Take ``cost`` tokens; returns 0 on success, else seconds until they would be there."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if cost > self.burst:
+            cost = self.burst                     # an oversized request can still run when full
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._active: Dict[str, int] = {}
+
+    def take(self, tenant_id: str, klass: str, cost: float) -> float:
+        rate, burst = LIMITS[klass]
+        with self._lock:
+            bucket = self._buckets.get((tenant_id, klass))
+            if bucket is None:
+                bucket = self._buckets[(tenant_id, klass)] = TokenBucket(rate, burst)
+            return bucket.take(cost)
+
+    def enter(self, tenant_id: str, limit: int) -> bool:
+        with self._lock:
+            n = self._active.get(tenant_id, 0)
+            if n >= limit:
+                return False
+            self._active[tenant_id] = n + 1
+            return True
+
+    def leave(self, tenant_id: str):
+        with self._lock:
+            n = self._active.get(tenant_id, 0) - 1
+            if n > 0:
+                self._active[tenant_id] = n
+            else:
+                self._active.pop(tenant_id, None)
+
+    def active(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._active)
+
+
+class RedisBackend:
+    """Same semantics, shared through Redis: a Lua token bucket and an INCR/DECR gate."""
+
+    _TAKE = """
+    local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+    local tokens = tonumber(state[1]) or burst
+    local stamp = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - stamp) * rate)
+    if cost > burst then cost = burst end
+    local wait = 0
+    if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'stamp', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+    return tostring(wait)
+    """
+    GATE_TTL = 300      # seconds; bounds leaked slots if a worker dies mid-request
+
+    def __init__(self, url: str, prefix: str = "crms:limits"):
+        import redis    # optional dependency, only needed for this backend
+        self._r = redis.Redis.from_url(url)
+        self._take = self._r.register_script(self._TAKE)
+        self._prefix = prefix
+
+    def take(self, tenant_id: str, klass: str, cost: float) -> float:
+        rate, burst = LIMITS[klass]
+        return float(self._take(keys=[f"{self._prefix}:bucket:{tenant_id}:{klass}"],
+                                args=[rate, burst, time.time(), cost]))
+
+    def enter(self, tenant_id: str, limit: int) -> bool:
+        key = f"{self._prefix}:active:{tenant_id}"
+        pipe = self._r.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, self.GATE_TTL)
+        n = pipe.execute()[0]
+        if n > limit:
+            self._r.decr(key)
+            return False
+        return True
+
+    def leave(self, tenant_id: str):
+        self._r.decr(f"{self._prefix}:active:{tenant_id}")
+
+    def active(self) -> Dict[str, int]:
+        return {}
+
+
+_BACKENDS: Dict[str, Callable[[], object]] = {
+    "memory": MemoryBackend,
+    "redis": lambda: RedisBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0")),
+}
+_backend = None
+_backend_lock = threading.Lock()
+_stats = {"admitted": 0, "rate_limited": 0, "concurrency_limited": 0}
+_stats_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _BACKENDS[os.getenv("TENANT_LIMITS_BACKEND", "memory")]()
+    return _backend
+
+
+def set_backend(backend):
+    """Override the process-wide backend (tests)."""
+    global _backend
+    _backend = backend
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+# ---------- entry points ----------
+
+def admit(tenant_id: str, method: str, cost: float = 1, gate: bool = True) -> Callable[[], None]:
+    """
+    Charge the tenant's bucket and take a concurrency slot. Returns the
+    function that releases the slot (call it when the request finishes);
+    raises RateLimited when the tenant is over either limit.
+    """
+    if not ENABLED:
+        return lambda: None
+    backend = get_backend()
+    tenant_id = tenant_id or "default"
+    wait = backend.take(tenant_id, request_class(method), cost)
+    if wait > 0:
+        _count("rate_limited")
+        raise RateLimited("rate limit exceeded for tenant", wait)
+    if not gate:
+        _count("admitted")
+        return lambda: None
+    if not backend.enter(tenant_id, MAX_CONCURRENT):
+        _count("concurrency_limited")
+        raise RateLimited("too many concurrent requests for tenant", CONCURRENCY_RETRY_AFTER)
+    _count("admitted")
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            backend.leave(tenant_id)
+    return release
+
+
+def snapshot() -> Dict[str, object]:
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        **stats,
+        "enabled": ENABLED,
+        "backend": os.getenv("TENANT_LIMITS_BACKEND", "memory"),
+        "limits": {k: {"rate": r, "burst": b} for k, (r, b) in LIMITS.items()},
+        "max_concurrent": MAX_CONCURRENT,
+        "active": get_backend().active(),
+    }
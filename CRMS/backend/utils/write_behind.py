@@ -0,0 +1,194 @@
+"""
+Per-process write-behind buffer for hot documents.
+
+Firestore sustains roughly one write per second per document. Paths that touch
+the same document on every request (the customer's activity stats, the
+tenant's daily rollup) add their update here instead; updates to the same key
+within ``WRITE_BEHIND_WINDOW_SECONDS`` are coalesced and written once:
+
+- ``Increment`` values are summed, nested dicts merged, other values last-wins;
+- each *kind* has a flusher ``fn(db, key, update)`` that performs the single
+  write (a merge ``set`` by default, or e.g. a small transaction).
+
+Pending updates are flushed by a background thread, on ``flush()`` and at
+interpreter exit. A crash loses at most one window of counter updates; the
+rebuild/recompute scripts repair them. Set the window to 0 to write through.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google.cloud.firestore_v1.transforms import Increment
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = float(os.getenv("WRITE_BEHIND_WINDOW_SECONDS", "1.0"))
+MAX_ATTEMPTS = 5
+
+Flusher = Callable[[Any, str, Dict[str, Any]], None]
+
+
+def merge_update(into: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold ``update`` into ``into`` (in place) so one write has the effect of both."""
+    for k, v in update.items():
+        cur = into.get(k)
+        if isinstance(v, Increment) and isinstance(cur, Increment):
+            into[k] = Increment(cur.value + v.value)
+        elif isinstance(v, Increment) and isinstance(cur, (int, float)) and not isinstance(cur, bool):
+            into[k] = cur + v.value          # a plain reset followed by increments
+        elif isinstance(v, dict) and isinstance(cur, dict):
+            merge_update(cur, v)
+        elif isinstance(v, dict):
+            into[k] = merge_update({}, v)
+        else:
+            into[k] = v
+    return into
+
+
+def merge_set(db, path: str, update: Dict[str, Any]):
+    db.document(path).set(update, merge=True)
+
+
+_FLUSHERS: Dict[str, Flusher] = {}
+
+
+def register(kind: str, flusher: Flusher = merge_set):
+    """Register how pending updates of ``kind`` are written (key = document path)."""
+    _FLUSHERS[kind] = flusher
+
+
+class _Entry:
+    __slots__ = ("update", "first_at", "count", "attempts")
+
+    def __init__(self, update: Dict[str, Any], now: float):
+        self.update = update
+        self.first_at = now
+        self.count = 1
+        self.attempts = 0
+
+
+class WriteBehindBuffer:
+    def __init__(self, window: float = WINDOW_SECONDS, db_factory: Optional[Callable[[], Any]] = None):
+        self.window = window
+        self._db_factory = db_factory
+        self._pending: Dict[Tuple[str, str], _Entry] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_lock = threading.Lock()
+        self.stats = {"updates": 0, "coalesced": 0, "writes": 0, "failures": 0, "retries": 0, "dropped": 0}
+
+    def _db(self):
+        if self._db_factory is None:
+            from utils.firebase import get_db
+            return get_db()
+        return self._db_factory()
+
+    # ---------- producers ----------
+
+    def add(self, kind: str, key: str, update: Dict[str, Any]):
+        if kind not in _FLUSHERS:
+            raise KeyError(f"no flusher registered for '{kind}'")
+        if self.window <= 0:
+            with self._cond:
+                self.stats["updates"] += 1
+            self._write(kind, key, _Entry(merge_update({}, update), time.monotonic()))
+            return
+        with self._cond:
+            self.stats["updates"] += 1
+            entry = self._pending.get((kind, key))
+            if entry is None:
+                self._pending[(kind, key)] = _Entry(merge_update({}, update), time.monotonic())
+            else:
+                merge_update(entry.update, update)
+                entry.count += 1
+                self.stats["coalesced"] += 1
+            self._ensure_thread()
+            self._cond.notify()
+
+    # ---------- flushing ----------
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                now = time.monotonic()
+                oldest = min(e.first_at for e in self._pending.values())
+                if oldest + self.window > now:
+                    self._cond.wait(oldest + self.window - now)
+                    continue
+                due = {k: e for k, e in self._pending.items() if e.first_at + self.window <= now}
+                for k in due:
+                    del self._pending[k]
+            self._write_all(due)
+
+    def flush(self):
+        """Write everything pending now (shutdown, tests, scripts)."""
+        with self._cond:
+            due, self._pending = self._pending, {}
+        self._write_all(due)
+
+    def _write_all(self, due: Dict[Tuple[str, str], _Entry]):
+        with self._flush_lock:
+            for (kind, key), entry in due.items():
+                self._write(kind, key, entry)
+
+    def _write(self, kind: str, key: str, entry: _Entry):
+        try:
+            _FLUSHERS[kind](self._db(), key, entry.update)
+            with self._cond:
+                self.stats["writes"] += 1
+        except Exception:
+            entry.attempts += 1
+            with self._cond:
+                self.stats["failures"] += 1
+                if entry.attempts >= MAX_ATTEMPTS or self.window <= 0:
+                    self.stats["dropped"] += entry.count
+                    logger.exception("write-behind: giving up on %s %s after %d attempts",
+                                     kind, key, entry.attempts)
+                    return
+                # put it back (merging with anything queued meanwhile) for the next window
+                self.stats["retries"] += 1
+                entry.first_at = time.monotonic()
+                queued = self._pending.get((kind, key))
+                if queued is not None:
+                    merge_update(entry.update, queued.update)
+                    entry.count += queued.count
+                self._pending[(kind, key)] = entry
+                self._ensure_thread()
+                self._cond.notify()
+            logger.warning("write-behind: write to %s %s failed (attempt %d), retrying",
+                           kind, key, entry.attempts, exc_info=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {**self.stats, "pending": len(self._pending), "window_seconds": self.window}
+
+
+_buffer: Optional[WriteBehindBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer() -> WriteBehindBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = WriteBehindBuffer()
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def set_buffer(buffer: Optional[WriteBehindBuffer]):
+    """Override the process-wide buffer (tests)."""
+    global _buffer
+    _buffer = buffer
+
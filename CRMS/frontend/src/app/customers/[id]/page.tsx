@@ -80,6 +80,7 @@ export default function CustomerDetailPage({ params }: { params: { id: string }
                 </button>
                 <button
                   className="border rounded px-3 py-2"
+                  disabled={!logs.hasMore}
                   onClick={() => logs.setParams((p) => ({ ...p, page: (p.page ?? 1) + 1 }))}
                 >
                   Next
@@ -18,16 +18,20 @@ export function useCustomerLogs(customerId: string, initial: UseCustomerLogsPara
     [params.page, params.limit, params.pageSize]
   );
 
-  const [data, setData] = useState<{ logs: any[]; page: number; limit: number; returned: number }>({
+  const [data, setData] = useState<{ logs: any[]; page: number; limit: number; returned: number; hasMore: boolean }>({
     logs: [],
     page: effectiveParams.page,
     limit: effectiveParams.limit,
     returned: 0,
+    hasMore: false,
   });
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
 
   const reqSeq = useRef(0);
+  // The API is cursor-paginated: cursors.current[n] is the cursor of page n + 1
+  // (recorded as pages are loaded, so pages are reached in order).
+  const cursors = useRef<(string | null)[]>([null]);
 
   const load = async (override?: Partial<UseCustomerLogsParams>) => {
     setLoading(true);
@@ -35,9 +39,15 @@ export function useCustomerLogs(customerId: string, initial: UseCustomerLogsPara
     const seq = ++reqSeq.current;
     try {
       const merged = { ...effectiveParams, ...(override ?? {}) };
-      const res = await customerService.getLogs(customerId, merged);
+      const page = Math.min(merged.page, cursors.current.length);
+      const res = await customerService.getLogs(customerId, {
+        limit: merged.limit,
+        cursor: cursors.current[page - 1],
+      });
       if (seq === reqSeq.current) {
-        setData(res);
+        cursors.current = cursors.current.slice(0, page);
+        if (res.nextCursor) cursors.current.push(res.nextCursor);
+        setData({ logs: res.logs, page, limit: res.limit, returned: res.returned, hasMore: res.hasMore });
       }
     } catch (e: any) {
       if (seq === reqSeq.current) {
@@ -48,6 +58,12 @@ export function useCustomerLogs(customerId: string, initial: UseCustomerLogsPara
     }
   };
 
+  // a different customer or page size invalidates the recorded cursors
+  // (declared first so it runs before the load effect below)
+  useEffect(() => {
+    cursors.current = [null];
+  }, [customerId, effectiveParams.limit]);
+
   useEffect(() => {
     if (!customerId) {
       setError("customerId is required");
@@ -61,7 +77,7 @@ export function useCustomerLogs(customerId: string, initial: UseCustomerLogsPara
   const reload = () => load();
 
   return {
-    ...data,     // { logs, page, limit, returned }
+    ...data,     // { logs, page, limit, returned, hasMore }
     loading,
     error,
     params,
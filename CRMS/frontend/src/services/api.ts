@@ -15,12 +15,29 @@ const api = axios.create({
   timeout: 10000,
 });
 
+// Create endpoints accept an Idempotency-Key; the key lives on the request config,
+// so the 401 retry below (and any caller retry of the same config) reuses it.
+const IDEMPOTENT_CREATE = /^\/?(customers|logs|complaints)\/?$/;
+
+const newIdempotencyKey = () =>
+  typeof crypto !== "undefined" && "randomUUID" in crypto
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
 // 3) Attach Firebase ID token (we only store 'idToken')
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem("idToken");
   if (token && config.headers) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  if (
+    config.headers &&
+    config.method?.toLowerCase() === "post" &&
+    IDEMPOTENT_CREATE.test(config.url || "") &&
+    !config.headers["Idempotency-Key"]
+  ) {
+    config.headers["Idempotency-Key"] = newIdempotencyKey();
+  }
   return config;
 });
 
@@ -69,4 +86,18 @@ api.interceptors.response.use(
     return Promise.reject(error);
   }
 );
+
+// Multiplex several calls into one round trip (POST /api/batch).
+// Paths are relative to the API base, e.g. "/customers?limit=5".
+export type BatchRequest = { id?: string; method?: string; path: string; body?: unknown; headers?: Record<string, string> };
+export type BatchResponse<T = any> = { id: string | number; status: number; body: T; headers?: Record<string, string> };
+
+export async function batch(requests: BatchRequest[]): Promise<BatchResponse[]> {
+  const prefix = new URL(API_URL, window.location.origin).pathname.replace(/\/$/, "");
+  const { data } = await api.post("/batch", {
+    requests: requests.map((r) => ({ ...r, path: `${prefix}${r.path.startsWith("/") ? "" : "/"}${r.path}` })),
+  });
+  return data.responses;
+}
+
 export default api;
@@ -102,18 +102,19 @@ export const customerService = {
   },
 
   /**
-   * Customer logs (supports pagination)
-   * GET /api/customers/:id/logs?page&limit
+   * Customer logs (cursor pagination)
+   * GET /api/customers/:id/logs?limit&cursor
+   * Pass the previous page's nextCursor as cursor to load the next page.
    */
   getLogs: async (
     customerId: string,
-    params: { page?: number; limit?: number; pageSize?: number } = {}
-  ): Promise<{ logs: any[]; page: number; limit: number; returned: number }> => {
+    params: { limit?: number; pageSize?: number; cursor?: string | null } = {}
+  ): Promise<{ logs: any[]; limit: number; returned: number; nextCursor: string | null; hasMore: boolean }> => {
     if (!customerId || customerId === "undefined" || customerId === "null") {
       throw new Error("Valid customer id is required");
     }
     const res = await api.get(`/customers/${customerId}/logs`, { params });
-    return res.data; // { logs, page, limit, returned }
+    return res.data; // { logs, limit, returned, nextCursor, hasMore }
   },
 
   /**